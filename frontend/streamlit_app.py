@@ -1,8 +1,12 @@
 import streamlit as st
 import requests
 import json
+import time
 from datetime import datetime
+from typing import Iterator, Optional, Tuple
 import uuid
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Configuração da página
 st.set_page_config(
@@ -64,11 +68,67 @@ try:
 except Exception:
     API_BASE_URL = "http://localhost:8000"
 
-def load_conversation_history(session_id: str) -> list:
-    """Carrega histórico de conversas da API"""
+# Mensagens do histórico carregadas por vez (as mais recentes primeiro)
+HISTORY_PAGE_SIZE = 20
+
+# Intervalo mínimo entre atualizações da resposta em streaming (segundos)
+STREAM_RENDER_INTERVAL = 0.1
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Sessão HTTP compartilhada entre reruns e usuários: reaproveita conexões
+    (keep-alive) em vez de abrir uma nova a cada chamada à API.
+    """
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.5, allowed_methods=["GET"], status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def render_message(message: dict) -> str:
+    """HTML da mensagem, calculado uma única vez e guardado na própria mensagem"""
+    if "html" not in message:
+        message["html"] = message_html(message["role"], message["content"], message)
+    return message["html"]
+
+
+def message_html(role: str, content: str, message: Optional[dict] = None) -> str:
+    if role == "user":
+        message = message or {}
+        # Verificar se é um documento
+        icon = "📄" if message.get("is_document", False) else "👤"
+        title = f"{icon} Você ({message.get('type', 'consultation')}):"
+        return f"""
+            <div class="chat-message user-message">
+                <strong>{title}</strong><br>
+                {content}
+            </div>
+            """
+    return f"""
+            <div class="chat-message assistant-message">
+                <strong>⚖️ Nino:</strong><br>
+                {content}
+            </div>
+            """
+
+
+def load_conversation_history(session_id: str, before_id: Optional[int] = None) -> Tuple[list, Optional[int]]:
+    """
+    Carrega uma página do histórico de conversas da API (as mensagens mais
+    recentes antes de `before_id`). Devolve as mensagens e o `before_id` da
+    página anterior, ou None se não houver mais.
+    """
     try:
-        response = requests.get(
+        params = {"limit": HISTORY_PAGE_SIZE}
+        if before_id is not None:
+            params["before_id"] = before_id
+        response = get_http_session().get(
             f"{API_BASE_URL}/history/{session_id}",
+            params=params,
             timeout=10
         )
         if response.status_code == 200:
@@ -76,12 +136,14 @@ def load_conversation_history(session_id: str) -> list:
             messages = []
 
             for item in history_data.get("history", []):
+                timestamp = datetime.fromisoformat(item["timestamp"].replace("Z", "+00:00"))
+
                 # Adicionar mensagem do usuário
                 if item.get("user_message"):
                     messages.append({
                         "role": "user",
                         "content": item["user_message"],
-                        "timestamp": datetime.fromisoformat(item["timestamp"].replace("Z", "+00:00")),
+                        "timestamp": timestamp,
                         "is_document": item.get("is_document", False)
                     })
 
@@ -90,14 +152,14 @@ def load_conversation_history(session_id: str) -> list:
                     messages.append({
                         "role": "assistant",
                         "content": item["bot_response"],
-                        "timestamp": datetime.fromisoformat(item["timestamp"].replace("Z", "+00:00"))
+                        "timestamp": timestamp
                     })
 
-            return messages
+            return messages, history_data.get("next_before_id")
     except Exception as e:
         print(f"Erro ao carregar histórico: {e}")
 
-    return []
+    return [], None
 
 # Inicializar session state
 if "session_id" not in st.session_state:
@@ -105,18 +167,24 @@ if "session_id" not in st.session_state:
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
+    st.session_state.history_before_id = None
 
-    # Tentar carregar histórico se temos session_id
+    # Tentar carregar a página mais recente do histórico se temos session_id
     if st.session_state.session_id:
-        history = load_conversation_history(st.session_state.session_id)
+        history, before_id = load_conversation_history(st.session_state.session_id)
         if history:
             st.session_state.messages = history
+            st.session_state.history_before_id = before_id
 
 if "history_loaded" not in st.session_state:
     st.session_state.history_loaded = True
 
-def make_api_request(message: str, consultation_type: str) -> dict:
-    """Faz requisição para a API do Nino"""
+def stream_api_request(message: str, consultation_type: str, result: dict) -> Iterator[str]:
+    """
+    Envia a consulta para /chat/stream e gera os trechos da resposta à medida
+    que chegam. Ao final, `result` recebe a linha final da API ({"done": ...})
+    ou {"error": ...}.
+    """
     try:
         payload = {
             "message": message,
@@ -124,23 +192,38 @@ def make_api_request(message: str, consultation_type: str) -> dict:
             "session_id": st.session_state.session_id
         }
 
-        response = requests.post(
-            f"{API_BASE_URL}/chat",
+        # O timeout de leitura vale entre trechos, não para a resposta inteira
+        with get_http_session().post(
+            f"{API_BASE_URL}/chat/stream",
             json=payload,
-            timeout=240  # 4 minutos timeout - modelo demora ~3 min
-        )
-
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {"error": f"Erro HTTP {response.status_code}: {response.text}"}
+            stream=True,
+            timeout=(10, 240)
+        ) as response:
+            if response.status_code != 200:
+                result["error"] = f"Erro HTTP {response.status_code}: {response.text}"
+                return
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "token" in event:
+                    yield event["token"]
+                elif "error" in event:
+                    result["error"] = event["error"]
+                    return
+                elif event.get("done"):
+                    result.update(event)
+
+        if not result:
+            result["error"] = "A conexão com a API foi encerrada antes do fim da resposta."
 
     except requests.exceptions.Timeout:
-        return {"error": "Timeout: A consulta demorou muito para responder. Tente novamente."}
+        result["error"] = "Timeout: A consulta demorou muito para responder. Tente novamente."
     except requests.exceptions.ConnectionError:
-        return {"error": "Erro de conexão: Não foi possível conectar com a API."}
+        result["error"] = "Erro de conexão: Não foi possível conectar com a API."
     except Exception as e:
-        return {"error": f"Erro inesperado: {str(e)}"}
+        result["error"] = f"Erro inesperado: {str(e)}"
 
 def upload_document_to_api(uploaded_file, consultation_type: str) -> dict:
     """Faz upload de documento PDF para a API"""
@@ -151,7 +234,7 @@ def upload_document_to_api(uploaded_file, consultation_type: str) -> dict:
             "consultation_type": consultation_type
         }
 
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_BASE_URL}/upload-document",
             files=files,
             data=data,
@@ -198,7 +281,7 @@ with st.sidebar:
     # Informações da sessão
     st.markdown("### 📊 Sessão Atual")
     st.write(f"**ID:** `{st.session_state.session_id[:8]}...`")
-    st.write(f"**Mensagens:** {len(st.session_state.messages)}")
+    st.write(f"**Mensagens carregadas:** {len(st.session_state.messages)}")
 
     # Botão para nova sessão
     if st.button("🔄 Nova Sessão"):
@@ -206,6 +289,7 @@ with st.sidebar:
         new_session_id = str(uuid.uuid4())
         st.session_state.session_id = new_session_id
         st.session_state.messages = []
+        st.session_state.history_before_id = None
         st.session_state.history_loaded = False
         st.rerun()
 
@@ -258,25 +342,23 @@ st.markdown("---")
 
 # Exibir histórico de mensagens
 with chat_container:
-    for i, message in enumerate(st.session_state.messages):
-        if message["role"] == "user":
-            # Verificar se é um documento
-            icon = "📄" if message.get("is_document", False) else "👤"
-            title = f"{icon} Você ({message.get('type', 'consultation')}):"
-
-            st.markdown(f"""
-            <div class="chat-message user-message">
-                <strong>{title}</strong><br>
-                {message["content"]}
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="chat-message assistant-message">
-                <strong>⚖️ Nino:</strong><br>
-                {message["content"]}
-            </div>
-            """, unsafe_allow_html=True)
+    # Páginas anteriores do histórico só são buscadas quando pedidas
+    if st.session_state.get("history_before_id") is not None:
+        if st.button("⬆️ Carregar mensagens anteriores"):
+            older, before_id = load_conversation_history(
+                st.session_state.session_id,
+                st.session_state.history_before_id
+            )
+            st.session_state.messages = older + st.session_state.messages
+            st.session_state.history_before_id = before_id
+            st.rerun()
+
+    # Um único bloco com o HTML já renderizado de cada mensagem
+    if st.session_state.messages:
+        st.markdown(
+            "".join(render_message(message) for message in st.session_state.messages),
+            unsafe_allow_html=True
+        )
 
 # Input de mensagem e upload
 with input_container:
@@ -360,30 +442,47 @@ with input_container:
 # Processar envio
 if submit_button and user_input.strip():
     # Adicionar mensagem do usuário
-    st.session_state.messages.append({
+    user_message = {
         "role": "user",
         "content": user_input,
         "type": consultation_type[1],
         "timestamp": datetime.now()
-    })
-
-    # Mostrar loading
-    with st.spinner(f"🤔 Nino está analisando sua {consultation_type[1].lower()}..."):
-        # Fazer requisição para API
-        response = make_api_request(user_input, consultation_type[0])
-
-        if "error" in response:
-            st.error(f"❌ {response['error']}")
+    }
+    st.session_state.messages.append(user_message)
+
+    # Mostrar a resposta à medida que é gerada
+    with chat_container:
+        st.markdown(render_message(user_message), unsafe_allow_html=True)
+        placeholder = st.empty()
+        placeholder.info(f"🤔 Nino está analisando sua {consultation_type[1].lower()}...")
+
+        result = {}
+        parts = []
+        last_render = 0.0
+        for piece in stream_api_request(user_input, consultation_type[0], result):
+            parts.append(piece)
+            now = time.monotonic()
+            if now - last_render >= STREAM_RENDER_INTERVAL:
+                placeholder.markdown(message_html("assistant", "".join(parts) + " ▌"), unsafe_allow_html=True)
+                last_render = now
+
+        response_text = "".join(parts).strip()
+        if "error" in result:
+            placeholder.empty()
+            st.error(f"❌ {result['error']}")
         else:
             # Adicionar resposta do assistente
             st.session_state.messages.append({
                 "role": "assistant",
-                "content": response.get("response", "Desculpe, não consegui processar sua consulta."),
+                "content": response_text or "Desculpe, não consegui processar sua consulta.",
                 "timestamp": datetime.now()
             })
+            if result.get("truncated"):
+                st.session_state.messages[-1]["content"] += " (Resposta interrompida: tempo limite atingido.)"
 
-    # Rerun para atualizar a interface
-    st.rerun()
+    # Rerun para atualizar a interface (sem erro a exibir)
+    if "error" not in result:
+        st.rerun()
 
 # Footer
 st.markdown("---")
@@ -399,12 +498,12 @@ st.markdown("""
 if len(st.session_state.messages) == 0:
     with st.expander("🔍 Status da API", expanded=False):
         try:
-            health_response = requests.get(f"{API_BASE_URL}/health", timeout=5)
+            health_response = get_http_session().get(f"{API_BASE_URL}/health", timeout=5)
             if health_response.status_code == 200:
                 st.success("✅ API conectada e funcionando!")
 
                 # Mostrar informações da API
-                info_response = requests.get(f"{API_BASE_URL}/", timeout=5)
+                info_response = get_http_session().get(f"{API_BASE_URL}/", timeout=5)
                 if info_response.status_code == 200:
                     api_info = info_response.json()
                     st.info(f"📝 {api_info.get('description', 'API do Nino')}")
@@ -0,0 +1,56 @@
+"""
+Ambiente do Alembic: usa o mesmo engine assíncrono da aplicação
+"""
+
+import asyncio
+
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from chatbot_api.core.config import settings
+from chatbot_api.database.search import FTS_TABLE, SEARCH_COLUMN, SEARCH_INDEX
+from chatbot_api.models.database import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Partições de conversation_history são criadas pelo job de manutenção, não pelo autogenerate
+    if type_ == "table" and name.startswith("conversation_history_p"):
+        return False
+    # Índice de busca textual (migração 0002): fora do modelo ORM
+    if type_ == "table" and name.startswith(FTS_TABLE):
+        return False
+    return not (name in (SEARCH_COLUMN, SEARCH_INDEX) and type_ in ("column", "index"))
+
+
+def run_migrations_offline():
+    context.configure(
+        url=settings.database_url,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online():
+    engine = create_async_engine(settings.database_url)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
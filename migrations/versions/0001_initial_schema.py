@@ -0,0 +1,160 @@
+"""Schema inicial com conversation_history particionada por mês
+
+Bancos criados antes das migrações (via create_all) são adotados: as tabelas
+existentes são mantidas e conversation_history é convertida em tabela
+particionada, copiando as linhas para as partições mensais correspondentes.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from datetime import datetime
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from chatbot_api.core.config import settings
+from chatbot_api.database.partitions import (
+    add_months,
+    create_partition_sql,
+    ensure_partitions,
+    is_partitioned,
+    month_start,
+)
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, session_id, user_message, bot_response, timestamp, is_document, document_filename, document_type"
+
+
+def _create_summary_and_idempotency(inspector):
+    if inspector is None or not inspector.has_table("conversation_summary"):
+        op.create_table(
+            "conversation_summary",
+            sa.Column("session_id", sa.String(), primary_key=True),
+            sa.Column("summary", sa.Text(), nullable=False),
+            sa.Column("last_conversation_id", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+    if inspector is None or not inspector.has_table("idempotency_record"):
+        op.create_table(
+            "idempotency_record",
+            sa.Column("endpoint", sa.String(), primary_key=True),
+            sa.Column("key", sa.String(), primary_key=True),
+            sa.Column("request_fingerprint", sa.String(), nullable=False),
+            sa.Column("response", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_idempotency_record_created_at", "idempotency_record", ["created_at"])
+
+
+def _create_plain_history():
+    """Tabela sem particionamento (SQLite e outros bancos de desenvolvimento)"""
+    op.create_table(
+        "conversation_history",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("user_message", sa.Text(), nullable=False),
+        sa.Column("bot_response", sa.Text(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("is_document", sa.Boolean(), nullable=False),
+        sa.Column("document_filename", sa.String(), nullable=True),
+        sa.Column("document_type", sa.String(), nullable=True),
+    )
+    op.create_index("idx_session_timestamp", "conversation_history", ["session_id", "timestamp"])
+    op.create_index("idx_session_documents", "conversation_history", ["session_id", "is_document"])
+
+
+def _create_partitioned_history():
+    # A chave primária de uma tabela particionada precisa incluir a coluna de partição
+    op.execute("CREATE SEQUENCE IF NOT EXISTS conversation_history_id_seq")
+    op.execute("""
+        CREATE TABLE conversation_history (
+            id INTEGER NOT NULL DEFAULT nextval('conversation_history_id_seq'),
+            session_id VARCHAR NOT NULL,
+            user_message TEXT NOT NULL,
+            bot_response TEXT NOT NULL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            is_document BOOLEAN NOT NULL DEFAULT false,
+            document_filename VARCHAR,
+            document_type VARCHAR,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE conversation_history_id_seq OWNED BY conversation_history.id")
+    op.execute("CREATE TABLE conversation_history_default PARTITION OF conversation_history DEFAULT")
+    # Criados no pai, os índices se propagam para cada partição; session_id e
+    # timestamp isolados ficam cobertos por idx_session_timestamp e pela poda de partições
+    op.execute("CREATE INDEX idx_session_timestamp ON conversation_history (session_id, timestamp)")
+    op.execute("CREATE INDEX idx_session_documents ON conversation_history (session_id, is_document)")
+
+
+def _upgrade_offline():
+    """Geração de SQL (alembic upgrade head --sql): assume um banco vazio"""
+    _create_summary_and_idempotency(None)
+    if op.get_context().dialect.name != "postgresql":
+        _create_plain_history()
+        return
+
+    _create_partitioned_history()
+    current = month_start(datetime.utcnow())
+    for offset in range(settings.partition_months_ahead + 1):
+        op.execute(create_partition_sql(add_months(current, offset)))
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        _upgrade_offline()
+        return
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    _create_summary_and_idempotency(inspector)
+
+    if bind.dialect.name != "postgresql":
+        if not inspector.has_table("conversation_history"):
+            _create_plain_history()
+        return
+
+    if not inspector.has_table("conversation_history"):
+        _create_partitioned_history()
+        ensure_partitions(bind, settings.partition_months_ahead)
+        return
+
+    if is_partitioned(bind):
+        return
+
+    # Tabela criada por create_all: converter para particionada preservando os dados
+    oldest = bind.execute(sa.text("SELECT min(timestamp) FROM conversation_history")).scalar()
+    op.execute("ALTER TABLE conversation_history RENAME TO conversation_history_legacy")
+    op.execute("ALTER TABLE conversation_history_legacy RENAME CONSTRAINT conversation_history_pkey TO conversation_history_legacy_pkey")
+    for index in ("idx_session_timestamp", "idx_session_documents"):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    op.execute("ALTER TABLE conversation_history_legacy ALTER COLUMN id DROP DEFAULT")
+
+    _create_partitioned_history()
+    ensure_partitions(bind, settings.partition_months_ahead, since=oldest)
+
+    op.execute(f"""
+        INSERT INTO conversation_history ({COLUMNS})
+        SELECT id, session_id, user_message, bot_response,
+               COALESCE(timestamp, now() AT TIME ZONE 'utc'), is_document, document_filename, document_type
+        FROM conversation_history_legacy
+    """)
+    op.execute(
+        "SELECT setval('conversation_history_id_seq', "
+        "(SELECT COALESCE(max(id), 0) + 1 FROM conversation_history), false)"
+    )
+    op.execute("DROP TABLE conversation_history_legacy")
+
+
+def downgrade() -> None:
+    op.drop_table("conversation_history")
+    op.execute("DROP SEQUENCE IF EXISTS conversation_history_id_seq")
+    op.drop_table("idempotency_record")
+    op.drop_table("conversation_summary")
@@ -0,0 +1,38 @@
+"""Índice de busca textual em conversation_history
+
+PostgreSQL: coluna gerada search_vector (tsvector 'portuguese') com índice
+GIN, propagados para todas as partições. SQLite: tabela FTS5 de conteúdo
+externo com triggers de sincronização. Ver database/search.py.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import context, op
+
+from chatbot_api.database.search import FTS_TABLE, SEARCH_COLUMN, SEARCH_INDEX, TABLE, ensure_search_index, search_index_sql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        for statement in search_index_sql(op.get_context().dialect.name):
+            op.execute(statement)
+        return
+    ensure_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    dialect = op.get_context().dialect.name
+    if dialect == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {SEARCH_INDEX}")
+        op.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS {SEARCH_COLUMN}")
+    elif dialect == "sqlite":
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
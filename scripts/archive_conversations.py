@@ -0,0 +1,39 @@
+"""
+Job de retenção de conversation_history.
+
+Sessões sem mensagens há mais de RETENTION_DAYS dias são gravadas em
+ARCHIVE_DIR como JSONL comprimido (gzip) e removidas do banco. No PostgreSQL,
+partições mensais que ficaram vazias são removidas e as dos próximos
+PARTITION_MONTHS_AHEAD meses são criadas. Execute diariamente (cron).
+
+Uso:
+    uv run python scripts/archive_conversations.py --retention-days 365 --archive-dir /mnt/cold/nino
+    uv run python scripts/archive_conversations.py --dry-run
+"""
+
+import argparse
+import asyncio
+import json
+
+from chatbot_api.database.retention import archive_stale_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, help="Padrão: Settings.retention_days")
+    parser.add_argument("--archive-dir", help="Padrão: Settings.archive_dir")
+    parser.add_argument("--batch-sessions", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="Apenas contar as sessões que seriam arquivadas")
+    args = parser.parse_args()
+
+    result = asyncio.run(archive_stale_sessions(
+        retention_days=args.retention_days,
+        archive_dir=args.archive_dir,
+        batch_sessions=args.batch_sessions,
+        dry_run=args.dry_run
+    ))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
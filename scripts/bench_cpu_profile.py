@@ -0,0 +1,130 @@
+"""
+Compara as variantes do perfil de CPU do backend huggingface.
+
+Carrega o modelo pelo HuggingFaceBackend (o mesmo caminho da API) e mede,
+com decodificação gulosa sobre os mesmos prompts, a atenção eager e sdpa,
+com e sem torch.compile, opcionalmente com diferentes números de threads.
+Reporta tokens/s, speedup sobre a primeira variante (eager) e paridade: a
+fração dos prompts cujos tokens gerados são idênticos aos da referência.
+
+--tiny cria um modelo Llama minúsculo (pesos aleatórios, tokenizer BPE
+treinado na hora) num diretório temporário: sem download, roda em segundos
+e serve para validar speedup e paridade sem o Jurema-7B.
+
+Uso:
+    uv run python scripts/bench_cpu_profile.py --tiny
+    uv run python scripts/bench_cpu_profile.py --model Jurema-br/Jurema-7B --max-new-tokens 32 --threads 4 8
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+TINY_TEXTS = [
+    "Qual o prazo de prescrição para cobrança de dívidas no Código Civil?",
+    "Como contestar uma multa administrativa de trânsito?",
+    "Quais são os direitos do consumidor em caso de produto com defeito?",
+    "O que caracteriza o abandono de emprego segundo a CLT?",
+    "Quando cabe mandado de segurança contra ato de autoridade pública?",
+    "O contrato de locação pode ser rescindido antes do prazo?",
+]
+
+
+def build_tiny_model(path: str):
+    """Modelo Llama de ~4M parâmetros e tokenizer BPE de 512 tokens, salvos em `path`"""
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(TINY_TEXTS * 10, trainers.BpeTrainer(
+        vocab_size=512,
+        special_tokens=["<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    ))
+    fast = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>", pad_token="</s>")
+    fast.save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(fast),
+        hidden_size=256,
+        intermediate_size=688,
+        num_hidden_layers=4,
+        num_attention_heads=8,
+        num_key_value_heads=4,
+        max_position_embeddings=1024,
+        bos_token_id=fast.bos_token_id,
+        eos_token_id=fast.eos_token_id,
+        pad_token_id=fast.pad_token_id,
+    )
+    LlamaForCausalLM(config).save_pretrained(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--model", help="Diretório local ou modelo do Hugging Face Hub (padrão: MODEL_NAME)")
+    source.add_argument("--tiny", action="store_true", help="Modelo minúsculo gerado localmente")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, nargs="+", help="Repetir as variantes com estes números de threads")
+    parser.add_argument("--no-compile", action="store_true", help="Não medir as variantes com torch.compile")
+    parser.add_argument("--compile-mode", default="default", choices=["default", "reduce-overhead", "max-autotune"])
+    parser.add_argument("--output", help="Salvar resultados em JSON")
+    args = parser.parse_args()
+
+    # Importados depois do argparse: --help não paga a importação do torch
+    import torch
+
+    from chatbot_api.core.config import settings
+    from chatbot_api.services.backends.cpu_profile import CPUProfile, ProfileVariant, compare_profiles, format_report
+    from chatbot_api.services.backends.huggingface import HuggingFaceBackend
+
+    model_name = args.model or settings.model_name
+    if args.tiny:
+        model_name = tempfile.mkdtemp(prefix="tiny-llama-")
+        build_tiny_model(model_name)
+
+    # Sem compile e com a atenção padrão: as variantes são aplicadas por compare_profiles
+    backend = HuggingFaceBackend(
+        model_name=model_name,
+        max_new_tokens=args.max_new_tokens,
+        token=settings.huggingface_hub_token,
+        cpu_profile=CPUProfile(attn_implementation="eager"),
+    )
+    if backend.device != "cpu":
+        raise SystemExit(f"Este benchmark mede inferência em CPU (device detectado: {backend.device})")
+
+    variants = []
+    for threads in args.threads or [None]:
+        variants += [ProfileVariant("eager", threads=threads), ProfileVariant("sdpa", threads=threads)]
+        if not args.no_compile:
+            variants.append(ProfileVariant("sdpa", compile=True, threads=threads))
+
+    print(f"modelo: {model_name}")
+    print(f"torch {torch.__version__}, {os.cpu_count()} CPUs, {torch.get_num_threads()} threads intra-op\n")
+    rows = compare_profiles(
+        backend.hf_model,
+        backend.tokenizer,
+        TINY_TEXTS if args.tiny else TINY_TEXTS[:3],
+        variants,
+        max_new_tokens=args.max_new_tokens,
+        compile_mode=args.compile_mode
+    )
+    print(format_report(rows))
+
+    diverged = [row["variant"] for row in rows if row["parity"] < 1]
+    if diverged:
+        # Kernels diferentes somam em outra ordem: empates numéricos podem trocar um token
+        print(f"\nsaída diferente da referência em: {', '.join(diverged)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"model": model_name, "max_new_tokens": args.max_new_tokens, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
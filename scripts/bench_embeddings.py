@@ -0,0 +1,82 @@
+"""
+Mede a vazão do EmbeddingService com chamadores concorrentes.
+
+Cada chamador pede o embedding de um texto por vez (como numa requisição).
+São comparados:
+- sem micro-lote (batch_size=1): uma chamada ao encoder por texto;
+- com micro-lote: pedidos concorrentes codificados juntos;
+- repetição: os mesmos textos de novo, servidos pelo cache.
+
+Uso:
+    uv run python scripts/bench_embeddings.py --texts 2000 --concurrency 64
+    uv run python scripts/bench_embeddings.py --encoder hashing
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from chatbot_api.core.config import settings
+from chatbot_api.services.embeddings import EmbeddingService, HashingEncoder, TransformersEncoder
+
+WORDS = (
+    "contrato prazo prescrição cobrança dívida multa recurso administrativo servidor processo "
+    "disciplinar licitação petição inicial responsabilidade civil estado código artigo lei"
+).split()
+
+
+def make_texts(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(8, 40))) + f" #{index}" for index in range(count)]
+
+
+async def run(service: EmbeddingService, texts: list, concurrency: int) -> float:
+    queue = list(texts)
+
+    async def caller():
+        while queue:
+            await service.embed_one(queue.pop())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return len(texts) / (time.perf_counter() - start)
+
+
+async def main_async(args):
+    if args.encoder == "hashing":
+        encoder = HashingEncoder()
+    else:
+        encoder = TransformersEncoder(settings.embedding_model, max_length=settings.embedding_max_length)
+        encoder.encode(["aquecimento"])
+
+    texts = make_texts(args.texts)
+
+    unbatched = EmbeddingService(encoder, cache_size=args.texts, batch_size=1, max_wait_ms=0)
+    unbatched_rate = await run(unbatched, texts, args.concurrency)
+
+    batched = EmbeddingService(encoder, cache_size=args.texts, batch_size=args.batch_size, max_wait_ms=args.max_wait_ms)
+    batched_rate = await run(batched, texts, args.concurrency)
+    cached_rate = await run(batched, texts, args.concurrency)
+
+    print(f"encoder: {encoder.name} | textos: {args.texts} | chamadores: {args.concurrency}\n")
+    print(f"{'':<32}{'textos/s':>12}")
+    print(f"{'sem micro-lote':<32}{unbatched_rate:>12.0f}")
+    print(f"{f'micro-lote ({args.batch_size})':<32}{batched_rate:>12.0f}")
+    print(f"{'repetição (cache)':<32}{cached_rate:>12.0f}")
+    print(f"\n{batched.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encoder", choices=["transformers", "hashing"], default=settings.embedding_encoder)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=settings.embedding_batch_size)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.embedding_max_wait_ms)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
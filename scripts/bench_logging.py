@@ -0,0 +1,112 @@
+"""
+Mede o custo de logging por requisição na thread que atende a requisição.
+
+Compara o formato antigo (f-strings com prévias, StreamHandler síncrono) com
+o pipeline de core/log.py (QueueHandler sem formatação + listener JSON em
+outra thread, prévias amostradas e redação). Ambos escrevem em /dev/null.
+
+São reportados dois números:
+- caminho da requisição: custo na thread que emite o log, com o listener
+  parado (no servidor, o listener roda enquanto o event loop espera I/O);
+- CPU total: emissão + formatação + escrita, somando todas as threads.
+
+Uso:
+    uv run python scripts/bench_logging.py --requests 20000
+"""
+
+import argparse
+import logging
+import os
+import queue
+import time
+import uuid
+from logging.handlers import QueueListener
+
+from chatbot_api.core.log import (
+    ContextFilter,
+    DeferredQueueHandler,
+    StructuredFormatter,
+    previews_enabled,
+    start_request,
+)
+
+MESSAGE = "Qual o prazo de prescrição para cobrança de dívidas no Código Civil? " * 4
+RESPONSE = "Segundo o art. 206, § 5º, I, do Código Civil, prescreve em cinco anos... " * 10
+
+
+def legacy_request(logger: logging.Logger, session_id: str):
+    logger.info(f"🔵 CHAT REQUEST | Session: {session_id[:8]}... | Type: consultation | Message: {MESSAGE[:100]}{'...' if len(MESSAGE) > 100 else ''}")
+    logger.info(f"🔄 GENERATING RESPONSE | Session: {session_id[:8]}...")
+    response_preview = RESPONSE[:150] + "..." if len(RESPONSE) > 150 else RESPONSE
+    logger.info(f"✅ RESPONSE SENT | Session: {session_id[:8]}... | Time: 1.23s | Length: {len(RESPONSE)} chars | Preview: {response_preview}")
+
+
+def structured_request(logger: logging.Logger, session_id: str):
+    start_request(uuid.uuid4().hex)
+    logger.info("Chat request", extra={
+        "session_id": session_id,
+        "consultation_type": "consultation",
+        "message_chars": len(MESSAGE),
+        **({"user_message": MESSAGE[:100]} if previews_enabled() else {}),
+    })
+    logger.info("Chat response sent", extra={
+        "session_id": session_id,
+        "seconds": 1.23,
+        "response_chars": len(RESPONSE),
+        "truncated": False,
+        **({"response": RESPONSE[:150]} if previews_enabled() else {}),
+    })
+
+
+def emit_all(emit, logger: logging.Logger, requests: int) -> float:
+    session_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    for _ in range(requests):
+        emit(logger, session_id)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w", encoding="utf-8")
+
+    legacy = logging.getLogger("bench.legacy")
+    legacy.propagate = False
+    legacy.setLevel(logging.INFO)
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    legacy.addHandler(handler)
+
+    cpu_start = time.process_time()
+    legacy_path = emit_all(legacy_request, legacy, args.requests)
+    legacy_cpu = (time.process_time() - cpu_start) / args.requests * 1e6
+
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(devnull)
+    output.setFormatter(StructuredFormatter("json", redact_fields=True))
+    listener = QueueListener(log_queue, output)
+
+    structured = logging.getLogger("bench.structured")
+    structured.propagate = False
+    structured.setLevel(logging.INFO)
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    structured.addHandler(queue_handler)
+
+    cpu_start = time.process_time()
+    structured_path = emit_all(structured_request, structured, args.requests)
+    listener.start()
+    listener.stop()
+    structured_cpu = (time.process_time() - cpu_start) / args.requests * 1e6
+
+    print(f"{'':<30}{'caminho (µs/req)':>18}{'CPU total (µs/req)':>20}")
+    print(f"{'antigo (f-string, síncrono)':<30}{legacy_path:>18.1f}{legacy_cpu:>20.1f}")
+    print(f"{'estruturado (fila + JSON)':<30}{structured_path:>18.1f}{structured_cpu:>20.1f}")
+    print(f"\nRedução no caminho da requisição: {(1 - structured_path / legacy_path) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Mede a exportação/importação em massa de conversation_history.
+
+Popula um banco descartável (SQLite temporário, ou --database-url) com
+--rows mensagens e mede, para cada formato:
+- exportação de 10% e de 100% das linhas (vazão, tamanho do arquivo e pico
+  de RSS acima do início: com memória constante, o pico não cresce com o total);
+- importação do arquivo completo numa tabela vazia.
+
+Uso:
+    uv run python scripts/bench_transfer.py --rows 1000000
+    uv run python scripts/bench_transfer.py --rows 200000 --database-url postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class PeakRSS:
+    """Amostra o RSS do processo numa thread enquanto o bloco executa"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.base = rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def growth_mb(self) -> float:
+        return max(0, self.peak - self.base) / 1024 / 1024
+
+
+WORDS = (
+    "contrato prazo prescrição cobrança dívida multa recurso administrativo servidor processo "
+    "disciplinar licitação petição inicial responsabilidade civil estado código artigo lei"
+).split()
+
+
+async def seed(rows: int, sessions: int, batch_rows: int, start: datetime):
+    from sqlalchemy import insert
+
+    from chatbot_api.database.database import engine
+    from chatbot_api.database.transfer import HISTORY_TABLE
+    from chatbot_api.models.database import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    rng = random.Random(0)
+    step = timedelta(days=30) / rows
+    for offset in range(0, rows, batch_rows):
+        batch = [
+            {
+                "session_id": f"sessao-{rng.randrange(sessions)}",
+                "user_message": " ".join(rng.choices(WORDS, k=rng.randint(5, 30))),
+                "bot_response": " ".join(rng.choices(WORDS, k=rng.randint(30, 150))),
+                "timestamp": start + step * index,
+                "is_document": False,
+            }
+            for index in range(offset, min(rows, offset + batch_rows))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(HISTORY_TABLE), batch)
+
+
+async def main_async(args):
+    from sqlalchemy import delete, func, select
+
+    from chatbot_api.database.database import engine
+    from chatbot_api.database.transfer import EXTENSIONS, HISTORY_TABLE, export_history, import_history, parquet_available
+
+    start = datetime(2025, 1, 1)
+    began = time.perf_counter()
+    await seed(args.rows, args.sessions, args.batch_rows, start)
+    print(f"banco: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{args.rows} linhas inseridas em {time.perf_counter() - began:.1f}s\n")
+
+    formats = ["parquet", "jsonl"] if parquet_available() else ["jsonl"]
+    workdir = tempfile.mkdtemp(prefix="bench-transfer-")
+    print(f"{'':<28}{'linhas':>10}{'linhas/s':>12}{'MB':>10}{'pico RSS +MB':>14}")
+
+    for fmt in formats:
+        path = os.path.join(workdir, f"export{EXTENSIONS[fmt]}")
+        # Aquecimento: imports (pyarrow) e buffers iniciais fora da medição
+        await export_history(path, start=start, end=start + timedelta(hours=1), fmt=fmt, batch_rows=args.batch_rows)
+        # 10% das linhas (3 dias de 30) e depois todas: o pico de memória deve ser o mesmo
+        for label, end in (("10%", start + timedelta(days=3)), ("100%", None)):
+            with PeakRSS() as peak:
+                result = await export_history(path, start=start, end=end, fmt=fmt, batch_rows=args.batch_rows)
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f"{f'exportar {fmt} {label}':<28}{result['rows']:>10}{result['rows_per_second']:>12}{size:>10.1f}{peak.growth_mb:>14.1f}")
+
+        async with engine.begin() as conn:
+            await conn.execute(delete(HISTORY_TABLE))
+        with PeakRSS() as peak:
+            result = await import_history(path, keep_ids=True, batch_rows=args.batch_rows)
+        async with engine.connect() as conn:
+            total = (await conn.execute(select(func.count()).select_from(HISTORY_TABLE))).scalar_one()
+        assert total == args.rows, f"importadas {total} de {args.rows} linhas"
+        print(f"{f'importar {fmt}':<28}{result['rows']:>10}{result['rows_per_second']:>12}{'':>10}{peak.growth_mb:>14.1f}")
+
+    if not parquet_available():
+        print("\npyarrow não instalado: apenas JSONL (uv sync --extra export)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--batch-rows", type=int, default=10000)
+    parser.add_argument("--database-url", help="Banco descartável (as tabelas são recriadas); padrão: SQLite temporário")
+    args = parser.parse_args()
+
+    # Antes de importar chatbot_api: o engine é criado a partir de Settings
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Compara qualidade e desempenho entre backends de inferência.
+
+Gera respostas para o mesmo conjunto de prompts em cada backend e reporta
+tokens/s e a similaridade (ROUGE-L F1) de cada resposta com a do backend de
+referência (o primeiro da lista). A geração roda no modo determinístico:
+decodificação gulosa (--temperature 0, o padrão) ou amostragem com semente
+fixa (--seed). O primeiro prompt é gerado de novo no fim e a coluna "repete"
+confirma que a saída foi reproduzida; sem isso, tokens/s e ROUGE-L variam
+entre execuções por causa da amostragem, não do backend.
+
+Uso:
+    uv run python scripts/benchmark_backends.py --backends huggingface gguf
+    uv run python scripts/benchmark_backends.py --backends huggingface gguf --temperature 0.7 --seed 42
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import List
+
+from chatbot_api.core.config import settings
+from chatbot_api.prompts.legal_prompts import PROMPT_REGISTRY
+from chatbot_api.services.backends.generation import GenerationConfig
+
+DEFAULT_QUERIES = [
+    "Qual o prazo de prescrição para cobrança de dívidas no Código Civil?",
+    "Como contestar uma multa administrativa de trânsito?",
+    "Quais são os direitos do consumidor em caso de produto com defeito?",
+    "O que caracteriza o abandono de emprego segundo a CLT?",
+    "Quando cabe mandado de segurança contra ato de autoridade pública?",
+]
+
+
+def build_backend(name: str, generation: GenerationConfig):
+    if name == "huggingface":
+        from chatbot_api.services.backends.huggingface import HuggingFaceBackend
+
+        return HuggingFaceBackend(
+            model_name=settings.model_name,
+            max_new_tokens=settings.max_new_tokens,
+            token=settings.huggingface_hub_token,
+            optimized=settings.hf_optimized,
+            generation=generation,
+        )
+    if name == "gguf":
+        from chatbot_api.services.backends.gguf import GGUFBackend
+
+        return GGUFBackend(
+            model_path=settings.gguf_model_path,
+            model_name=settings.model_name,
+            max_new_tokens=settings.max_new_tokens,
+            n_ctx=settings.gguf_n_ctx,
+            n_threads=settings.gguf_n_threads,
+            n_batch=settings.gguf_n_batch,
+            generation=generation,
+        )
+    raise ValueError(f"Backend não suportado no benchmark: {name}")
+
+
+def rouge_l_f1(reference: str, candidate: str) -> float:
+    """ROUGE-L F1 por palavras (subsequência comum mais longa)"""
+    ref, cand = reference.split(), candidate.split()
+    if not ref or not cand:
+        return 0.0
+
+    previous = [0] * (len(cand) + 1)
+    for ref_word in ref:
+        current = [0]
+        for j, cand_word in enumerate(cand):
+            current.append(previous[j] + 1 if ref_word == cand_word else max(previous[j + 1], current[j]))
+        previous = current
+
+    lcs = previous[-1]
+    if lcs == 0:
+        return 0.0
+    precision, recall = lcs / len(cand), lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def run_backend(name: str, prompts: List[str], generation: GenerationConfig, max_new_tokens: int) -> dict:
+    load_start = time.perf_counter()
+    backend = build_backend(name, generation)
+    load_time = time.perf_counter() - load_start
+
+    # Aquecimento (alocação de buffers, page cache dos pesos)
+    backend.generate(prompts[0], max_new_tokens=8)
+
+    outputs, rates, latencies = [], [], []
+    for prompt in prompts:
+        start = time.perf_counter()
+        output = backend.generate(prompt, max_new_tokens=max_new_tokens)
+        elapsed = time.perf_counter() - start
+        outputs.append(output)
+        latencies.append(elapsed)
+        rates.append(backend.count_tokens(output) / elapsed if elapsed > 0 else 0.0)
+
+    # Mesmo prompt, mesmos parâmetros: a saída deve ser idêntica
+    repeated = backend.generate(prompts[0], max_new_tokens=max_new_tokens) == outputs[0]
+
+    return {
+        "backend": name,
+        "deterministic": repeated,
+        "load_seconds": round(load_time, 2),
+        "tokens_per_second": round(statistics.mean(rates), 2),
+        "mean_latency_seconds": round(statistics.mean(latencies), 2),
+        "outputs": outputs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["huggingface", "gguf"])
+    parser.add_argument("--queries-file", help="Arquivo com uma consulta por linha")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--temperature", type=float, default=0.0, help="0 = decodificação gulosa")
+    parser.add_argument("--seed", type=int, help="Semente da amostragem (obrigatória com --temperature > 0)")
+    parser.add_argument("--output", help="Salvar resultados completos em JSON")
+    args = parser.parse_args()
+
+    generation = GenerationConfig(temperature=args.temperature, seed=args.seed)
+    if not generation.deterministic:
+        parser.error("com --temperature > 0, informe --seed para que as execuções sejam comparáveis")
+
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    prompts = [PROMPT_REGISTRY.build("consultation", query).text for query in queries]
+
+    results = [run_backend(name, prompts, generation, args.max_new_tokens) for name in args.backends]
+    reference = results[0]
+
+    print(f"\nparâmetros: {generation.key()}")
+    print(f"{'backend':<14}{'load (s)':>10}{'tok/s':>10}{'lat (s)':>10}{'repete':>8}{'ROUGE-L vs ' + reference['backend']:>28}")
+    for result in results:
+        scores = [rouge_l_f1(ref, out) for ref, out in zip(reference["outputs"], result["outputs"])]
+        result["rouge_l_vs_reference"] = round(statistics.mean(scores), 3)
+        print(
+            f"{result['backend']:<14}{result['load_seconds']:>10}{result['tokens_per_second']:>10}"
+            f"{result['mean_latency_seconds']:>10}{'sim' if result['deterministic'] else 'não':>8}"
+            f"{result['rouge_l_vs_reference']:>28}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"queries": queries, "generation": generation.to_dict(), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
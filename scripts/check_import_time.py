@@ -0,0 +1,97 @@
+"""
+Orçamento de tempo de importação da API.
+
+Executa `python -X importtime -c "import chatbot_api.api.main"` e falha
+(código de saída 1) se a importação passar do orçamento ou se carregar
+módulos pesados que só o backend de inferência deve importar (torch,
+transformers, llama_cpp, ...). Health checks, /history e scripts não
+devem pagar esse custo.
+
+Cada medição roda em um processo novo; vale a menor das --runs medições.
+
+Uso:
+    uv run python scripts/check_import_time.py
+    uv run python scripts/check_import_time.py --budget-ms 1500 --top 15
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, Tuple
+
+MODULE = "chatbot_api.api.main"
+
+# Importados apenas quando um backend, o OCR ou a leitura de PDF é usado
+FORBIDDEN = ("torch", "transformers", "llama_cpp", "peft", "accelerate", "bitsandbytes", "pypdfium2", "pytesseract", "PyPDF2")
+
+# Orçamento padrão (ms) da importação do módulo; IMPORT_TIME_BUDGET_MS o ajusta
+# conforme a máquina (e liga a verificação de tempo em tests/test_import_time.py)
+BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    """Devolve (módulo, µs próprios, µs acumulados) de cada módulo importado"""
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Falha ao importar {module}:\n{result.stderr}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return modules
+
+
+def total_us(modules: List[Tuple[str, int, int]], module: str) -> int:
+    """Tempo acumulado (µs) da importação de `module`"""
+    return next(cumulative for name, _, cumulative in modules if name == module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default=MODULE)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="Tempo máximo de importação do módulo")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Módulos mais caros a listar")
+    args = parser.parse_args()
+
+    modules = min((measure(args.module) for _ in range(args.runs)), key=lambda run: total_us(run, args.module))
+    total_ms = total_us(modules, args.module) / 1000
+    print(f"{args.module}: {total_ms:.0f} ms (orçamento: {args.budget_ms:.0f} ms)\n")
+
+    print(f"{'módulo':<45}{'próprio (ms)':>14}{'acumulado (ms)':>16}")
+    top_level = [entry for entry in modules if "." not in entry[0] or entry[0].startswith("chatbot_api")]
+    for name, own, cumulative in sorted(top_level, key=lambda entry: entry[2], reverse=True)[:args.top]:
+        print(f"{name:<45}{own / 1000:>14.1f}{cumulative / 1000:>16.1f}")
+
+    loaded = {name.split(".")[0] for name, _, _ in modules}
+    forbidden = [name for name in FORBIDDEN if name in loaded]
+
+    failed = False
+    if forbidden:
+        print(f"\nERRO: módulos pesados importados com a API: {', '.join(forbidden)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\nERRO: importação acima do orçamento ({total_ms:.0f} ms > {args.budget_ms:.0f} ms)")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Converte o Jurema-7B (Hugging Face) para GGUF quantizado em 4/5 bits.
+
+Requer um checkout compilado do llama.cpp (convert_hf_to_gguf.py e llama-quantize).
+
+Uso:
+    uv run python scripts/convert_to_gguf.py --llama-cpp-dir ~/llama.cpp --quant Q4_K_M
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from huggingface_hub import snapshot_download
+
+QUANT_TYPES = ["Q4_K_M", "Q4_K_S", "Q5_K_M", "Q5_K_S", "Q8_0"]
+
+
+def find_quantize_binary(llama_cpp_dir: str) -> str:
+    for candidate in ("build/bin/llama-quantize", "llama-quantize", "build/bin/quantize", "quantize"):
+        path = os.path.join(llama_cpp_dir, candidate)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"llama-quantize não encontrado em {llama_cpp_dir}; compile o llama.cpp primeiro")
+
+
+def run(command: list):
+    print(f"$ {' '.join(command)}")
+    subprocess.run(command, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "Jurema-br/Jurema-7B"))
+    parser.add_argument("--llama-cpp-dir", required=True, help="Checkout compilado do llama.cpp")
+    parser.add_argument("--quant", default="Q4_K_M", choices=QUANT_TYPES)
+    parser.add_argument("--output-dir", default="models")
+    parser.add_argument("--keep-f16", action="store_true", help="Manter o GGUF intermediário em f16")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    base_name = args.model.split("/")[-1].lower()
+    f16_path = os.path.join(args.output_dir, f"{base_name}-f16.gguf")
+    quant_path = os.path.join(args.output_dir, f"{base_name}-{args.quant}.gguf")
+
+    print(f"📥 Baixando {args.model}...")
+    model_dir = snapshot_download(args.model, token=os.getenv("HUGGINGFACE_HUB_TOKEN"))
+
+    print("🔄 Convertendo para GGUF f16...")
+    run([
+        sys.executable,
+        os.path.join(args.llama_cpp_dir, "convert_hf_to_gguf.py"),
+        model_dir,
+        "--outtype", "f16",
+        "--outfile", f16_path,
+    ])
+
+    print(f"🗜️ Quantizando para {args.quant}...")
+    run([find_quantize_binary(args.llama_cpp_dir), f16_path, quant_path, args.quant])
+
+    if not args.keep_f16:
+        os.remove(f16_path)
+
+    print(f"✅ Modelo pronto: {quant_path}")
+    print(f"   Configure INFERENCE_BACKEND=gguf e GGUF_MODEL_PATH={quant_path}")
+
+
+if __name__ == "__main__":
+    main()
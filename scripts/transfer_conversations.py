@@ -0,0 +1,55 @@
+"""
+Exportação e importação em massa de conversation_history.
+
+A exportação filtra por intervalo de datas ([--start, --end)) e/ou sessões e
+grava Parquet (com o extra `export`, pyarrow) ou JSONL gzip. A importação aceita
+os dois formatos, inclusive os arquivos de scripts/archive_conversations.py.
+
+Uso:
+    uv run python scripts/transfer_conversations.py export conversas-2025-01.parquet --start 2025-01-01 --end 2025-02-01
+    uv run python scripts/transfer_conversations.py export sessao.jsonl.gz --format jsonl --session-id abc --session-id def
+    uv run python scripts/transfer_conversations.py import conversas-2025-01.parquet --keep-ids
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime
+
+from chatbot_api.database.transfer import FORMATS, export_history, import_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Exportar mensagens para um arquivo")
+    export.add_argument("path")
+    export.add_argument("--start", type=datetime.fromisoformat, help="Data/hora inicial (inclusive)")
+    export.add_argument("--end", type=datetime.fromisoformat, help="Data/hora final (exclusive)")
+    export.add_argument("--session-id", action="append", dest="session_ids", help="Pode ser repetido")
+    export.add_argument("--format", choices=FORMATS, help="Padrão: pela extensão do arquivo, ou parquet se o pyarrow estiver instalado")
+    export.add_argument("--batch-rows", type=int, default=10000)
+
+    imported = commands.add_parser("import", help="Importar mensagens de um arquivo exportado")
+    imported.add_argument("path")
+    imported.add_argument("--keep-ids", action="store_true", help="Manter os ids originais (restauração)")
+    imported.add_argument("--batch-rows", type=int, default=10000)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        result = asyncio.run(export_history(
+            args.path,
+            start=args.start,
+            end=args.end,
+            session_ids=args.session_ids,
+            fmt=args.format,
+            batch_rows=args.batch_rows
+        ))
+    else:
+        result = asyncio.run(import_history(args.path, keep_ids=args.keep_ids, batch_rows=args.batch_rows))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
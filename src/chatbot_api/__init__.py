@@ -1,2 +1,4 @@
 def main() -> None:
-    print("Hello from chatbot-api!")
+    from .api.server import main as serve
+
+    serve()
@@ -1,30 +1,52 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Request, Response, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from contextlib import asynccontextmanager
-import uvicorn
+from datetime import datetime
+import asyncio
+import json
 import logging
+import os
+import secrets
+import tempfile
 import time
-from typing import Optional
+import uuid
+from typing import Optional, Callable, Awaitable, TypeVar, AsyncIterator, List, Literal
 
-from ..models.schemas import ChatRequest, ChatResponse
+from .middleware import RequestContextMiddleware, UploadSizeLimitMiddleware
+from ..models.schemas import ChatRequest, ChatResponse, AdapterLoadRequest
 from ..services.chatbot import ChatbotService
-from ..services.document_service import DocumentService
+from ..services.backends import AdapterError, GenerationControl
+from ..services.backends.queued import QueueBackend
+from ..services.document_service import DocumentService, InvalidPDFError
+from ..services.ocr_service import OCRService
+from ..services.idempotency import IdempotencyStore, IdempotencyConflictError
+from ..services.memory_governor import MemoryPressureError, get_memory_governor
 from ..database.database import init_db, AsyncSessionLocal
+from ..database import transfer
+from ..database.database import engine
+from ..database.search import SearchUnavailableError, search_history
 from ..models.database import ConversationHistory
 from ..core.config import settings
+from ..core.log import previews_enabled, setup_logging
 from sqlalchemy import select
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logs estruturados, formatados e escritos fora do event loop
+setup_logging()
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    # Observa o RSS e degrada o serviço (caches, lotes, documentos) antes do OOM
+    governor = get_memory_governor()
+    watcher = asyncio.create_task(governor.watch()) if governor.enabled else None
     yield
+    if watcher is not None:
+        watcher.cancel()
+    if ocr_service is not None:
+        ocr_service.shutdown()
 
 
 app = FastAPI(
@@ -42,7 +64,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Rejeita uploads grandes antes de receber o corpo inteiro (margem para o envelope multipart)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=DocumentService.MAX_FILE_SIZE + 64 * 1024,
+)
+
+# Mais externo: o request_id vale para tudo o que roda na requisição
+app.add_middleware(RequestContextMiddleware)
+
 chatbot_service = None
+ocr_service = None
+idempotency_store = IdempotencyStore(ttl_hours=settings.idempotency_ttl_hours)
 
 
 def get_chatbot_service():
@@ -52,6 +85,19 @@ def get_chatbot_service():
     return chatbot_service
 
 
+def get_ocr_service() -> Optional[OCRService]:
+    global ocr_service
+    if ocr_service is None and settings.ocr_enabled and OCRService.is_available():
+        ocr_service = OCRService(
+            workers=settings.ocr_workers,
+            language=settings.ocr_language,
+            dpi=settings.ocr_dpi,
+            cache_size=settings.ocr_cache_size
+        )
+        get_memory_governor().register_lru("ocr_pages", ocr_service._cache)
+    return ocr_service
+
+
 @app.get("/")
 async def root():
     return {
@@ -67,94 +113,320 @@ async def root():
     }
 
 
+T = TypeVar("T")
+
+
+async def run_until_disconnected(http_request: Request, work: Awaitable[T]) -> T:
+    """
+    Executa `work` enquanto o cliente estiver conectado. Se ele desconectar,
+    a tarefa é cancelada, o que interrompe a geração e libera o modelo.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.disconnect_poll_seconds)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected, generation cancelled", extra={"path": http_request.url.path})
+                task.cancel()
+                # 499 (convenção do nginx): o cliente fechou a conexão antes da resposta
+                raise HTTPException(status_code=499, detail="Cliente desconectado")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def run_idempotent(
+    idempotency_key: str,
+    endpoint: str,
+    fingerprint: str,
+    factory: Callable[[], Awaitable[ChatResponse]],
+    response: Response
+) -> ChatResponse:
+    """Executa a requisição uma única vez por Idempotency-Key e devolve o resultado salvo nas repetições"""
+    async def execute():
+        return (await factory()).model_dump()
+
+    try:
+        result, replayed = await idempotency_store.run(idempotency_key, endpoint, fingerprint, execute)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return ChatResponse(**result)
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    start_time = time.time()
+async def chat(
+    request: ChatRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    if not idempotency_key:
+        return await run_until_disconnected(http_request, process_chat(request))
+
+    # Com Idempotency-Key a geração segue mesmo após desconexão, para que a repetição a encontre pronta
+    fingerprint = IdempotencyStore.fingerprint(request.model_dump(exclude={"timeout_seconds"}))
+    return await run_until_disconnected(
+        http_request,
+        run_idempotent(idempotency_key, "/chat", fingerprint, lambda: process_chat(request), response)
+    )
 
-    # Log da requisição recebida
-    logger.info(f"🔵 CHAT REQUEST | Session: {request.session_id[:8]}... | Type: {request.consultation_type} | Message: {request.message[:100]}{'...' if len(request.message) > 100 else ''}")
+
+async def process_chat(request: ChatRequest) -> ChatResponse:
+    start_time = time.time()
+    # Sem session_id, a conversa começa uma nova sessão (devolvida na resposta)
+    if not request.session_id:
+        request = request.model_copy(update={"session_id": str(uuid.uuid4())})
+    timeout = min(request.timeout_seconds or settings.chat_timeout_seconds, settings.chat_timeout_seconds)
+    control = GenerationControl.with_timeout(timeout)
+
+    # Log da requisição recebida (prévia da mensagem apenas nas requisições amostradas)
+    logger.info("Chat request", extra={
+        "session_id": request.session_id,
+        "consultation_type": request.consultation_type,
+        "message_chars": len(request.message),
+        **({"user_message": request.message[:100]} if previews_enabled() else {}),
+    })
 
     try:
         service = get_chatbot_service()
 
-        # Log antes de gerar resposta
-        logger.info(f"🔄 GENERATING RESPONSE | Session: {request.session_id[:8]}...")
-
         response = await service.generate_response(
             message=request.message,
             session_id=request.session_id,
-            consultation_type=request.consultation_type
+            consultation_type=request.consultation_type,
+            control=control,
+            adapter=request.adapter,
+            generation=request.generation.model_dump(exclude_none=True) if request.generation else None
         )
 
         # Log da resposta gerada
-        processing_time = time.time() - start_time
-        response_preview = response[:150] + "..." if len(response) > 150 else response
-        logger.info(f"✅ RESPONSE SENT | Session: {request.session_id[:8]}... | Time: {processing_time:.2f}s | Length: {len(response)} chars | Preview: {response_preview}")
+        logger.info("Chat response sent", extra={
+            "session_id": request.session_id,
+            "seconds": round(time.time() - start_time, 3),
+            "response_chars": len(response),
+            "truncated": control.truncated,
+            **({"response": response[:150]} if previews_enabled() else {}),
+        })
 
         return ChatResponse(
             response=response,
             session_id=request.session_id,
-            consultation_type=request.consultation_type
+            consultation_type=request.consultation_type,
+            truncated=control.truncated
         )
+    except AdapterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        error_time = time.time() - start_time
-        logger.error(f"❌ CHAT ERROR | Session: {request.session_id[:8]}... | Time: {error_time:.2f}s | Error: {str(e)}")
+        logger.exception("Chat error", extra={
+            "session_id": request.session_id,
+            "seconds": round(time.time() - start_time, 3),
+        })
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Versão em streaming do /chat: NDJSON com uma linha {"token": ...} por
+    trecho gerado e uma linha final {"done": true, ...}. Erros depois do
+    início do stream chegam como {"error": ...}.
+    """
+    start_time = time.time()
+    session_id = request.session_id or str(uuid.uuid4())
+    timeout = min(request.timeout_seconds or settings.chat_timeout_seconds, settings.chat_timeout_seconds)
+    control = GenerationControl.with_timeout(timeout)
+
+    logger.info("Chat stream request", extra={
+        "session_id": session_id,
+        "consultation_type": request.consultation_type,
+        "message_chars": len(request.message),
+        **({"user_message": request.message[:100]} if previews_enabled() else {}),
+    })
+
+    stream = get_chatbot_service().stream_response(
+        message=request.message,
+        session_id=session_id,
+        consultation_type=request.consultation_type,
+        control=control,
+        adapter=request.adapter,
+        generation=request.generation.model_dump(exclude_none=True) if request.generation else None
+    )
+
+    # Esperar o primeiro trecho antes de responder: erros de adaptador ou de
+    # carregamento do modelo ainda viram status HTTP
+    try:
+        first = await run_until_disconnected(http_request, stream.__anext__())
+    except StopAsyncIteration:
+        first = None
+    except AdapterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Chat stream error", extra={"session_id": session_id})
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body() -> AsyncIterator[str]:
+        chars = 0
+        try:
+            if first is not None:
+                chars += len(first)
+                yield json.dumps({"token": first}, ensure_ascii=False) + "\n"
+                async for piece in stream:
+                    chars += len(piece)
+                    yield json.dumps({"token": piece}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.exception("Chat stream error", extra={"session_id": session_id})
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+            return
+        finally:
+            # Cliente desconectado: fechar o gerador cancela a geração sem salvar a troca
+            await stream.aclose()
+
+        logger.info("Chat stream sent", extra={
+            "session_id": session_id,
+            "seconds": round(time.time() - start_time, 3),
+            "response_chars": chars,
+            "truncated": control.truncated,
+        })
+        yield json.dumps({
+            "done": True,
+            "session_id": session_id,
+            "consultation_type": request.consultation_type,
+            "truncated": control.truncated
+        }) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
 @app.post("/upload-document", response_model=ChatResponse)
 async def upload_document(
+    http_request: Request,
+    response: Response,
     file: UploadFile = File(...),
     session_id: Optional[str] = Form(None),
-    consultation_type: str = Form("consultation")
+    consultation_type: str = Form("consultation"),
+    adapter: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     Upload e processa documento PDF, extraindo texto e gerando análise jurídica
     """
+    if not idempotency_key:
+        return await run_until_disconnected(http_request, process_upload(file, session_id, consultation_type, adapter))
+
+    # O conteúdo (não só nome e tamanho) identifica o documento; o hash lê o
+    # arquivo temporário fora do event loop
+    content_digest = await asyncio.to_thread(IdempotencyStore.file_digest, file.file)
+    fingerprint = IdempotencyStore.fingerprint(content_digest, file.filename, session_id, consultation_type, adapter)
+    return await run_until_disconnected(
+        http_request,
+        run_idempotent(
+            idempotency_key,
+            "/upload-document",
+            fingerprint,
+            lambda: process_upload(file, session_id, consultation_type, adapter),
+            response
+        )
+    )
+
+
+async def process_upload(
+    file: UploadFile,
+    session_id: Optional[str],
+    consultation_type: str,
+    adapter: Optional[str] = None
+) -> ChatResponse:
+    # Com a memória no nível crítico, documentos novos são recusados antes da extração
+    governor = get_memory_governor()
+    try:
+        governor.admit_document()
+    except MemoryPressureError as e:
+        logger.warning("Upload shed", extra={"session_id": session_id, "document": file.filename})
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    # Tamanho do PDF como estimativa do que extração e análise mantêm em memória
+    with governor.track("documents_in_flight", file.size or 0):
+        return await analyze_upload(file, session_id, consultation_type, adapter)
+
+
+async def analyze_upload(
+    file: UploadFile,
+    session_id: Optional[str],
+    consultation_type: str,
+    adapter: Optional[str] = None
+) -> ChatResponse:
     start_time = time.time()
+    # O prazo cobre extração, OCR e análise
+    control = GenerationControl.with_timeout(settings.document_timeout_seconds)
 
     # Log da requisição de upload
-    logging.info(f"📄 UPLOAD REQUEST | Session: {session_id[:8] if session_id else 'NEW'}... | File: {file.filename} | Type: {consultation_type}")
+    logger.info("Upload request", extra={
+        "session_id": session_id,
+        "document": file.filename,
+        "consultation_type": consultation_type,
+    })
 
     try:
         # Validar arquivo
         if not file.filename:
             raise HTTPException(status_code=400, detail="Nome do arquivo é obrigatório")
 
-        # Ler conteúdo do arquivo
-        file_content = await file.read()
-        file_size_mb = len(file_content) / (1024 * 1024)
+        # O upload já está em um arquivo temporário (em memória ou em disco);
+        # o tamanho é obtido sem ler o conteúdo
+        file_size = file.size
+        if file_size is None:
+            file.file.seek(0, 2)
+            file_size = file.file.tell()
+        logger.info("Upload received", extra={"bytes": file_size})
 
-        logging.info(f"📊 FILE DETAILS | Size: {file_size_mb:.2f}MB | Processing...")
-
-        # Validar PDF
-        validation = DocumentService.validate_pdf_file(file_content, file.filename)
+        validation = DocumentService.validate_upload(file.filename, file_size)
         if not validation["valid"]:
             raise HTTPException(status_code=400, detail=validation["error"])
 
-        # Extrair texto do PDF
-        extraction_result = DocumentService.extract_text_from_pdf(file_content, file.filename)
-        if not extraction_result["success"]:
-            raise HTTPException(status_code=500, detail=extraction_result["error"])
+        # Um único leitor de PDF é compartilhado entre validação e extração
+        try:
+            with DocumentService.open_pdf(file.file) as pdf_reader:
+                validation = DocumentService.validate_pdf_reader(pdf_reader, file_size)
+                if not validation["valid"]:
+                    raise HTTPException(status_code=400, detail=validation["error"])
+
+                extraction_result = DocumentService.extract_text_from_reader(pdf_reader, file.filename)
+                if not extraction_result["success"]:
+                    raise HTTPException(status_code=500, detail=extraction_result["error"])
+
+                # Páginas escaneadas (sem camada de texto) passam por OCR
+                empty_pages = extraction_result["structure"].empty_pages()
+                ocr = get_ocr_service()
+                if empty_pages and ocr is not None:
+                    logger.info("OCR started", extra={"pages_without_text": len(empty_pages)})
+                    ocr_results = await ocr.ocr_pages(pdf_reader, empty_pages)
+                    extraction_result = DocumentService.merge_ocr_pages(extraction_result, ocr_results)
+                    ocr_metadata = extraction_result["metadata"]["ocr"]
+                    logger.info("OCR finished", extra={
+                        "seconds": ocr_metadata["total_seconds"],
+                        "pages": ocr_metadata["pages"],
+                    })
+        except InvalidPDFError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         extracted_text = extraction_result["text"]
         metadata = extraction_result["metadata"]
 
         # Verificar se foi extraído algum texto
-        if not extracted_text.strip():
+        if not extraction_result["structure"].has_text:
             raise HTTPException(
                 status_code=400,
                 detail="Não foi possível extrair texto do PDF. Verifique se o documento contém texto legível."
             )
 
-        # Formatar texto para consulta jurídica
-        formatted_message = DocumentService.format_document_for_chat(
-            extracted_text, file.filename, consultation_type
-        )
-
         # Gerar session_id se não fornecido
         if not session_id:
-            import uuid
             session_id = str(uuid.uuid4())
 
         # Salvar documento no banco como conversa
@@ -172,56 +444,93 @@ async def upload_document(
             await db_session.commit()
 
         # Gerar resposta do Nino
-        logging.info(f"🤖 GENERATING AI RESPONSE | Session: {session_id[:8]}... | Text extracted: {len(extracted_text)} chars")
+        logger.info("Document analysis started", extra={"session_id": session_id, "text_chars": len(extracted_text)})
 
+        # Documentos longos são analisados por páginas (map-reduce) em vez de truncados
         service = get_chatbot_service()
-        response = await service.generate_response(
-            message=formatted_message,
+        response = await service.analyze_document(
+            extracted_text=extracted_text,
+            filename=file.filename,
             session_id=session_id,
-            consultation_type=consultation_type
+            consultation_type=consultation_type,
+            structure=extraction_result["structure"],
+            control=control,
+            adapter=adapter
         )
 
-        # Log da resposta final
-        processing_time = time.time() - start_time
+        ocr_note = f", {len(metadata['ocr']['pages'])} via OCR" if "ocr" in metadata else ""
         final_response = f"📄 **Documento Analisado**: {file.filename}\n\n" \
-                        f"📊 **Metadados**: {metadata['num_pages']} páginas, {metadata['word_count']} palavras\n\n" \
+                        f"📊 **Metadados**: {metadata['num_pages']} páginas{ocr_note}, {metadata['word_count']} palavras\n\n" \
                         f"---\n\n{response}"
+        if control.truncated:
+            final_response += "\n\n⏱️ *Análise interrompida pelo tempo limite; a resposta está incompleta.*"
 
-        logging.info(f"✅ DOCUMENT RESPONSE SENT | Session: {session_id[:8]}... | File: {file.filename} | Time: {processing_time:.2f}s | AI Response: {len(response)} chars | Total: {len(final_response)} chars")
+        # Log da resposta final
+        logger.info("Document response sent", extra={
+            "session_id": session_id,
+            "seconds": round(time.time() - start_time, 3),
+            "response_chars": len(response),
+            "truncated": control.truncated,
+            **({"response": response[:150]} if previews_enabled() else {}),
+        })
 
         return ChatResponse(
             response=final_response,
             session_id=session_id,
-            consultation_type=consultation_type
+            consultation_type=consultation_type,
+            truncated=control.truncated
         )
 
     except HTTPException:
         raise
+    except AdapterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError as e:
+        logger.warning("Upload timed out", extra={"session_id": session_id, "seconds": round(time.time() - start_time, 3)})
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        error_time = time.time() - start_time
-        logging.error(f"❌ UPLOAD ERROR | Session: {session_id[:8] if session_id else 'NEW'}... | File: {file.filename} | Time: {error_time:.2f}s | Error: {str(e)}")
+        logger.exception("Upload error", extra={"session_id": session_id, "seconds": round(time.time() - start_time, 3)})
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 
 @app.get("/history/{session_id}")
-async def get_conversation_history(session_id: str):
+async def get_conversation_history(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    before_id: Optional[int] = Query(None, ge=1)
+):
     """
     Recupera histórico de conversas para uma sessão específica
+
+    Sem `limit`, devolve a sessão inteira. Com `limit`, devolve a página das
+    `limit` mensagens mais recentes anteriores a `before_id` (em ordem
+    cronológica); `next_before_id` pede a página seguinte.
     """
     try:
         async with AsyncSessionLocal() as db_session:
             # Buscar histórico da sessão
             query = select(ConversationHistory).where(
                 ConversationHistory.session_id == session_id
-            ).order_by(ConversationHistory.timestamp.asc())
-
-            result = await db_session.execute(query)
-            conversations = result.scalars().all()
+            )
+            if before_id is not None:
+                query = query.where(ConversationHistory.id < before_id)
+
+            if limit is None:
+                result = await db_session.execute(query.order_by(ConversationHistory.timestamp.asc()))
+                conversations = result.scalars().all()
+                has_more = False
+            else:
+                # Uma linha a mais indica se há páginas anteriores
+                result = await db_session.execute(query.order_by(ConversationHistory.id.desc()).limit(limit + 1))
+                conversations = result.scalars().all()
+                has_more = len(conversations) > limit
+                conversations = list(reversed(conversations[:limit]))
 
             # Formatar resposta
             history = []
             for conv in conversations:
                 history.append({
+                    "id": conv.id,
                     "session_id": conv.session_id,
                     "user_message": conv.user_message,
                     "bot_response": conv.bot_response,
@@ -234,20 +543,189 @@ async def get_conversation_history(session_id: str):
             return {
                 "session_id": session_id,
                 "history": history,
-                "total_messages": len(history)
+                "total_messages": len(history),
+                "has_more": has_more,
+                "next_before_id": history[0]["id"] if has_more else None
             }
 
     except Exception as e:
-        logger.error(f"❌ HISTORY ERROR | Session: {session_id[:8]}... | Error: {str(e)}")
+        logger.exception("History error", extra={"session_id": session_id})
         raise HTTPException(status_code=500, detail=f"Erro ao recuperar histórico: {str(e)}")
 
 
+@app.get("/search")
+async def search_conversations(
+    q: str = Query(..., min_length=1, max_length=500, description="Termos buscados"),
+    session_id: List[str] = Query(..., description="Sessões em que buscar (pode ser repetido)"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Busca textual nas mensagens e respostas das sessões indicadas.
+
+    Devolve os resultados mais relevantes primeiro, com trechos em que os
+    termos encontrados aparecem entre ** (sem as mensagens completas);
+    `next_offset` pede a página seguinte.
+    """
+    try:
+        async with engine.connect() as conn:
+            # Uma linha a mais indica se há próxima página
+            results = await conn.run_sync(search_history, q, session_id, limit + 1, offset)
+    except SearchUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        logger.exception("Search error", extra={"session_ids": session_id})
+        raise HTTPException(status_code=500, detail=f"Erro na busca: {str(e)}")
+
+    has_more = len(results) > limit
+    return {
+        "query": q,
+        "results": results[:limit],
+        "has_more": has_more,
+        "next_offset": offset + limit if has_more else None
+    }
+
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
 
+def require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Endpoints administrativos desativados (defina ADMIN_TOKEN)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="X-Admin-Token inválido")
+
+
+def adapters_status(service: ChatbotService, llm) -> dict:
+    return {
+        "backend": llm.name,
+        "adapters": llm.list_adapters(),
+        "consultation_adapters": service.consultation_adapters
+    }
+
+
+@app.get("/admin/adapters", dependencies=[Depends(require_admin)])
+async def list_adapters():
+    service = get_chatbot_service()
+    return adapters_status(service, await service._get_llm())
+
+
+@app.post("/admin/adapters", dependencies=[Depends(require_admin)])
+async def load_adapter(request: AdapterLoadRequest):
+    """
+    Carrega (ou substitui) um adaptador LoRA sobre o modelo base em execução.
+    Com vários workers, cada processo tem seu próprio modelo: a troca vale apenas
+    para o worker que atendeu a chamada (use LORA_ADAPTERS para todos).
+    """
+    service = get_chatbot_service()
+    llm = await service._get_llm()
+    start_time = time.time()
+    try:
+        # A carga espera a geração em curso terminar (mesma trava do modelo)
+        await asyncio.to_thread(llm.load_adapter, request.name, request.path)
+    except AdapterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    for consultation_type in request.consultation_types:
+        service.consultation_adapters[consultation_type] = request.name
+
+    logger.info("Adapter loaded", extra={
+        "adapter": request.name,
+        "path": request.path,
+        "seconds": round(time.time() - start_time, 3),
+    })
+    return adapters_status(service, llm)
+
+
+@app.delete("/admin/adapters/{name}", dependencies=[Depends(require_admin)])
+async def unload_adapter(name: str):
+    service = get_chatbot_service()
+    llm = await service._get_llm()
+    try:
+        await asyncio.to_thread(llm.unload_adapter, name)
+    except AdapterError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    # Tipos de consulta que usavam o adaptador voltam ao modelo base
+    service.consultation_adapters = {
+        consultation_type: adapter
+        for consultation_type, adapter in service.consultation_adapters.items()
+        if adapter != name
+    }
+
+    logger.info("Adapter unloaded", extra={"adapter": name})
+    return adapters_status(service, llm)
+
+
+@app.get("/admin/workers", dependencies=[Depends(require_admin)])
+async def list_workers():
+    """Workers de inferência com heartbeat recente (INFERENCE_BACKEND=queue)"""
+    llm = await get_chatbot_service()._get_llm()
+    if not isinstance(llm, QueueBackend):
+        raise HTTPException(status_code=404, detail="A API não usa a fila de inferência (INFERENCE_BACKEND=queue)")
+
+    workers = await asyncio.to_thread(llm.queue.workers)
+    return {"workers": workers, "total": len(workers)}
+
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def memory_status():
+    """Nível de pressão de memória, footprints e decisões do governador de memória"""
+    governor = get_memory_governor()
+    governor.check()
+    return governor.stats()
+
+
+@app.get("/admin/export", dependencies=[Depends(require_admin)])
+async def export_conversations(
+    start: Optional[datetime] = Query(None, description="Data/hora inicial (inclusive)"),
+    end: Optional[datetime] = Query(None, description="Data/hora final (exclusive)"),
+    session_id: Optional[List[str]] = Query(None, description="Pode ser repetido"),
+    format: Optional[Literal["parquet", "jsonl"]] = Query(None, description="Padrão: parquet se o pyarrow estiver instalado")
+):
+    """
+    Exporta mensagens por intervalo de datas e/ou sessões. O arquivo é gravado
+    em disco lote a lote (memória constante) e enviado em seguida.
+    """
+    fmt = format or transfer.default_format()
+    descriptor, path = tempfile.mkstemp(prefix="export-", suffix=transfer.EXTENSIONS[fmt])
+    os.close(descriptor)
+    try:
+        result = await transfer.export_history(path, start=start, end=end, session_ids=session_id, fmt=fmt)
+    except transfer.TransferError as e:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        os.unlink(path)
+        raise
+
+    logger.info("Conversations exported", extra=result)
+    return FileResponse(
+        path,
+        media_type=transfer.MEDIA_TYPES[fmt],
+        filename=f"conversation_history-{datetime.utcnow():%Y%m%dT%H%M%S}{transfer.EXTENSIONS[fmt]}",
+        headers={"X-Exported-Rows": str(result["rows"])},
+        background=BackgroundTask(os.unlink, path)
+    )
+
+
+@app.post("/admin/import", dependencies=[Depends(require_admin)])
+async def import_conversations(file: UploadFile = File(...), keep_ids: bool = Form(False)):
+    """Importa um arquivo gerado por /admin/export (ou pela retenção)"""
+    try:
+        result = await transfer.import_history(file.file, keep_ids=keep_ids)
+    except (transfer.TransferError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Arquivo inválido: {e}")
+
+    logger.info("Conversations imported", extra={"upload": file.filename, **result})
+    return result
+
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "src.chatbot_api.api.main:app",
         host=settings.api_host,
@@ -0,0 +1,93 @@
+"""
+Middlewares ASGI da API
+"""
+
+import re
+import uuid
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Iterable
+
+from ..core.log import start_request
+
+# IDs recebidos de proxies/clientes são aceitos apenas neste formato
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestContextMiddleware:
+    """
+    Atribui um request_id a cada requisição (reaproveitando X-Request-ID, se
+    válido), disponível para todos os logs emitidos durante ela e devolvido
+    no cabeçalho X-Request-ID da resposta.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        start_request(request_id)
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejeita uploads acima do limite antes de o corpo ser lido por completo:
+    primeiro pelo cabeçalho Content-Length e, na falta dele, por uma contagem
+    contínua dos bytes recebidos.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, paths: Iterable[str] = ("/upload-document",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = frozenset(paths)
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"Arquivo muito grande. Máximo permitido: {self.max_bytes // (1024*1024)}MB"
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # HTTPException atravessa o parser de formulários do FastAPI e vira 413
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send):
+        error = self._too_large()
+        response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+        await response(scope, receive, send)
@@ -0,0 +1,154 @@
+"""
+Servidor pre-fork com pesos do modelo compartilhados entre workers.
+
+O processo pai carrega o modelo uma única vez, abre o socket e faz fork dos
+workers uvicorn. Os workers só leem os tensores, então as páginas herdadas
+do pai (ou, no backend GGUF, do arquivo mapeado) continuam compartilhadas
+por copy-on-write sem multiplicar o uso de RAM. HTTP, extração de PDF e I/O de banco escalam
+por núcleo; a geração continua usando os mesmos pesos.
+
+Uso:
+    WORKERS=4 python -m src.chatbot_api.api.server
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict
+
+import uvicorn
+
+from ..core.config import settings
+from ..core.log import setup_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, worker_index: int, workers: int):
+    from .main import app, get_chatbot_service
+
+    service = get_chatbot_service()
+    if service.llm is not None:
+        service.llm.after_fork(worker_index, workers)
+
+    config = uvicorn.Config(app, log_level="debug" if settings.debug else "info")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+# Espera antes de recriar um worker: dobra a cada reinício recente, até o teto
+RESTART_BACKOFF_SECONDS = 1.0
+MAX_RESTART_BACKOFF_SECONDS = 30.0
+
+
+def serve(host: str, port: int, workers: int) -> int:
+    setup_logging()
+    sock = _bind_socket(host, port)
+
+    if settings.preload_model:
+        from .main import get_chatbot_service
+
+        logger.info("Preloading model before forking workers", extra={"workers": workers})
+        get_chatbot_service().load_backend().prepare_for_fork()
+
+    # Objetos criados até aqui não são mais visitados pelo GC, evitando que
+    # a coleta nos workers toque (e copie) as páginas herdadas do pai
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    shutting_down = False
+    # Instantes dos reinícios dentro da janela de WORKER_RESTART_WINDOW_SECONDS
+    restarts: Deque[float] = deque()
+    exit_code = 0
+
+    def spawn(worker_index: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 1
+            try:
+                _run_worker(sock, worker_index, workers)
+                code = 0
+            finally:
+                # os._exit não roda atexit: esvaziar a fila de logs antes
+                shutdown_logging()
+                os._exit(code)
+        children[pid] = worker_index
+        logger.info("Worker started", extra={"worker": worker_index, "pid": pid})
+
+    def shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for worker_index in range(workers):
+        spawn(worker_index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_index = children.pop(pid, None)
+        if worker_index is None or shutting_down:
+            continue
+        # Worker morreu inesperadamente: recriar a partir do pai, que ainda tem
+        # os pesos, salvo se os reinícios recentes esgotaram o limite
+        now = time.monotonic()
+        while restarts and now - restarts[0] > settings.worker_restart_window_seconds:
+            restarts.popleft()
+        if len(restarts) >= settings.worker_max_restarts:
+            logger.error("Worker restart limit reached, shutting down", extra={
+                "worker": worker_index, "pid": pid, "status": status, "restarts": len(restarts),
+            })
+            exit_code = 1
+            shutdown(None, None)
+            continue
+
+        delay = min(MAX_RESTART_BACKOFF_SECONDS, RESTART_BACKOFF_SECONDS * 2 ** len(restarts))
+        restarts.append(now)
+        logger.warning("Worker exited, restarting", extra={
+            "worker": worker_index, "pid": pid, "status": status, "delay_seconds": delay,
+        })
+        time.sleep(delay)
+        if not shutting_down:
+            spawn(worker_index)
+
+    sock.close()
+    return exit_code
+
+
+def main():
+    workers = max(1, settings.workers)
+    if workers == 1 and not settings.preload_model:
+        from .main import app
+
+        uvicorn.run(app, host=settings.api_host, port=settings.api_port)
+        return 0
+    return serve(settings.api_host, settings.api_port, workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
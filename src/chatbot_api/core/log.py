@@ -0,0 +1,170 @@
+"""
+Logging estruturado fora do event loop
+
+Os handlers da aplicação apenas enfileiram o LogRecord (sem formatar); uma
+thread (QueueListener) faz a formatação JSON, a redação de conteúdo sensível
+e a escrita no stdout. Cada registro carrega o request_id da requisição em
+curso (contextvar definido pelo RequestContextMiddleware). O contexto segue
+para as threads quando o trabalho é despachado com `asyncio.to_thread` (que o
+copia); `loop.run_in_executor` não o copia, então executores próprios devem
+receber `contextvars.copy_context().run`.
+
+Campos estruturados são passados em `extra`:
+
+    logger.info("Chat request", extra={"session_id": sid, "user_message": text})
+
+Campos com conteúdo do usuário (REDACTED_FIELDS) saem como tamanho + hash,
+a menos que LOG_REDACT=false. Prévias verbosas devem ser registradas apenas
+quando `previews_enabled()` — decisão amostrada uma vez por requisição.
+"""
+
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from .config import settings
+
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+preview_sampled_var: contextvars.ContextVar[bool] = contextvars.ContextVar("preview_sampled", default=False)
+
+# Campos com conteúdo do usuário ou do modelo, incluindo nomes de arquivo enviados
+REDACTED_FIELDS = frozenset({"user_message", "response", "document", "document_filename", "filename", "upload"})
+
+# Atributos padrão do LogRecord (o restante veio de `extra`)
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def start_request(request_id: str) -> None:
+    """Define o contexto de log da requisição atual (id e amostragem das prévias)"""
+    request_id_var.set(request_id)
+    preview_sampled_var.set(random.random() < settings.log_preview_sample_rate)
+
+
+def previews_enabled() -> bool:
+    return preview_sampled_var.get()
+
+
+def redact(value) -> str:
+    text = str(value)
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+    return f"<redacted len={len(text)} sha256={digest}>"
+
+
+class ContextFilter(logging.Filter):
+    """Copia o request_id do contexto para o registro (roda na thread que emite o log)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formata o registro como JSON (ou texto legível), aplicando a redação"""
+
+    def __init__(self, fmt: str = "json", redact_fields: bool = True):
+        super().__init__()
+        self.json = fmt == "json"
+        self.redact_fields = redact_fields
+
+    def _fields(self, record: logging.LogRecord) -> dict:
+        fields = {}
+        for key, value in vars(record).items():
+            if key in _RECORD_ATTRIBUTES or key.startswith("_"):
+                continue
+            if self.redact_fields and key in REDACTED_FIELDS and value is not None:
+                value = redact(value)
+            fields[key] = value
+        return fields
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = self._fields(record)
+        if self.json:
+            entry = {
+                "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+                "level": record.levelname,
+                "logger": record.name,
+                "request_id": getattr(record, "request_id", "-"),
+                "msg": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        extras = " ".join(f"{key}={value}" for key, value in fields.items())
+        line = (
+            f"{self.formatTime(record)} - {record.name} - {record.levelname} - "
+            f"[{getattr(record, 'request_id', '-')}] {record.getMessage()}"
+        )
+        if extras:
+            line += f" | {extras}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que não formata na thread que emite: o registro segue intacto
+    para o listener (mesmo processo), que faz todo o trabalho de formatação.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(force: bool = False) -> None:
+    """Instala o pipeline de logging no logger raiz (idempotente)"""
+    global _listener
+    if _listener is not None and not force:
+        return
+    if _listener is not None:
+        _listener.stop()
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(StructuredFormatter(settings.log_format, settings.log_redact))
+
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.log_level.upper())
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Esvazia a fila e encerra a thread de escrita"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork() -> None:
+    # A thread do listener não existe no processo filho: recriar fila e listener
+    global _listener
+    if _listener is not None:
+        _listener = None
+        setup_logging()
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -2,14 +2,21 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 
 from ..core.config import settings
 from ..models.database import Base
+from .search import ensure_search_index
 
 engine = create_async_engine(settings.database_url)
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
 async def init_db():
+    # O schema é gerenciado por migrações (alembic upgrade head); create_all
+    # fica restrito a bancos descartáveis de desenvolvimento/testes
+    if not settings.db_create_all:
+        return
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # Fora do modelo ORM (em produção, criado pela migração 0002)
+        await conn.run_sync(ensure_search_index)
 
 
 async def get_db():
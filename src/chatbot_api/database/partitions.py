@@ -0,0 +1,153 @@
+"""
+Particionamento mensal de conversation_history (PostgreSQL)
+
+A tabela é particionada por intervalo de `timestamp`, uma partição por mês
+(conversation_history_pAAAAMM), mais uma partição DEFAULT para linhas fora
+dos intervalos criados. Índices e VACUUM passam a operar por partição, e
+meses antigos já arquivados são removidos com DROP em vez de DELETE.
+
+As funções recebem uma conexão síncrona: nas migrações, op.get_bind();
+no código assíncrono, via `await conn.run_sync(...)`.
+"""
+
+import re
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..models.database import ConversationHistory
+
+TABLE = "conversation_history"
+DEFAULT_PARTITION = f"{TABLE}_default"
+# Colunas gravadas ao mover linhas: as do modelo, sem colunas geradas (ex.:
+# search_vector, de database/search.py), que o PostgreSQL recalcula
+HISTORY_COLUMNS = ", ".join(column.name for column in ConversationHistory.__table__.columns)
+PARTITION_PATTERN = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": TABLE}
+    ).scalar())
+
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}{month.month:02d}"
+
+
+def create_partition_sql(month: date) -> str:
+    return (
+        f"CREATE TABLE {partition_name(month)} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def _bounds(month: date) -> dict:
+    return {"start": month.isoformat(), "end": add_months(month, 1).isoformat()}
+
+
+def _default_has_rows(conn: Connection, month: date) -> bool:
+    return bool(conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end)"
+    ), _bounds(month)).scalar())
+
+
+def create_partition_moving_default_rows(conn: Connection, month: date):
+    """
+    Cria a partição do mês quando a DEFAULT já tem linhas do intervalo
+    (CREATE ... PARTITION OF falharia): cria a tabela solta, move as linhas
+    da DEFAULT para ela e a anexa ao pai.
+
+    INCLUDING GENERATED mantém search_vector como coluna gerada (ATTACH
+    PARTITION recusa a partição se ela for uma coluna comum); por isso as
+    linhas são copiadas com a lista explícita de colunas, sem as geradas.
+    """
+    name = partition_name(month)
+    conn.execute(text(
+        f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+    ))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end "
+        f"RETURNING {HISTORY_COLUMNS}) "
+        f"INSERT INTO {name} ({HISTORY_COLUMNS}) SELECT {HISTORY_COLUMNS} FROM moved"
+    ), _bounds(month))
+    conn.execute(text(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+
+def list_partitions(conn: Connection) -> List[date]:
+    """Meses com partição criada, em ordem"""
+    rows = conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :table"
+    ), {"table": TABLE}).scalars()
+
+    months = []
+    for name in rows:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def ensure_partitions(conn: Connection, months_ahead: int, since: Optional[datetime] = None) -> List[str]:
+    """
+    Cria as partições mensais de `since` (padrão: mês atual) até `months_ahead`
+    meses à frente. Devolve os nomes das partições criadas.
+    """
+    if not is_partitioned(conn):
+        return []
+
+    existing = set(list_partitions(conn))
+    current = month_start(datetime.utcnow())
+    month = month_start(since) if since else current
+    last = add_months(current, months_ahead)
+
+    created = []
+    while month <= last:
+        if month not in existing:
+            # Sem a partição (job atrasado, `since` no passado), as linhas do mês
+            # caíram na DEFAULT e precisam ser movidas antes
+            if _default_has_rows(conn, month):
+                create_partition_moving_default_rows(conn, month)
+            else:
+                conn.execute(text(create_partition_sql(month)))
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def drop_empty_partitions(conn: Connection, before: datetime) -> List[str]:
+    """Remove partições vazias cujo intervalo termina antes de `before` (já arquivadas)"""
+    if not is_partitioned(conn):
+        return []
+
+    dropped = []
+    for month in list_partitions(conn):
+        if add_months(month, 1) > month_start(before):
+            break
+        name = partition_name(month)
+        if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+            continue
+        conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
@@ -0,0 +1,142 @@
+"""
+Retenção de conversas: sessões inativas vão para arquivo frio (JSONL gzip)
+
+Cada lote de sessões de uma execução vira um arquivo
+archive_dir/conversation_history-AAAAMMDDTHHMMSS-NNNN.jsonl.gz, com uma linha
+por mensagem (e o resumo da sessão, se houver). As linhas arquivadas são
+apagadas e, no PostgreSQL, as partições mensais que ficaram vazias são
+removidas e as dos próximos meses, criadas.
+
+O arquivo do lote é fechado e sincronizado com o disco antes da remoção: se
+a execução for interrompida, o lote é arquivado de novo na próxima (nunca
+perdido). A remoção se limita às linhas lidas (id até o maior arquivado e
+timestamp anterior ao corte), então mensagens novas de uma sessão retomada
+durante a execução ficam no banco.
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, exists, func, select
+
+from ..core.config import settings
+from ..models.database import ConversationHistory, ConversationSummary
+from .database import AsyncSessionLocal, engine
+from .partitions import drop_empty_partitions, ensure_partitions
+
+HISTORY_COLUMNS = [column.name for column in ConversationHistory.__table__.columns]
+
+
+def _serialize(row) -> dict:
+    record = {}
+    for name in HISTORY_COLUMNS:
+        value = getattr(row, name)
+        record[name] = value.isoformat() if isinstance(value, datetime) else value
+    return record
+
+
+async def _stale_sessions(cutoff: datetime) -> List[str]:
+    async with AsyncSessionLocal() as db_session:
+        query = (
+            select(ConversationHistory.session_id)
+            .group_by(ConversationHistory.session_id)
+            .having(func.max(ConversationHistory.timestamp) < cutoff)
+        )
+        return list((await db_session.execute(query)).scalars())
+
+
+def _write_archive(path: str, lines: List[str]):
+    """
+    Grava o arquivo do lote por inteiro e o sincroniza com o disco: fechar o
+    GzipFile escreve o trailer (CRC e tamanho), que `flush` não escreve, e o
+    fsync garante que o lote sobreviva a uma queda antes da remoção do banco
+    """
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+            for line in lines:
+                archive.write((line + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    directory = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+async def archive_stale_sessions(
+    retention_days: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+    batch_sessions: int = 200,
+    dry_run: bool = False
+) -> dict:
+    """Arquiva e remove sessões sem mensagens há mais de `retention_days` dias"""
+    retention_days = retention_days if retention_days is not None else settings.retention_days
+    archive_dir = archive_dir or settings.archive_dir
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+    sessions = await _stale_sessions(cutoff)
+    result = {
+        "cutoff": cutoff.isoformat(),
+        "sessions": len(sessions),
+        "messages": 0,
+        "archives": [],
+        "dropped_partitions": [],
+        "created_partitions": [],
+    }
+    if dry_run:
+        return result
+
+    if sessions:
+        os.makedirs(archive_dir, exist_ok=True)
+        run_stamp = f"{datetime.utcnow():%Y%m%dT%H%M%S}"
+
+        for number, start in enumerate(range(0, len(sessions), batch_sessions)):
+            batch = sessions[start:start + batch_sessions]
+            path = os.path.join(archive_dir, f"conversation_history-{run_stamp}-{number:04d}.jsonl.gz")
+            async with AsyncSessionLocal() as db_session:
+                rows = (await db_session.execute(
+                    select(ConversationHistory)
+                    .where(ConversationHistory.session_id.in_(batch), ConversationHistory.timestamp < cutoff)
+                    .order_by(ConversationHistory.session_id, ConversationHistory.id)
+                )).scalars().all()
+                summaries = (await db_session.execute(
+                    select(ConversationSummary).where(ConversationSummary.session_id.in_(batch))
+                )).scalars().all()
+                if not rows:
+                    continue
+
+                lines = [json.dumps({"type": "message", **_serialize(row)}, ensure_ascii=False) for row in rows]
+                lines.extend(json.dumps({
+                    "type": "summary",
+                    "session_id": summary.session_id,
+                    "summary": summary.summary,
+                    "last_conversation_id": summary.last_conversation_id,
+                }, ensure_ascii=False) for summary in summaries)
+                _write_archive(path, lines)
+                result["archives"].append(path)
+                result["messages"] += len(rows)
+
+                # Só o que foi arquivado: mensagens que chegarem depois da
+                # leitura (sessão retomada) têm id maior e ficam no banco
+                max_id = max(row.id for row in rows)
+                await db_session.execute(delete(ConversationHistory).where(
+                    ConversationHistory.session_id.in_(batch),
+                    ConversationHistory.id <= max_id,
+                    ConversationHistory.timestamp < cutoff,
+                ))
+                # O resumo só sai junto com a última mensagem da sessão
+                await db_session.execute(delete(ConversationSummary).where(
+                    ConversationSummary.session_id.in_(batch),
+                    ~exists().where(ConversationHistory.session_id == ConversationSummary.session_id),
+                ))
+                await db_session.commit()
+
+    async with engine.begin() as conn:
+        result["dropped_partitions"] = await conn.run_sync(drop_empty_partitions, cutoff)
+        result["created_partitions"] = await conn.run_sync(ensure_partitions, settings.partition_months_ahead)
+
+    return result
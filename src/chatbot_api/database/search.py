@@ -0,0 +1,198 @@
+"""
+Busca textual em conversation_history (user_message e bot_response)
+
+PostgreSQL: coluna gerada `search_vector` (tsvector com a configuração
+'portuguese', que aplica stemming: "prescrição" encontra "prescricional")
+e índice GIN; na tabela particionada, coluna e índice se propagam para cada
+partição. A pergunta tem peso A e a resposta peso B no ranking.
+
+SQLite (testes e desenvolvimento): tabela FTS5 de conteúdo externo mantida
+por triggers; sem stemmer português, cada termo é buscado como prefixo e as
+palavras vazias são descartadas.
+
+Os termos são combinados com OU e os resultados ordenados por relevância:
+perguntas em linguagem natural ("onde o Nino explicou o prazo de prescrição?")
+encontram as trocas que têm mais termos em comum. A página é escolhida só
+com id e rank (pelo índice); os trechos destacados são gerados apenas para as
+linhas da página.
+"""
+
+import re
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+
+TABLE = "conversation_history"
+FTS_TABLE = f"{TABLE}_fts"
+SEARCH_COLUMN = "search_vector"
+SEARCH_INDEX = "idx_history_search"
+
+# Marcadores dos termos encontrados nos trechos (negrito em Markdown)
+HIGHLIGHT_START = "**"
+HIGHLIGHT_STOP = "**"
+
+TERM_PATTERN = re.compile(r"\w+")
+# Palavras vazias descartadas no SQLite (no PostgreSQL, a configuração 'portuguese' já as remove)
+STOPWORDS = frozenset(
+    "a ao aos as com da das de do dos e em me na nas no nos o os ou para pela pelo por que se um uma "
+    "onde como qual quais quando foi sobre isso esse essa meu minha".split()
+)
+# Termos curtos exatos; a partir deste tamanho, também como prefixo (plural, flexões)
+PREFIX_MIN_CHARS = 4
+
+
+class SearchUnavailableError(RuntimeError):
+    """Banco sem suporte a busca textual"""
+
+
+def search_index_sql(dialect: str) -> List[str]:
+    """DDL do índice de busca (idempotente), usado pela migração e por init_db"""
+    if dialect == "postgresql":
+        # database/partitions.py depende desta coluna ser gerada: partições criadas
+        # fora do pai (create_partition_moving_default_rows) usam INCLUDING GENERATED
+        # e copiam as linhas sem ela. Outra coluna fora do modelo exigiria o mesmo
+        return [
+            f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS {SEARCH_COLUMN} tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('portuguese', coalesce(user_message, '')), 'A') || "
+            "setweight(to_tsvector('portuguese', coalesce(bot_response, '')), 'B')"
+            ") STORED",
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON {TABLE} USING GIN ({SEARCH_COLUMN})",
+        ]
+    if dialect == "sqlite":
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"user_message, bot_response, content='{TABLE}', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, user_message, bot_response) "
+            "VALUES (new.id, new.user_message, new.bot_response); END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_message, bot_response) "
+            "VALUES ('delete', old.id, old.user_message, old.bot_response); END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_message, bot_response) "
+            "VALUES ('delete', old.id, old.user_message, old.bot_response); "
+            f"INSERT INTO {FTS_TABLE}(rowid, user_message, bot_response) "
+            "VALUES (new.id, new.user_message, new.bot_response); END",
+            # Indexa as linhas que já existiam
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+        ]
+    return []
+
+
+def ensure_search_index(conn: Connection):
+    """Cria o índice de busca se ainda não existir (conexão síncrona, como em partitions.py)"""
+    if conn.dialect.name == "sqlite" and conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+    ).scalar():
+        # Já criado e mantido pelos triggers: evitar o 'rebuild'
+        return
+    for statement in search_index_sql(conn.dialect.name):
+        conn.execute(text(statement))
+
+
+def _terms(query: str) -> List[str]:
+    return [term.lower() for term in TERM_PATTERN.findall(query)]
+
+
+def _postgres_query(by_session: bool) -> str:
+    session_filter = f"AND {TABLE}.session_id IN :session_ids" if by_session else ""
+    # Termos em OU: plainto_tsquery normaliza (stemming, stopwords) e junta com &
+    return f"""
+        WITH query AS (
+            SELECT replace(plainto_tsquery('portuguese', :query)::text, '&', '|')::tsquery AS q
+        ),
+        page AS (
+            SELECT id, ts_rank_cd({SEARCH_COLUMN}, query.q) AS rank
+            FROM {TABLE}, query
+            WHERE {SEARCH_COLUMN} @@ query.q {session_filter}
+            ORDER BY rank DESC, id DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT h.id, h.session_id, h.timestamp, h.is_document, h.document_filename, page.rank,
+               ts_headline('portuguese', h.user_message, query.q, :options) AS user_snippet,
+               ts_headline('portuguese', h.bot_response, query.q, :options) AS bot_snippet
+        FROM page JOIN {TABLE} h ON h.id = page.id, query
+        ORDER BY page.rank DESC, h.id DESC
+    """
+
+
+def _sqlite_query(by_session: bool) -> str:
+    session_filter = f"AND rowid IN (SELECT id FROM {TABLE} WHERE session_id IN :session_ids)" if by_session else ""
+    # bm25: menor é melhor; pesos 2 (pergunta) e 1 (resposta), como A/B no PostgreSQL
+    return f"""
+        WITH page AS (
+            SELECT rowid AS id, -bm25({FTS_TABLE}, 2.0, 1.0) AS rank
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH :query {session_filter}
+            ORDER BY rank DESC, id DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT h.id, h.session_id, h.timestamp, h.is_document, h.document_filename, page.rank,
+               snippet({FTS_TABLE}, 0, :start, :stop, '…', 16) AS user_snippet,
+               snippet({FTS_TABLE}, 1, :start, :stop, '…', 24) AS bot_snippet
+        FROM page
+        JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = page.id AND {FTS_TABLE} MATCH :query
+        JOIN {TABLE} h ON h.id = page.id
+        ORDER BY page.rank DESC, h.id DESC
+    """
+
+
+def search_history(
+    conn: Connection,
+    query: str,
+    session_ids: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    offset: int = 0
+) -> List[dict]:
+    """
+    Trocas que contêm algum termo de `query`, da mais para a menos relevante,
+    com trechos destacados. Para uso via `await conn.run_sync(...)`.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    if conn.dialect.name == "postgresql":
+        statement = text(_postgres_query(bool(session_ids)))
+        params = {
+            "query": " ".join(terms),
+            "options": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=30, MinWords=10, MaxFragments=2",
+        }
+    elif conn.dialect.name == "sqlite":
+        statement = text(_sqlite_query(bool(session_ids)))
+        # Cada termo entre aspas (sem operadores do usuário) e como prefixo
+        terms = [term for term in terms if term not in STOPWORDS]
+        if not terms:
+            return []
+        params = {
+            "query": " OR ".join(f'"{term}"*' if len(term) >= PREFIX_MIN_CHARS else f'"{term}"' for term in terms),
+            "start": HIGHLIGHT_START,
+            "stop": HIGHLIGHT_STOP,
+        }
+    else:
+        raise SearchUnavailableError(f"Busca textual não suportada no banco '{conn.dialect.name}'")
+
+    if session_ids:
+        statement = statement.bindparams(bindparam("session_ids", expanding=True))
+        params["session_ids"] = list(session_ids)
+
+    rows = conn.execute(statement, {**params, "limit": limit, "offset": offset}).mappings()
+    return [
+        {
+            "id": row["id"],
+            "session_id": row["session_id"],
+            # SQLite devolve o texto gravado; PostgreSQL, datetime
+            "timestamp": (
+                datetime.fromisoformat(row["timestamp"]) if isinstance(row["timestamp"], str) else row["timestamp"]
+            ).isoformat(),
+            "rank": round(float(row["rank"]), 6),
+            "user_snippet": row["user_snippet"],
+            "bot_snippet": row["bot_snippet"],
+            "is_document": bool(row["is_document"]),
+            "document_filename": row["document_filename"],
+        }
+        for row in rows
+    ]
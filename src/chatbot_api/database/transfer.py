@@ -0,0 +1,303 @@
+"""
+Exportação e importação em massa de conversation_history
+
+A exportação lê as linhas por intervalo de datas e/ou conjunto de sessões com
+um cursor do lado do servidor (stream + yield_per) e grava lote a lote:
+Parquet comprimido (zstd) quando o pyarrow está instalado (extra `export`), ou
+JSONL gzip, o mesmo formato dos arquivos da retenção. Só um lote fica em
+memória por vez, qualquer que seja o total exportado.
+
+A importação lê o arquivo em lotes e grava cada lote com um único INSERT
+(executemany), numa transação por lote. Aceita os dois formatos, inclusive os
+arquivos gerados por database/retention.py (as linhas de resumo são ignoradas).
+"""
+
+import asyncio
+import gzip
+import json
+import time
+from datetime import datetime
+from typing import IO, Iterator, List, Optional, Sequence, Union
+
+from sqlalchemy import insert, select, text
+
+from ..models.database import ConversationHistory
+from .database import engine
+
+HISTORY_TABLE = ConversationHistory.__table__
+HISTORY_COLUMNS = [column.name for column in HISTORY_TABLE.columns]
+
+FORMATS = ("parquet", "jsonl")
+EXTENSIONS = {"parquet": ".parquet", "jsonl": ".jsonl.gz"}
+MEDIA_TYPES = {"parquet": "application/vnd.apache.parquet", "jsonl": "application/gzip"}
+
+PARQUET_MAGIC = b"PAR1"
+GZIP_MAGIC = b"\x1f\x8b"
+
+Source = Union[str, IO[bytes]]
+
+
+class TransferError(ValueError):
+    """Formato indisponível (pyarrow ausente) ou arquivo não reconhecido"""
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def default_format() -> str:
+    return "parquet" if parquet_available() else "jsonl"
+
+
+def format_from_path(path: str) -> Optional[str]:
+    """Formato indicado pela extensão de `path` (EXTENSIONS), se houver"""
+    for fmt, extension in EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return fmt
+    return None
+
+
+def _require_pyarrow():
+    if not parquet_available():
+        raise TransferError("Parquet requer o pyarrow (uv sync --extra export); use o formato jsonl")
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("session_id", pa.string()),
+        ("user_message", pa.string()),
+        ("bot_response", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("is_document", pa.bool_()),
+        ("document_filename", pa.string()),
+        ("document_type", pa.string()),
+    ])
+
+
+class _ParquetWriter:
+    def __init__(self, path: str, compression: str = "zstd"):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        self.schema = _arrow_schema()
+        self.writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, rows: Sequence[tuple]):
+        import pyarrow as pa
+
+        # Colunar: cada coluna do lote vira um array Arrow de uma vez
+        columns = list(zip(*rows))
+        self.writer.write_batch(pa.record_batch(
+            [pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+class _JsonlWriter:
+    def __init__(self, path: str):
+        self.file = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+
+    def write(self, rows: Sequence[tuple]):
+        lines = []
+        for row in rows:
+            record = {"type": "message"}
+            for name, value in zip(HISTORY_COLUMNS, row):
+                record[name] = value.isoformat() if isinstance(value, datetime) else value
+            lines.append(json.dumps(record, ensure_ascii=False))
+        self.file.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def _history_query(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    session_ids: Optional[Sequence[str]]
+):
+    # Colunas (não objetos ORM): sem custo de identity map por linha
+    query = select(*HISTORY_TABLE.columns).order_by(HISTORY_TABLE.c.id)
+    if start is not None:
+        query = query.where(HISTORY_TABLE.c.timestamp >= start)
+    if end is not None:
+        query = query.where(HISTORY_TABLE.c.timestamp < end)
+    if session_ids:
+        query = query.where(HISTORY_TABLE.c.session_id.in_(list(session_ids)))
+    return query
+
+
+async def export_history(
+    path: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session_ids: Optional[Sequence[str]] = None,
+    fmt: Optional[str] = None,
+    batch_rows: int = 10000
+) -> dict:
+    """
+    Exporta as mensagens de [start, end) e/ou de `session_ids` para `path`.
+    Sem `fmt`, o formato vem da extensão de `path` e, na falta dela, de
+    `default_format()`; uma extensão que contradiz `fmt` é um erro.
+    """
+    if fmt is not None and fmt not in FORMATS:
+        raise TransferError(f"Formato desconhecido: {fmt}")
+    path_fmt = format_from_path(path)
+    if fmt is not None and path_fmt is not None and fmt != path_fmt:
+        raise TransferError(f"Formato {fmt} incompatível com a extensão de {path} (esperado {EXTENSIONS[fmt]})")
+    fmt = fmt or path_fmt or default_format()
+    writer = _ParquetWriter(path) if fmt == "parquet" else _JsonlWriter(path)
+
+    started = time.perf_counter()
+    rows = batches = 0
+    try:
+        async with engine.connect() as conn:
+            # stream + yield_per: cursor do lado do servidor, lido `batch_rows` linhas por vez
+            result = await conn.stream(
+                _history_query(start, end, session_ids).execution_options(yield_per=batch_rows)
+            )
+            async for partition in result.partitions(batch_rows):
+                # Compressão e escrita fora do event loop
+                await asyncio.to_thread(writer.write, partition)
+                rows += len(partition)
+                batches += 1
+    finally:
+        await asyncio.to_thread(writer.close)
+
+    seconds = time.perf_counter() - started
+    return {
+        "path": path,
+        "format": fmt,
+        "rows": rows,
+        "batches": batches,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds else None,
+    }
+
+
+def detect_format(source: Source) -> str:
+    """Formato de um arquivo exportado, pelos bytes iniciais"""
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            magic = file.read(4)
+    else:
+        position = source.tell()
+        magic = source.read(4)
+        source.seek(position)
+
+    if magic == PARQUET_MAGIC:
+        return "parquet"
+    if magic[:2] == GZIP_MAGIC or magic[:1] == b"{":
+        return "jsonl"
+    raise TransferError("Arquivo não reconhecido (esperado Parquet ou JSONL, opcionalmente gzip)")
+
+
+def _parse_record(record: dict) -> dict:
+    timestamp = record.get("timestamp")
+    return {
+        "id": record.get("id"),
+        "session_id": record["session_id"],
+        "user_message": record.get("user_message") or "",
+        "bot_response": record.get("bot_response") or "",
+        "timestamp": datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp or datetime.utcnow(),
+        "is_document": bool(record.get("is_document")),
+        "document_filename": record.get("document_filename"),
+        "document_type": record.get("document_type"),
+    }
+
+
+def read_batches(source: Source, batch_rows: int = 10000, fmt: Optional[str] = None) -> Iterator[List[dict]]:
+    """Lotes de registros (dicts com as colunas de conversation_history) de um arquivo exportado"""
+    fmt = fmt or detect_format(source)
+    if fmt == "parquet":
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(source)
+        columns = [name for name in HISTORY_COLUMNS if name in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=batch_rows, columns=columns):
+            yield [_parse_record(record) for record in batch.to_pylist()]
+        return
+
+    if isinstance(source, str):
+        raw = open(source, "rb")
+    else:
+        raw = source
+    try:
+        compressed = raw.read(2) == GZIP_MAGIC
+        raw.seek(0)
+        stream = gzip.open(raw, "rt", encoding="utf-8") if compressed else (line.decode("utf-8") for line in raw)
+        batch: List[dict] = []
+        for line in stream:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            # Arquivos da retenção também trazem linhas de resumo
+            if record.get("type", "message") != "message":
+                continue
+            batch.append(_parse_record(record))
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        if isinstance(source, str):
+            raw.close()
+
+
+async def import_history(
+    source: Source,
+    keep_ids: bool = False,
+    batch_rows: int = 10000,
+    fmt: Optional[str] = None
+) -> dict:
+    """
+    Insere as mensagens de um arquivo exportado. Por padrão os ids são gerados
+    de novo (o arquivo pode vir de outro banco); com `keep_ids` os ids
+    originais são mantidos, para restaurar um banco a partir da exportação.
+    """
+    batches = read_batches(source, batch_rows, fmt)
+    statement = insert(HISTORY_TABLE)
+    started = time.perf_counter()
+    rows = count = 0
+
+    while True:
+        # Leitura e descompressão do próximo lote fora do event loop
+        batch = await asyncio.to_thread(next, batches, None)
+        if batch is None:
+            break
+        if not keep_ids:
+            for record in batch:
+                record.pop("id", None)
+        async with engine.begin() as conn:
+            await conn.execute(statement, batch)
+        rows += len(batch)
+        count += 1
+
+    if keep_ids and rows:
+        async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # A sequência continua depois dos ids importados
+                await conn.execute(text(
+                    "SELECT setval('conversation_history_id_seq', "
+                    "(SELECT COALESCE(max(id), 0) + 1 FROM conversation_history), false)"
+                ))
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "batches": count,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds else None,
+    }
+
@@ -6,13 +6,18 @@ Base = declarative_base()
 
 
 class ConversationHistory(Base):
+    """
+    No PostgreSQL a tabela é particionada por mês de `timestamp` e a chave
+    primária é (id, timestamp) — ver migrations/ e database/partitions.py.
+    Para o ORM, `id` (gerado por sequência) continua identificando a linha.
+    """
     __tablename__ = "conversation_history"
 
-    id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, index=True, nullable=False)
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, nullable=False)
     user_message = Column(Text, nullable=False)
     bot_response = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Document-related fields
     is_document = Column(Boolean, default=False, nullable=False)
@@ -23,4 +28,27 @@ class ConversationHistory(Base):
     __table_args__ = (
         Index('idx_session_timestamp', 'session_id', 'timestamp'),
         Index('idx_session_documents', 'session_id', 'is_document'),
-    )
\ No newline at end of file
+    )
+
+
+class ConversationSummary(Base):
+    """Resumo incremental das trocas mais antigas de uma sessão"""
+    __tablename__ = "conversation_summary"
+
+    session_id = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    # Maior ConversationHistory.id já incorporado ao resumo
+    last_conversation_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+
+class IdempotencyRecord(Base):
+    """Resultado armazenado de uma requisição com cabeçalho Idempotency-Key"""
+    __tablename__ = "idempotency_record"
+
+    endpoint = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    request_fingerprint = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,21 +1,62 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Literal
 from datetime import datetime
 
+from ..prompts.legal_prompts import PROMPT_REGISTRY
+
+
+class GenerationOverrides(BaseModel):
+    temperature: Optional[float] = Field(None, ge=0, le=2, description="0 = decodificação gulosa (determinística)")
+    top_p: Optional[float] = Field(None, gt=0, le=1)
+    top_k: Optional[int] = Field(None, ge=1)
+    repetition_penalty: Optional[float] = Field(None, gt=0)
+    seed: Optional[int] = Field(None, ge=0, description="Semente da amostragem: respostas reprodutíveis")
+
 
 class ChatRequest(BaseModel):
     message: str = Field(..., description="A consulta ou mensagem do usuário")
     session_id: Optional[str] = Field(None, description="ID da sessão para contexto da conversa")
-    consultation_type: Optional[Literal["general", "consultation", "case_analysis", "legal_research", "document_draft", "legislation_search"]] = Field(
+    consultation_type: Optional[str] = Field(
         "consultation",
-        description="Tipo de consulta jurídica"
+        description="Tipo de consulta jurídica ('general', 'consultation' ou um tipo registrado em PROMPT_REGISTRY)"
+    )
+    adapter: Optional[str] = Field(
+        None,
+        description="Adaptador LoRA a usar (padrão: o associado ao tipo de consulta)"
+    )
+    timeout_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Prazo da geração em segundos (limitado a Settings.chat_timeout_seconds)"
     )
+    generation: Optional[GenerationOverrides] = Field(
+        None,
+        description="Parâmetros de geração desta requisição (padrão: os do tipo de consulta)"
+    )
+
+    @field_validator("consultation_type")
+    @classmethod
+    def validate_consultation_type(cls, value: Optional[str]) -> Optional[str]:
+        allowed = {"general", "consultation", *PROMPT_REGISTRY.names()}
+        if value is not None and value not in allowed:
+            raise ValueError(f"consultation_type deve ser um de: {', '.join(sorted(allowed))}")
+        return value
 
 
 class ChatResponse(BaseModel):
     response: str = Field(..., description="A resposta do assistente jurídico")
     session_id: str = Field(..., description="ID da sessão para contexto da conversa")
     consultation_type: str = Field(..., description="Tipo de consulta processada")
+    truncated: bool = Field(False, description="Resposta parcial: o prazo da requisição expirou durante a geração")
+
+
+class AdapterLoadRequest(BaseModel):
+    name: str = Field(..., min_length=1, description="Nome do adaptador LoRA")
+    path: str = Field(..., min_length=1, description="Diretório local ou repositório do Hugging Face Hub com o adaptador")
+    consultation_types: List[str] = Field(
+        default_factory=list,
+        description="Tipos de consulta que passam a usar este adaptador por padrão"
+    )
 
 
 class ConversationHistoryCreate(BaseModel):
@@ -2,6 +2,8 @@
 Prompts para assistente jurídico brasileiro especializado em direito institucional
 """
 
+from .registry import PromptRegistry, PromptTemplate
+
 SYSTEM_PROMPT = """Você é Nino, um assistente jurídico brasileiro amigável e competente, especializado em direito brasileiro. Sua personalidade é acolhedora, didática e sempre disposta a ajudar, seja em questões jurídicas complexas ou conversas gerais.
 
 PERSONALIDADE DO NINO:
@@ -161,6 +163,50 @@ Organize a resposta em:
 
 Informações legislativas:"""
 
+# Prompt da etapa "map" da análise hierárquica de documentos longos
+DOCUMENT_CHUNK_SUMMARY_PROMPT = """Sou Nino, assistente jurídico especializado em direito brasileiro. Resuma o trecho abaixo do documento "{filename}" ({page_range}), preservando as informações juridicamente relevantes:
+
+TRECHO:
+{chunk_text}
+
+Inclua no resumo:
+- Partes, datas, valores e prazos mencionados
+- Cláusulas, pedidos ou dispositivos legais citados
+- Obrigações, riscos e irregularidades aparentes
+
+Resumo:"""
+
+# Prompt de atualização do resumo da conversa (memória de longo prazo da sessão)
+CONVERSATION_SUMMARY_PROMPT = """Você mantém o resumo de uma conversa entre um usuário e Nino, assistente jurídico brasileiro. Atualize o resumo incorporando as novas trocas.
+
+RESUMO ATUAL:
+{summary}
+
+NOVAS TROCAS:
+{turns}
+
+Escreva um resumo conciso e objetivo (no máximo um parágrafo curto por tema) que preserve:
+- Fatos do caso, partes, datas, valores e prazos
+- Documentos enviados e seus pontos principais
+- Dúvidas do usuário e orientações já dadas por Nino
+
+Resumo atualizado:"""
+
+# Registro dos tipos de consulta; 'consultation', 'general' e tipos não
+# registrados usam o prompt generalista, que torna o Nino mais amigável e natural
+PROMPT_REGISTRY = PromptRegistry(
+    system_prompt=SYSTEM_PROMPT,
+    default=PromptTemplate(GENERAL_CONVERSATION_PROMPT, query_field="query")
+)
+PROMPT_REGISTRY.register("case_analysis", PromptTemplate(CASE_ANALYSIS_PROMPT, query_field="case_description"))
+PROMPT_REGISTRY.register("legal_research", PromptTemplate(LEGAL_RESEARCH_PROMPT, query_field="research_topic"))
+PROMPT_REGISTRY.register(
+    "document_draft",
+    PromptTemplate(DOCUMENT_DRAFT_PROMPT, query_field="document_info", document_type="documento legal")
+)
+PROMPT_REGISTRY.register("legislation_search", PromptTemplate(LEGISLATION_SEARCH_PROMPT, query_field="legislation_query"))
+
+
 def get_prompt_by_type(prompt_type: str, **kwargs) -> str:
     """
     Retorna o prompt apropriado baseado no tipo solicitado
@@ -172,22 +218,7 @@ def get_prompt_by_type(prompt_type: str, **kwargs) -> str:
     Returns:
         str: Prompt formatado
     """
-    prompts = {
-        'general': GENERAL_CONVERSATION_PROMPT,
-        'consultation': CONSULTATION_PROMPT,
-        'case_analysis': CASE_ANALYSIS_PROMPT,
-        'legal_research': LEGAL_RESEARCH_PROMPT,
-        'document_draft': DOCUMENT_DRAFT_PROMPT,
-        'legislation_search': LEGISLATION_SEARCH_PROMPT
-    }
-
-    # PADRÃO: Usar o prompt generalista para todos os casos, incluindo 'consultation'
-    # Isso torna o Nino mais amigável e natural em todas as interações
-    default_prompt = GENERAL_CONVERSATION_PROMPT
-
-    # Usar prompts especializados apenas para tipos específicos que não sejam 'consultation'
-    if prompt_type in ['case_analysis', 'legal_research', 'document_draft', 'legislation_search']:
-        return prompts[prompt_type].format(**kwargs)
-
-    # Para 'consultation', 'general' ou qualquer outro tipo, usar o prompt generalista
-    return default_prompt.format(query=kwargs.get('query', ''))
\ No newline at end of file
+    template = PROMPT_REGISTRY.get(prompt_type)
+    if template is PROMPT_REGISTRY.default:
+        return template.format(query=kwargs.get('query', ''))
+    return template.format(**kwargs)
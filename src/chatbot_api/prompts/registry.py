@@ -0,0 +1,152 @@
+"""
+Registro de templates de prompt pré-compilados e pré-tokenizados
+"""
+
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+# Marcador interno usado para dividir o template em torno da consulta
+_QUERY_MARKER = "\x00"
+
+
+@dataclass(frozen=True)
+class PromptSegment:
+    """Trecho de um prompt; trechos estáticos têm seus tokens em cache"""
+
+    text: str
+    static: bool = False
+
+
+@dataclass
+class AssembledPrompt:
+    """Prompt montado como sequência de trechos estáticos e dinâmicos"""
+
+    segments: List[PromptSegment]
+    registry: Optional["PromptRegistry"] = field(default=None, repr=False)
+
+    @property
+    def text(self) -> str:
+        return "".join(segment.text for segment in self.segments)
+
+    def token_ids(self, tokenizer) -> List[int]:
+        """
+        Token ids do prompt: trechos estáticos vêm do cache do registro e
+        apenas os trechos dinâmicos são tokenizados
+        """
+        if self.registry is None:
+            return tokenizer(self.text).input_ids
+        return self.registry.encode(self, tokenizer)
+
+
+class PromptTemplate:
+    """
+    Template com um único campo variável (a mensagem do usuário).
+
+    Os demais campos são preenchidos uma vez no registro e o texto é dividido
+    em prefixo e sufixo ao redor do campo da consulta.
+    """
+
+    def __init__(self, template: str, query_field: str, **defaults: Any):
+        self.template = template
+        self.query_field = query_field
+        self.defaults = defaults
+
+        rendered = template.format(**{**defaults, query_field: _QUERY_MARKER})
+        self.prefix, self.suffix = rendered.split(_QUERY_MARKER)
+
+    def render(self, query: str) -> str:
+        return f"{self.prefix}{query}{self.suffix}"
+
+    def format(self, **kwargs: Any) -> str:
+        """Formatação completa, com todos os campos informados pelo chamador"""
+        return self.template.format(**{**self.defaults, **kwargs})
+
+
+class PromptRegistry:
+    """
+    Tipos de consulta → templates. Novos tipos podem ser registrados sem
+    alterar os serviços; tipos desconhecidos usam o template padrão.
+    """
+
+    def __init__(self, system_prompt: str, default: PromptTemplate):
+        self.system_prompt = system_prompt
+        self.default = default
+        self._templates: Dict[str, PromptTemplate] = {}
+        # (tokenizer, texto) -> token ids dos trechos estáticos
+        self._token_cache: Dict[Tuple[str, str], List[int]] = {}
+        # tokenizer -> tokenizar por trechos reproduz a tokenização do texto inteiro?
+        self._segmentable: Dict[str, bool] = {}
+        self._lock = Lock()
+
+    def register(self, name: str, template: PromptTemplate):
+        self._templates[name] = template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates.get(name, self.default)
+
+    def names(self) -> List[str]:
+        return list(self._templates)
+
+    def build(self, consultation_type: str, message: str, context: str = "") -> AssembledPrompt:
+        """Monta SYSTEM_PROMPT + contexto da conversa + template do tipo de consulta"""
+        template = self.get(consultation_type)
+        segments = [PromptSegment(f"{self.system_prompt}\n\n", static=True)]
+        if context:
+            segments.append(PromptSegment(context))
+        segments.extend([
+            PromptSegment(template.prefix, static=True),
+            PromptSegment(message),
+            PromptSegment(template.suffix, static=True),
+        ])
+        return AssembledPrompt([segment for segment in segments if segment.text], registry=self)
+
+    def encode(self, prompt: AssembledPrompt, tokenizer) -> List[int]:
+        key = self._tokenizer_key(tokenizer)
+        if not self._is_segmentable(key, tokenizer):
+            return tokenizer(prompt.text).input_ids
+        return self._encode_segments(key, prompt, tokenizer)
+
+    def _encode_segments(self, key: str, prompt: AssembledPrompt, tokenizer) -> List[int]:
+        """Tokenização por trechos, sem verificar se o tokenizer a suporta"""
+        ids: List[int] = [tokenizer.bos_token_id] if tokenizer.bos_token_id is not None else []
+        for segment in prompt.segments:
+            if segment.static:
+                ids.extend(self._static_ids(key, segment.text, tokenizer))
+            else:
+                ids.extend(tokenizer(segment.text, add_special_tokens=False).input_ids)
+        return ids
+
+    def _static_ids(self, key: str, text: str, tokenizer) -> List[int]:
+        cached = self._token_cache.get((key, text))
+        if cached is None:
+            cached = tokenizer(text, add_special_tokens=False).input_ids
+            with self._lock:
+                self._token_cache[(key, text)] = cached
+        return cached
+
+    def _is_segmentable(self, key: str, tokenizer) -> bool:
+        """
+        Alguns tokenizers (ex.: SentencePiece) tokenizam diferente nas bordas
+        dos trechos. Verifica uma vez por tokenizer se a concatenação é fiel;
+        caso contrário, o prompt inteiro é tokenizado normalmente.
+        """
+        segmentable = self._segmentable.get(key)
+        if segmentable is None:
+            probes = [
+                self.build(name, "Qual o prazo de prescrição?", "Usuário: Olá\n")
+                for name in [*self._templates, None]
+            ]
+            # As sondas usam o caminho por trechos diretamente: nenhuma outra
+            # thread vê o tokenizer como segmentável antes do resultado
+            segmentable = all(
+                self._encode_segments(key, probe, tokenizer) == tokenizer(probe.text).input_ids
+                for probe in probes
+            )
+            with self._lock:
+                self._segmentable[key] = segmentable
+        return segmentable
+
+    @staticmethod
+    def _tokenizer_key(tokenizer) -> str:
+        return f"{getattr(tokenizer, 'name_or_path', '')}:{id(tokenizer)}"
@@ -0,0 +1,95 @@
+"""
+Backends de inferência: o backend ativo é escolhido por Settings.inference_backend
+"""
+
+from typing import Optional
+
+from ...core.config import Settings, settings as default_settings
+from .base import AdapterError, BackendCapabilities, GenerationControl, InferenceBackend
+from .generation import GenerationConfig
+from .postprocess import ResponseFilter, filter_stream
+
+
+def create_backend(config: Optional[Settings] = None) -> InferenceBackend:
+    """Instancia o backend configurado e carrega os adaptadores LoRA de Settings.lora_adapters"""
+    config = config or default_settings
+    backend = _instantiate_backend(config)
+    for name, path in config.lora_adapters.items():
+        backend.load_adapter(name, path)
+    return backend
+
+
+def _instantiate_backend(config: Settings) -> InferenceBackend:
+    """Instancia o backend configurado ("huggingface", "gguf", "remote", "queue" ou "mock")"""
+    generation = GenerationConfig.from_settings(config)
+
+    if config.inference_backend == "huggingface":
+        # Importado sob demanda: torch/transformers só são necessários aqui
+        from .cpu_profile import CPUProfile
+        from .huggingface import HuggingFaceBackend
+
+        return HuggingFaceBackend(
+            model_name=config.model_name,
+            max_new_tokens=config.max_new_tokens,
+            token=config.huggingface_hub_token,
+            optimized=config.hf_optimized,
+            generation=generation,
+            cpu_profile=CPUProfile.from_settings(config),
+            profile_report=config.cpu_profile_report,
+        )
+
+    if config.inference_backend == "gguf":
+        from .gguf import GGUFBackend
+
+        return GGUFBackend(
+            model_path=config.gguf_model_path,
+            model_name=config.model_name,
+            max_new_tokens=config.max_new_tokens,
+            n_ctx=config.gguf_n_ctx,
+            n_threads=config.gguf_n_threads,
+            n_batch=config.gguf_n_batch,
+            generation=generation,
+        )
+
+    if config.inference_backend == "remote":
+        from .remote import RemoteBackend
+
+        return RemoteBackend(
+            base_url=config.remote_inference_url,
+            model_name=config.remote_inference_model or config.model_name,
+            max_new_tokens=config.max_new_tokens,
+            api_key=config.remote_inference_api_key,
+            timeout=config.remote_inference_timeout,
+            generation=generation,
+        )
+
+    if config.inference_backend == "queue":
+        from ..queue import create_job_queue
+        from .queued import QueueBackend
+
+        return QueueBackend(
+            queue=create_job_queue(config),
+            model_name=config.model_name,
+            max_new_tokens=config.max_new_tokens,
+            timeout=config.remote_inference_timeout,
+            generation=generation,
+        )
+
+    if config.inference_backend == "mock":
+        from .mock import MockBackend
+
+        return MockBackend(model_name=config.model_name, max_new_tokens=config.max_new_tokens, generation=generation)
+
+    raise ValueError(f"Backend de inferência desconhecido: {config.inference_backend}")
+
+
+__all__ = [
+    "AdapterError",
+    "BackendCapabilities",
+    "GenerationConfig",
+    "GenerationControl",
+    "InferenceBackend",
+    "ResponseFilter",
+    "create_backend",
+    "filter_stream",
+]
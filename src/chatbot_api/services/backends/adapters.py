@@ -0,0 +1,148 @@
+"""
+Adaptadores LoRA sobre um único modelo base (PEFT)
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .base import AdapterError
+
+
+class AdapterManager:
+    """
+    Mantém vários adaptadores LoRA carregados sobre o mesmo modelo base.
+
+    Os pesos do modelo base são compartilhados: cada adaptador acrescenta
+    apenas suas matrizes de baixo posto (alguns MB em um modelo 7B). Como o
+    adaptador ativo é um estado global do modelo, o acesso segue um esquema
+    leitores/escritor: gerações com o mesmo adaptador (ou sem adaptador)
+    rodam em paralelo; trocar de adaptador espera as gerações em curso
+    terminarem, e carregar/descarregar é exclusivo.
+    """
+
+    def __init__(self, model):
+        self.base_model = model
+        # Vira um PeftModel ao carregar o primeiro adaptador
+        self.model = model
+        self.paths: Dict[str, str] = {}
+        self._condition = threading.Condition()
+        # Adaptador das gerações em curso (None: modelo base) e quantas são
+        self._active: Optional[str] = None
+        self._users = 0
+        self._writing = False
+        # Escritores e gerações com outro adaptador à espera: novas gerações
+        # com o adaptador ativo não passam na frente deles
+        self._waiting = 0
+        # Incrementado a cada rodada de gerações (primeira geração após o modelo ficar livre)
+        self._round = 0
+
+    @property
+    def has_adapters(self) -> bool:
+        return bool(self.paths)
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting += 1
+            try:
+                self._condition.wait_for(lambda: not self._writing and self._users == 0)
+            finally:
+                self._waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+    def load(self, name: str, path: str):
+        try:
+            from peft import PeftModel
+        except ImportError as e:
+            raise AdapterError(
+                "Adaptadores LoRA requerem o pacote peft; instale com: pip install -e '.[lora]'"
+            ) from e
+
+        with self._exclusive():
+            if name in self.paths:
+                # Recarregar com o mesmo nome substitui o adaptador
+                self.model.delete_adapter(name)
+                del self.paths[name]
+
+            try:
+                if not self.paths and self.model is self.base_model:
+                    self.model = PeftModel.from_pretrained(
+                        self.base_model, path, adapter_name=name, is_trainable=False
+                    )
+                else:
+                    self.model.load_adapter(path, adapter_name=name, is_trainable=False)
+            except (OSError, ValueError) as e:
+                raise AdapterError(f"Não foi possível carregar o adaptador '{name}' de {path}: {e}") from e
+
+            self.model.eval()
+            self.paths[name] = path
+            # O estado do modelo mudou: a próxima geração reaplica o seu adaptador
+            self._active = None
+
+    def unload(self, name: str):
+        with self._exclusive():
+            if name not in self.paths:
+                raise AdapterError(f"Adaptador LoRA não carregado: {name}")
+
+            del self.paths[name]
+            if self.paths:
+                self.model.delete_adapter(name)
+            else:
+                # Último adaptador: remover as camadas LoRA e voltar ao modelo base
+                self.base_model = self.model.unload()
+                self.model = self.base_model
+            self._active = None
+
+    def _activate(self, name: Optional[str]):
+        """Aplica o adaptador ao modelo (chamado sem gerações em curso)"""
+        if not self.paths:
+            return
+        if name is None:
+            self.model.base_model.disable_adapter_layers()
+        else:
+            self.model.base_model.enable_adapter_layers()
+            self.model.set_adapter(name)
+
+    @contextmanager
+    def use(self, name: Optional[str]) -> Iterator:
+        """Ativa o adaptador `name` (ou nenhum) durante a geração e devolve o modelo a usar"""
+        with self._condition:
+            if name is not None and name not in self.paths:
+                raise AdapterError(f"Adaptador LoRA não carregado: {name}")
+
+            if not (self._users and self._active == name and not self._waiting and not self._writing):
+                # Entra quando o modelo fica livre ou, se outra rodada de gerações
+                # com o mesmo adaptador começar depois desta espera, junto com ela
+                arrived = self._round
+                self._waiting += 1
+                try:
+                    self._condition.wait_for(lambda: not self._writing and (
+                        self._users == 0 or (self._active == name and self._round != arrived)
+                    ))
+                finally:
+                    self._waiting -= 1
+                # O adaptador pode ter sido descarregado durante a espera
+                if name is not None and name not in self.paths:
+                    self._condition.notify_all()
+                    raise AdapterError(f"Adaptador LoRA não carregado: {name}")
+                if self._users == 0:
+                    self._activate(name)
+                    self._active = name
+                    self._round += 1
+                    self._condition.notify_all()
+            self._users += 1
+            model = self.model
+        try:
+            yield model
+        finally:
+            with self._condition:
+                self._users -= 1
+                if self._users == 0:
+                    self._condition.notify_all()
@@ -0,0 +1,182 @@
+"""
+Interface comum dos backends de inferência
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from ...prompts.registry import AssembledPrompt
+from .generation import GenerationConfig
+from .postprocess import filter_stream
+
+
+@dataclass(frozen=True)
+class BackendCapabilities:
+    """O que um backend suporta além da geração simples"""
+
+    streaming: bool = False
+    batching: bool = False
+    prefix_cache: bool = False
+    # Adaptadores LoRA carregados/trocados em tempo de execução
+    adapters: bool = False
+
+
+class AdapterError(ValueError):
+    """Adaptador LoRA inexistente, inválido ou não suportado pelo backend"""
+
+
+class GenerationControl:
+    """
+    Prazo e cancelamento de uma geração, verificados a cada token gerado.
+
+    Quando a geração é interrompida, o texto gerado até ali é devolvido e
+    `truncated` fica verdadeiro.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        # Instante limite em time.monotonic()
+        self.deadline = deadline
+        self.truncated = False
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def with_timeout(cls, seconds: Optional[float]) -> "GenerationControl":
+        return cls(time.monotonic() + seconds if seconds else None)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def should_stop(self) -> bool:
+        if self._cancelled.is_set() or (self.deadline is not None and time.monotonic() >= self.deadline):
+            self.truncated = True
+            return True
+        return False
+
+
+class InferenceBackend(ABC):
+    """
+    Backend de geração de texto usado pelos serviços de chatbot.
+
+    Todos os métodos são síncronos e devem ser chamados fora do event loop
+    (ex.: via asyncio.to_thread).
+    """
+
+    name: str = "base"
+    capabilities: BackendCapabilities = BackendCapabilities()
+
+    def __init__(self, model_name: str, max_new_tokens: int, generation: Optional[GenerationConfig] = None):
+        self.model_name = model_name
+        self.max_new_tokens = max_new_tokens
+        # Parâmetros usados quando a chamada não traz os seus
+        self.generation = generation or GenerationConfig()
+        # Padrões de amostragem do backend, aplicados aos parâmetros não definidos
+        self.generation_defaults: Dict[str, Any] = {}
+
+    def _generation(self, generation: Optional[GenerationConfig]) -> GenerationConfig:
+        """Parâmetros efetivos de uma chamada"""
+        return (generation or self.generation).with_defaults(**self.generation_defaults)
+
+    @abstractmethod
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        """
+        Gera a continuação de um prompt, sem ecoar o prompt (com o adaptador
+        LoRA `adapter`, se houver, e os parâmetros `generation` ou os do backend)
+        """
+
+    def generate_prompt(
+        self,
+        prompt: AssembledPrompt,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        """Gera a partir de um prompt montado pelo PromptRegistry"""
+        return self.generate(prompt.text, max_new_tokens, control, adapter, generation)
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        max_new_tokens: Optional[int] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> List[str]:
+        """Gera respostas para vários prompts; sem suporte a lote, gera um a um"""
+        return [self.generate(prompt, max_new_tokens, generation=generation) for prompt in prompts]
+
+    def stream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> Iterator[str]:
+        """Gera a resposta em pedaços; sem suporte a streaming, entrega tudo de uma vez"""
+        yield self.generate(prompt, max_new_tokens, control, adapter, generation)
+
+    def _collect_stream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int],
+        control: GenerationControl,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        """
+        Geração interrompível para backends cujo único ponto de parada é o
+        streaming. O texto passa pelo ResponseFilter: eco de turno ou loop de
+        repetição também encerram o stream (e a geração).
+        """
+        parts = []
+        for text in filter_stream(self.stream(prompt, max_new_tokens, control, adapter, generation)):
+            parts.append(text)
+            if control.should_stop():
+                break
+        return "".join(parts).strip()
+
+    def prepare_for_fork(self):
+        """Chamado no processo pai, com o modelo carregado, antes do fork dos workers"""
+
+    def after_fork(self, worker_index: int, workers: int):
+        """Chamado em cada worker logo após o fork"""
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """Bytes estimados das estruturas do backend que crescem com a carga (ex.: cache KV)"""
+        return {}
+
+    def count_tokens(self, text: str) -> int:
+        """Número de tokens de um texto; sem tokenizer disponível, aproxima por palavras"""
+        return len(text.split())
+
+    def load_adapter(self, name: str, path: str):
+        """Carrega (ou substitui) um adaptador LoRA sobre o modelo base já carregado"""
+        raise AdapterError(f"O backend '{self.name}' não suporta adaptadores LoRA em tempo de execução")
+
+    def unload_adapter(self, name: str):
+        """Descarrega um adaptador LoRA"""
+        raise AdapterError(f"O backend '{self.name}' não suporta adaptadores LoRA em tempo de execução")
+
+    def list_adapters(self) -> Dict[str, str]:
+        """Adaptadores carregados (nome -> caminho)"""
+        return {}
+
+    def _check_adapter(self, adapter: Optional[str]):
+        if adapter is not None and adapter not in self.list_adapters():
+            raise AdapterError(f"Adaptador LoRA não carregado: {adapter}")
@@ -0,0 +1,249 @@
+"""
+Perfil de desempenho do backend huggingface em CPU
+
+Reúne os ajustes que, sem GPU, mudam a vazão da geração:
+- implementação de atenção (`sdpa`: kernel fundido do PyTorch, em vez do
+  cálculo "eager" com a matriz de atenção materializada);
+- `torch.compile` do forward do modelo, com aquecimento na inicialização
+  (a compilação acontece no primeiro uso, não na primeira requisição);
+- threads intra-op (paralelismo dentro de um operador) e inter-op;
+- parâmetros do malloc do glibc (arenas e devolução de memória ao sistema).
+
+`compare_profiles` mede as variantes no modelo carregado (tokens/s e
+paridade das saídas com decodificação gulosa) e produz o relatório exibido na
+inicialização (CPU_PROFILE_REPORT) e por scripts/bench_cpu_profile.py.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence
+
+import torch
+
+from ...core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Constantes de mallopt (malloc.h do glibc)
+M_TRIM_THRESHOLD = -1
+M_ARENA_MAX = -8
+
+
+@dataclass(frozen=True)
+class CPUProfile:
+    # "sdpa", "eager" ou None (padrão do transformers para o modelo)
+    attn_implementation: Optional[str] = "sdpa"
+    compile: bool = False
+    compile_mode: str = "default"
+    # None = padrão do PyTorch (um thread por núcleo físico)
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+    # None = padrão do glibc
+    malloc_arena_max: Optional[int] = None
+    malloc_trim_threshold: Optional[int] = None
+
+    @classmethod
+    def from_settings(cls, config: Settings) -> "CPUProfile":
+        return cls(
+            attn_implementation=None if config.cpu_attn_implementation == "auto" else config.cpu_attn_implementation,
+            compile=config.cpu_compile,
+            compile_mode=config.cpu_compile_mode,
+            intra_op_threads=config.cpu_intra_op_threads,
+            inter_op_threads=config.cpu_inter_op_threads,
+            malloc_arena_max=config.cpu_malloc_arena_max,
+            malloc_trim_threshold=config.cpu_malloc_trim_threshold,
+        )
+
+
+def apply_runtime_settings(profile: CPUProfile) -> dict:
+    """
+    Threads e malloc do processo. Deve rodar antes de carregar o modelo: o
+    número de threads inter-op só pode ser definido antes do primeiro uso.
+    """
+    if profile.intra_op_threads:
+        torch.set_num_threads(profile.intra_op_threads)
+    if profile.inter_op_threads:
+        try:
+            torch.set_num_interop_threads(profile.inter_op_threads)
+        except RuntimeError:
+            logger.warning("Inter-op threads already in use, keeping the current setting",
+                           extra={"threads": torch.get_num_interop_threads()})
+
+    malloc = {}
+    if profile.malloc_arena_max is not None:
+        malloc["arena_max"] = _mallopt(M_ARENA_MAX, profile.malloc_arena_max)
+    if profile.malloc_trim_threshold is not None:
+        malloc["trim_threshold"] = _mallopt(M_TRIM_THRESHOLD, profile.malloc_trim_threshold)
+
+    return {
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads(),
+        "malloc": malloc,
+    }
+
+
+def _mallopt(option: int, value: int) -> bool:
+    path = ctypes.util.find_library("c")
+    try:
+        libc = ctypes.CDLL(path)
+        applied = bool(libc.mallopt(option, value))
+    except (OSError, AttributeError, TypeError):
+        # Outra libc (musl, macOS): sem mallopt
+        applied = False
+    if not applied:
+        logger.warning("mallopt not available, allocator setting ignored", extra={"option": option})
+    return applied
+
+
+def set_attention(model, implementation: Optional[str]):
+    """Troca a implementação de atenção de um modelo já carregado"""
+    if implementation is None:
+        return
+    if hasattr(model, "set_attn_implementation"):
+        model.set_attn_implementation(implementation)
+    else:
+        model.config._attn_implementation = implementation
+
+
+def compile_model(model, mode: str = "default"):
+    """
+    Compila o forward do modelo no lugar. `dynamic=True`: o comprimento da
+    sequência e do cache muda a cada passo da geração, e cada forma nova não
+    deve disparar uma recompilação.
+    """
+    model.forward = torch.compile(model.forward, mode=mode, dynamic=True)
+    return model
+
+
+def is_compiled(model) -> bool:
+    return "forward" in vars(model)
+
+
+def warm_up(model, tokenizer, prompt: str = "Olá", max_new_tokens: int = 8) -> float:
+    """Uma geração curta: compila (se for o caso) e aloca os buffers antes da primeira requisição"""
+    started = time.perf_counter()
+    _generate(model, tokenizer, prompt, max_new_tokens)
+    return time.perf_counter() - started
+
+
+def _generate(model, tokenizer, prompt: str, max_new_tokens: int) -> List[int]:
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    with torch.inference_mode():
+        output = model.generate(
+            **inputs,
+            do_sample=False,
+            # Mesmo número de tokens em todas as variantes: tokens/s comparáveis
+            max_new_tokens=max_new_tokens,
+            min_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+        )
+    return output[0, inputs["input_ids"].shape[1]:].tolist()
+
+
+@dataclass(frozen=True)
+class ProfileVariant:
+    attn_implementation: Optional[str]
+    compile: bool = False
+    threads: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        parts = [self.attn_implementation or "auto"]
+        if self.compile:
+            parts.append("compile")
+        if self.threads:
+            parts.append(f"{self.threads}t")
+        return "+".join(parts)
+
+
+def default_variants(profile: CPUProfile) -> List[ProfileVariant]:
+    """eager e sdpa sem compilação, e a variante configurada (se diferente delas)"""
+    variants = [ProfileVariant("eager"), ProfileVariant("sdpa")]
+    configured = ProfileVariant(profile.attn_implementation, profile.compile)
+    if configured not in variants:
+        variants.append(configured)
+    return variants
+
+
+@contextmanager
+def _variant(model, variant: ProfileVariant, compile_mode: str) -> Iterator[None]:
+    previous_attention = model.config._attn_implementation
+    previous_threads = torch.get_num_threads()
+    # O forward compilado fica no __dict__ da instância; sem ele, vale o da classe
+    compiled_forward = vars(model).pop("forward", None)
+    try:
+        set_attention(model, variant.attn_implementation)
+        if variant.threads:
+            torch.set_num_threads(variant.threads)
+        if variant.compile:
+            if compiled_forward is not None:
+                model.forward = compiled_forward
+            else:
+                compile_model(model, compile_mode)
+        yield
+    finally:
+        vars(model).pop("forward", None)
+        if compiled_forward is not None:
+            model.forward = compiled_forward
+        set_attention(model, previous_attention)
+        torch.set_num_threads(previous_threads)
+
+
+def compare_profiles(
+    model,
+    tokenizer,
+    prompts: Sequence[str],
+    variants: Sequence[ProfileVariant],
+    max_new_tokens: int = 32,
+    compile_mode: str = "default"
+) -> List[dict]:
+    """
+    Mede cada variante com decodificação gulosa sobre os mesmos prompts. A
+    primeira variante é a referência de velocidade (`speedup`) e de saída
+    (`parity`: fração dos prompts cujos tokens gerados são idênticos aos dela).
+    O modelo volta ao estado original no fim.
+    """
+    rows: List[dict] = []
+    reference: Optional[List[List[int]]] = None
+    reference_rate = None
+    for variant in variants:
+        with _variant(model, variant, compile_mode):
+            # Aquecimento fora da medição (inclui o tempo de compilação)
+            warmup_seconds = warm_up(model, tokenizer, prompts[0], max_new_tokens=4)
+            outputs, tokens = [], 0
+            started = time.perf_counter()
+            for prompt in prompts:
+                generated = _generate(model, tokenizer, prompt, max_new_tokens)
+                outputs.append(generated)
+                tokens += len(generated)
+            seconds = time.perf_counter() - started
+
+        rate = tokens / seconds if seconds > 0 else 0.0
+        if reference is None:
+            reference, reference_rate = outputs, rate
+        same = sum(output == expected for output, expected in zip(outputs, reference))
+        rows.append({
+            "variant": variant.label,
+            "attn_implementation": variant.attn_implementation,
+            "compile": variant.compile,
+            "threads": variant.threads or torch.get_num_threads(),
+            "warmup_seconds": round(warmup_seconds, 2),
+            "tokens_per_second": round(rate, 2),
+            "speedup": round(rate / reference_rate, 2) if reference_rate else None,
+            "parity": round(same / len(prompts), 3),
+        })
+    return rows
+
+
+def format_report(rows: Sequence[dict]) -> str:
+    lines = [f"{'variante':<22}{'threads':>8}{'aquec. (s)':>12}{'tok/s':>10}{'speedup':>9}{'paridade':>10}"]
+    for row in rows:
+        lines.append(
+            f"{row['variant']:<22}{row['threads']:>8}{row['warmup_seconds']:>12}"
+            f"{row['tokens_per_second']:>10}{row['speedup']:>9}{row['parity']:>10}"
+        )
+    return "\n".join(lines)
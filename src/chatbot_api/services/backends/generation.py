@@ -0,0 +1,75 @@
+"""
+Parâmetros de geração (amostragem) independentes do backend
+
+O padrão vem de Settings (GENERATION_*), pode ser ajustado por tipo de
+consulta (CONSULTATION_GENERATION) e por requisição. No modo determinístico
+— decodificação gulosa (temperature=0) ou amostragem com semente fixa — o
+mesmo prompt gera sempre a mesma resposta, que pode então ser guardada em
+cache por (modelo, parâmetros, hash do prompt).
+"""
+
+import json
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Mapping, Optional
+
+from ...core.config import Settings
+
+
+@dataclass(frozen=True)
+class GenerationConfig:
+    # 0 = decodificação gulosa (sem amostragem)
+    temperature: float = 0.7
+    top_p: Optional[float] = None
+    top_k: Optional[int] = None
+    repetition_penalty: Optional[float] = None
+    # Semente da amostragem: respostas reprodutíveis mesmo com temperature > 0
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_settings(cls, config: Settings) -> "GenerationConfig":
+        return cls(
+            temperature=config.generation_temperature,
+            top_p=config.generation_top_p,
+            top_k=config.generation_top_k,
+            repetition_penalty=config.generation_repetition_penalty,
+            seed=config.generation_seed,
+        )
+
+    @classmethod
+    def from_dict(cls, values: Mapping[str, Any]) -> "GenerationConfig":
+        return cls().merged(values)
+
+    @property
+    def greedy(self) -> bool:
+        return self.temperature <= 0
+
+    @property
+    def deterministic(self) -> bool:
+        return self.greedy or self.seed is not None
+
+    def merged(self, overrides: Optional[Mapping[str, Any]]) -> "GenerationConfig":
+        """Cópia com os valores de `overrides` que não são None"""
+        if not overrides:
+            return self
+        names = {field.name for field in fields(self)}
+        unknown = set(overrides) - names
+        if unknown:
+            raise ValueError(f"Parâmetros de geração desconhecidos: {', '.join(sorted(unknown))}")
+        return replace(self, **{name: value for name, value in overrides.items() if value is not None})
+
+    def with_defaults(self, **defaults: Any) -> "GenerationConfig":
+        """Preenche apenas os parâmetros ainda não definidos (ex.: padrões de um backend)"""
+        return replace(self, **{name: value for name, value in defaults.items() if getattr(self, name) is None})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def key(self) -> str:
+        """
+        Identificação canônica para chaves de cache: na decodificação gulosa,
+        semente e parâmetros de amostragem não alteram a saída e ficam de fora.
+        """
+        values = asdict(self)
+        if self.greedy:
+            values.update(temperature=0, top_p=None, top_k=None, seed=None)
+        return json.dumps(values, sort_keys=True)
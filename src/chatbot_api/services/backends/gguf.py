@@ -0,0 +1,118 @@
+"""
+Backend de inferência em CPU com modelos GGUF quantizados (llama.cpp)
+"""
+
+import os
+import threading
+from typing import Iterator, Optional
+
+from .base import BackendCapabilities, GenerationControl, InferenceBackend
+from .generation import GenerationConfig
+
+
+class GGUFBackend(InferenceBackend):
+    """
+    Executa um Jurema-7B convertido para GGUF (ex.: Q4_K_M / Q5_K_M) via
+    llama-cpp-python.
+
+    Os pesos são mapeados em memória (mmap) e somente leitura: vários
+    processos que abrem o mesmo arquivo compartilham as mesmas páginas do
+    page cache, em vez de cada worker manter sua própria cópia.
+
+    O contexto do llama.cpp (KV cache, estado da amostragem) não é seguro
+    entre threads: uma geração por vez, sob `self.lock`.
+    """
+
+    name = "gguf"
+    # llama.cpp reaproveita o KV cache do prefixo comum com o prompt anterior
+    capabilities = BackendCapabilities(streaming=True, batching=False, prefix_cache=True)
+
+    def __init__(
+        self,
+        model_path: str,
+        model_name: str,
+        max_new_tokens: int,
+        n_ctx: int = 4096,
+        n_threads: Optional[int] = None,
+        n_batch: int = 512,
+        generation: Optional[GenerationConfig] = None,
+    ):
+        super().__init__(model_name, max_new_tokens, generation)
+        # Amostragem padrão do llama.cpp neste projeto, salvo quando configurada explicitamente
+        self.generation_defaults = {"top_p": 0.9, "repetition_penalty": 1.1}
+        try:
+            from llama_cpp import Llama
+        except ImportError as e:
+            raise ImportError(
+                "O backend GGUF requer llama-cpp-python: pip install llama-cpp-python"
+            ) from e
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Modelo GGUF não encontrado: {model_path}. Gere-o com scripts/convert_to_gguf.py"
+            )
+
+        self.model_path = model_path
+        self.llm = Llama(
+            model_path=model_path,
+            n_ctx=n_ctx,
+            n_threads=n_threads or os.cpu_count(),
+            n_batch=n_batch,
+            use_mmap=True,
+            use_mlock=False,
+            verbose=False,
+        )
+        self.lock = threading.Lock()
+
+    def _completion_kwargs(self, max_new_tokens: Optional[int], generation: Optional[GenerationConfig]) -> dict:
+        generation = self._generation(generation)
+        kwargs = {
+            "max_tokens": max_new_tokens or self.max_new_tokens,
+            # temperature 0: llama.cpp escolhe sempre o token mais provável
+            "temperature": max(generation.temperature, 0.0),
+        }
+        if generation.top_p is not None:
+            kwargs["top_p"] = generation.top_p
+        if generation.top_k is not None:
+            kwargs["top_k"] = generation.top_k
+        if generation.repetition_penalty is not None:
+            kwargs["repeat_penalty"] = generation.repetition_penalty
+        if generation.seed is not None:
+            kwargs["seed"] = generation.seed
+        return kwargs
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        # LoRA no llama.cpp só é aplicado na carga do modelo (convert_to_gguf.py pode mesclá-lo)
+        self._check_adapter(adapter)
+        if control is not None:
+            # Fechar o gerador de streaming interrompe a decodificação no llama.cpp
+            return self._collect_stream(prompt, max_new_tokens, control, generation=generation)
+        with self.lock:
+            result = self.llm.create_completion(prompt, **self._completion_kwargs(max_new_tokens, generation))
+        return result["choices"][0]["text"].strip()
+
+    def stream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> Iterator[str]:
+        self._check_adapter(adapter)
+        # A trava vale até o fim da iteração (ou até o consumidor fechar o gerador)
+        with self.lock:
+            for chunk in self.llm.create_completion(prompt, stream=True, **self._completion_kwargs(max_new_tokens, generation)):
+                text = chunk["choices"][0]["text"]
+                if text:
+                    yield text
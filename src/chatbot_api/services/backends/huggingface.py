@@ -0,0 +1,499 @@
+"""
+Backend de inferência in-process com Hugging Face Transformers
+"""
+
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    BitsAndBytesConfig,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+from transformers.generation.streamers import BaseStreamer
+import torch
+import logging
+import os
+from contextlib import contextmanager
+from queue import SimpleQueue
+from threading import Lock, Thread
+from typing import Dict, Iterator, List, Optional
+
+from ...prompts.registry import AssembledPrompt
+from .adapters import AdapterManager
+from .base import BackendCapabilities, GenerationControl, InferenceBackend
+from .cpu_profile import (
+    CPUProfile,
+    apply_runtime_settings,
+    compare_profiles,
+    compile_model,
+    default_variants,
+    warm_up,
+)
+from .generation import GenerationConfig
+from .postprocess import IncrementalDetokenizer, ResponseFilter
+
+logger = logging.getLogger(__name__)
+
+
+# Prompts curtos do relatório de desempenho (CPU_PROFILE_REPORT)
+PROFILE_PROMPTS = [
+    "Qual o prazo de prescrição para cobrança de dívidas?",
+    "Como contestar uma multa administrativa?",
+]
+
+
+class ControlStoppingCriteria(StoppingCriteria):
+    """Interrompe a decodificação quando o prazo expira ou a requisição é cancelada"""
+
+    def __init__(self, control: GenerationControl):
+        self.control = control
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.control.should_stop()
+
+
+class ResponseFilterCriteria(StoppingCriteria):
+    """
+    Detokeniza incrementalmente o token novo de cada sequência e o passa pelo
+    ResponseFilter da sequência; para as que ecoaram um turno ou entraram em
+    loop. O texto final de cada sequência sai direto do filtro, sem decodificar
+    a saída inteira no fim.
+    """
+
+    def __init__(self, tokenizer, batch_size: int):
+        self.detokenizers = [IncrementalDetokenizer(tokenizer) for _ in range(batch_size)]
+        self.filters = [ResponseFilter() for _ in range(batch_size)]
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = []
+        for detokenizer, response_filter, token in zip(self.detokenizers, self.filters, input_ids[:, -1].tolist()):
+            # Sequências já encerradas recebem padding (token especial, ignorado)
+            if not response_filter.stopped:
+                response_filter.feed(detokenizer.push([token]))
+            done.append(response_filter.stopped)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    def responses(self) -> List[str]:
+        for detokenizer, response_filter in zip(self.detokenizers, self.filters):
+            if not response_filter.stopped:
+                response_filter.feed(detokenizer.flush())
+        return [response_filter.output for response_filter in self.filters]
+
+
+class FilteredStreamer(BaseStreamer):
+    """
+    Streamer com detokenização incremental (TextIteratorStreamer decodifica
+    todos os tokens da linha a cada passo) e ResponseFilter; usado junto com
+    um StoppingCriteria que consulta `response_filter.stopped`.
+    """
+
+    def __init__(self, tokenizer):
+        self.detokenizer = IncrementalDetokenizer(tokenizer)
+        self.response_filter = ResponseFilter()
+        self.queue: SimpleQueue = SimpleQueue()
+        self.error: Optional[BaseException] = None
+        self._prompt_seen = False
+
+    def put(self, value):
+        # A primeira chamada traz os tokens do prompt
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        if self.response_filter.stopped:
+            return
+        text = self.response_filter.feed(self.detokenizer.push(value.reshape(-1).tolist()))
+        if text:
+            self.queue.put(text)
+
+    def end(self):
+        if not self.response_filter.stopped:
+            self.response_filter.feed(self.detokenizer.flush())
+        text = self.response_filter.finish()
+        if text:
+            self.queue.put(text)
+        self.queue.put(None)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            text = self.queue.get()
+            if text is None:
+                break
+            yield text
+        if self.error is not None:
+            raise self.error
+
+
+class FilterStoppingCriteria(StoppingCriteria):
+    def __init__(self, response_filter: ResponseFilter):
+        self.response_filter = response_filter
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.response_filter.stopped
+
+
+class HuggingFaceBackend(InferenceBackend):
+    """
+    Carrega o modelo no próprio processo.
+
+    No modo otimizado (deploy em GPU) usa quantização 4-bit quando disponível,
+    limita o contexto a 2048 tokens e a geração a 256 tokens. Em CPU, aplica o
+    `cpu_profile` (atenção, torch.compile, threads e malloc).
+    """
+
+    name = "huggingface"
+    capabilities = BackendCapabilities(streaming=True, batching=True, prefix_cache=False, adapters=True)
+
+    def __init__(
+        self,
+        model_name: str,
+        max_new_tokens: int,
+        token: Optional[str] = None,
+        optimized: bool = False,
+        generation: Optional[GenerationConfig] = None,
+        cpu_profile: Optional[CPUProfile] = None,
+        profile_report: bool = False,
+    ):
+        super().__init__(model_name, max_new_tokens, generation)
+        self.token = token
+        self.optimized = optimized
+        self.cpu_profile = cpu_profile or CPUProfile()
+        self.profile_report = profile_report
+        # Ajustes efetivos de CPU e, com profile_report, a comparação das variantes
+        self.cpu_report: Optional[dict] = None
+        if optimized:
+            # Amostragem do modo otimizado, salvo quando configurada explicitamente
+            self.generation_defaults = {"top_p": 0.9, "top_k": 50, "repetition_penalty": 1.1}
+        self.hf_model = None
+        self.tokenizer = None
+        # Posições do cache KV reservadas pelas gerações em curso (ver memory_footprint)
+        self._kv_tokens = 0
+        self._kv_lock = Lock()
+        self.device = self._get_optimal_device()
+        self._load_model()
+
+    def _get_optimal_device(self) -> str:
+        """Determina o melhor device disponível"""
+        if torch.cuda.is_available():
+            return "cuda"
+        elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
+            return "mps"
+        else:
+            return "cpu"
+
+    def _load_model(self):
+        if self.optimized:
+            logger.info("Loading model", extra={"model": self.model_name, "device": self.device})
+
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            self.model_name,
+            token=self.token,
+            padding_side='left'
+        )
+
+        # Definir pad token se não existir
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        if self.device == "cpu":
+            # Threads e malloc antes de carregar os pesos
+            runtime = apply_runtime_settings(self.cpu_profile)
+
+        if self.device == "mps":
+            torch_dtype = torch.float16  # MPS works better with float16
+        elif self.device == "cuda":
+            torch_dtype = torch.float16 if self.optimized else torch.bfloat16
+        else:
+            torch_dtype = torch.float32
+
+        model_kwargs = {
+            "token": self.token,
+            "torch_dtype": torch_dtype,
+            "low_cpu_mem_usage": True,
+        }
+
+        if self.device == "cpu" and self.cpu_profile.attn_implementation:
+            model_kwargs["attn_implementation"] = self.cpu_profile.attn_implementation
+
+        if self.optimized:
+            model_kwargs["trust_remote_code"] = True
+            # Configuração de quantização para economia de memória
+            if self.device == "cuda":
+                try:
+                    model_kwargs["quantization_config"] = BitsAndBytesConfig(
+                        load_in_4bit=True,
+                        bnb_4bit_compute_dtype=torch.float16,
+                        bnb_4bit_use_double_quant=True,
+                        bnb_4bit_quant_type="nf4"
+                    )
+                    logger.info("4-bit quantization enabled")
+                except ImportError:
+                    logger.warning("BitsAndBytes not available, loading without quantization")
+                    model_kwargs["device_map"] = "auto"
+            elif self.device != "cpu":
+                model_kwargs["device_map"] = "auto"
+
+        self.hf_model = AutoModelForCausalLM.from_pretrained(
+            self.model_name,
+            **model_kwargs
+        )
+
+        # Mover para device se não usando device_map nem quantização
+        if "device_map" not in model_kwargs and "quantization_config" not in model_kwargs:
+            self.hf_model = self.hf_model.to(self.device)
+
+        if self.device == "cpu":
+            self._apply_cpu_profile(runtime)
+
+        # Adaptadores LoRA são aplicados sobre este mesmo modelo base
+        self.adapters = AdapterManager(self.hf_model)
+        self.kv_bytes_per_token = self._kv_bytes_per_token()
+
+        if self.optimized:
+            logger.info("Model loaded", extra={"model": self.model_name, "device": self.device})
+
+    def _apply_cpu_profile(self, runtime: dict):
+        self.hf_model.eval()
+        report = {
+            **runtime,
+            "attn_implementation": self.hf_model.config._attn_implementation,
+            "compile": self.cpu_profile.compile,
+        }
+
+        if self.profile_report:
+            # Antes de compilar o modelo servido: a variante compilada é medida à parte
+            rows = compare_profiles(
+                self.hf_model,
+                self.tokenizer,
+                PROFILE_PROMPTS,
+                default_variants(self.cpu_profile),
+                compile_mode=self.cpu_profile.compile_mode
+            )
+            report["variants"] = rows
+            for row in rows:
+                logger.info("CPU profile variant", extra=row)
+
+        if self.cpu_profile.compile:
+            compile_model(self.hf_model, self.cpu_profile.compile_mode)
+            # A compilação acontece aqui, não na primeira requisição
+            report["warmup_seconds"] = round(warm_up(self.hf_model, self.tokenizer), 2)
+
+        self.cpu_report = report
+        logger.info("CPU profile applied", extra=report)
+
+    def _kv_bytes_per_token(self) -> int:
+        """Chaves e valores de todas as camadas para uma posição da sequência"""
+        config = self.hf_model.config
+        try:
+            heads = config.num_attention_heads
+            kv_heads = getattr(config, "num_key_value_heads", None) or heads
+            head_dim = getattr(config, "head_dim", None) or config.hidden_size // heads
+            element_size = torch.tensor([], dtype=self.hf_model.dtype).element_size()
+            return 2 * config.num_hidden_layers * kv_heads * head_dim * element_size
+        except (AttributeError, TypeError):
+            return 0
+
+    @contextmanager
+    def _reserve_kv(self, batch_size: int, input_tokens: int, max_new_tokens: int) -> Iterator[None]:
+        tokens = batch_size * (input_tokens + max_new_tokens)
+        with self._kv_lock:
+            self._kv_tokens += tokens
+        try:
+            yield
+        finally:
+            with self._kv_lock:
+                self._kv_tokens -= tokens
+
+    def memory_footprint(self) -> Dict[str, int]:
+        # Limite superior: cada sequência pode gerar até max_new_tokens
+        return {"kv_cache": self._kv_tokens * self.kv_bytes_per_token}
+
+    def load_adapter(self, name: str, path: str):
+        self.adapters.load(name, path)
+
+    def unload_adapter(self, name: str):
+        self.adapters.unload(name)
+
+    def list_adapters(self) -> Dict[str, str]:
+        return dict(self.adapters.paths)
+
+    def _generation_kwargs(
+        self,
+        max_new_tokens: Optional[int],
+        generation: Optional[GenerationConfig],
+        *criteria: StoppingCriteria
+    ) -> dict:
+        kwargs = self._sampling_kwargs(max_new_tokens, self._generation(generation))
+        if criteria:
+            kwargs["stopping_criteria"] = StoppingCriteriaList(criteria)
+        return kwargs
+
+    def _sampling_kwargs(self, max_new_tokens: Optional[int], generation: GenerationConfig) -> dict:
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        if generation.greedy:
+            sampling = {"do_sample": False}
+        else:
+            sampling = {"do_sample": True, "temperature": generation.temperature}
+            if generation.top_p is not None:
+                sampling["top_p"] = generation.top_p
+            if generation.top_k is not None:
+                sampling["top_k"] = generation.top_k
+        if generation.repetition_penalty is not None:
+            sampling["repetition_penalty"] = generation.repetition_penalty
+
+        if not self.optimized:
+            return {
+                "max_new_tokens": max_new_tokens,
+                **sampling,
+                "pad_token_id": self.tokenizer.pad_token_id,
+            }
+
+        # Parâmetros de geração otimizados
+        return {
+            "max_new_tokens": min(max_new_tokens, 256),  # Limitar para performance
+            **sampling,
+            "pad_token_id": self.tokenizer.pad_token_id,
+            "eos_token_id": self.tokenizer.eos_token_id,
+            "use_cache": True
+        }
+
+    @staticmethod
+    def _seed(generation: GenerationConfig):
+        # Chamado com a trava do modelo: nenhuma outra geração consome o gerador entre a semente e o generate
+        if generation.seed is not None and not generation.greedy:
+            torch.manual_seed(generation.seed)
+
+    def prepare_for_fork(self):
+        if self.device != "cpu":
+            # CUDA/MPS não sobrevivem a fork() depois de inicializados
+            raise RuntimeError(
+                f"Pré-carregamento com fork só é suportado em CPU (device atual: {self.device}); "
+                "use WORKERS=1 ou um backend remoto"
+            )
+        # Inclui as camadas LoRA dos adaptadores já carregados. Os pesos não
+        # vão para memória compartilhada (share_memory copiaria tudo para
+        # /dev/shm, 64MB por padrão no Docker): só leitura nos workers, as
+        # páginas herdadas pelo fork continuam compartilhadas por copy-on-write
+        self.adapters.model.eval()
+
+    def after_fork(self, worker_index: int, workers: int):
+        # Dividir os núcleos entre os workers para evitar oversubscription,
+        # salvo quando CPU_INTRA_OP_THREADS define o número por processo
+        torch.set_num_threads(self.cpu_profile.intra_op_threads or max(1, (os.cpu_count() or 1) // workers))
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False).input_ids)
+
+    def _tokenize(self, prompts):
+        if self.optimized:
+            # Limitar tamanho do contexto
+            return self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=2048)
+        return self.tokenizer(prompts, return_tensors="pt", padding=True)
+
+    def _release_memory(self):
+        # Em CPU, o governador de memória (services/memory_governor.py) reduz caches e devolve o heap
+        if self.optimized and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        inputs = self._tokenize([prompt]).to(self.hf_model.device)
+        return self._generate_from_inputs(inputs, max_new_tokens, control, adapter, generation)[0]
+
+    def generate_prompt(
+        self,
+        prompt: AssembledPrompt,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        # Tokens dos trechos estáticos (system prompt, templates) vêm do cache do registro
+        ids = prompt.token_ids(self.tokenizer)
+        if self.optimized:
+            ids = ids[-2048:]  # Limitar tamanho do contexto
+
+        input_ids = torch.tensor([ids], device=self.hf_model.device)
+        return self._generate_from_inputs(
+            {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)},
+            max_new_tokens,
+            control,
+            adapter,
+            generation
+        )[0]
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        max_new_tokens: Optional[int] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> List[str]:
+        inputs = self._tokenize(prompts).to(self.hf_model.device)
+        return self._generate_from_inputs(inputs, max_new_tokens, generation=generation)
+
+    def _generate_from_inputs(
+        self,
+        inputs,
+        max_new_tokens: Optional[int],
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> List[str]:
+        generation = self._generation(generation)
+        response_filters = ResponseFilterCriteria(self.tokenizer, inputs["input_ids"].shape[0])
+        criteria = [response_filters] if control is None else [ControlStoppingCriteria(control), response_filters]
+        kwargs = self._generation_kwargs(max_new_tokens, generation, *criteria)
+        with self.adapters.use(adapter) as model, torch.inference_mode():
+            with self._reserve_kv(*inputs["input_ids"].shape, kwargs["max_new_tokens"]):
+                self._seed(generation)
+                model.generate(**inputs, **kwargs)
+
+        # Texto já decodificado token a token (apenas os tokens novos) e filtrado durante a geração
+        responses = response_filters.responses()
+
+        self._release_memory()
+        return responses
+
+    def stream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> Iterator[str]:
+        generation = self._generation(generation)
+        inputs = self._tokenize([prompt]).to(self.hf_model.device)
+        streamer = FilteredStreamer(self.tokenizer)
+        # Controle próprio do stream: se o consumidor abandonar o stream, a
+        # decodificação para sem marcar a requisição (`control`) como cancelada
+        abandoned = GenerationControl()
+        criteria = [ControlStoppingCriteria(abandoned), FilterStoppingCriteria(streamer.response_filter)]
+        if control is not None:
+            criteria.append(ControlStoppingCriteria(control))
+
+        kwargs = self._generation_kwargs(max_new_tokens, generation, *criteria)
+        with self.adapters.use(adapter) as model:
+            def run():
+                try:
+                    with torch.inference_mode(), self._reserve_kv(*inputs["input_ids"].shape, kwargs["max_new_tokens"]):
+                        self._seed(generation)
+                        model.generate(**inputs, streamer=streamer, **kwargs)
+                except Exception as e:
+                    # Repassado ao consumidor pelo iterador do streamer
+                    streamer.error = e
+                    streamer.queue.put(None)
+
+            thread = Thread(target=run, daemon=True)
+            thread.start()
+            try:
+                yield from streamer
+            finally:
+                abandoned.cancel()
+                thread.join()
+                self._release_memory()
@@ -0,0 +1,70 @@
+"""
+Backend determinístico para testes e desenvolvimento sem modelo
+"""
+
+import hashlib
+from typing import Dict, Iterator, Optional
+
+from .base import BackendCapabilities, GenerationControl, InferenceBackend
+from .generation import GenerationConfig
+
+
+class MockBackend(InferenceBackend):
+    """
+    Não carrega modelo: a resposta é derivada do hash do prompt, portanto o
+    mesmo prompt sempre gera a mesma resposta (os parâmetros de geração são ignorados).
+    """
+
+    name = "mock"
+    capabilities = BackendCapabilities(streaming=True, batching=True, prefix_cache=False, adapters=True)
+
+    def __init__(self, model_name: str, max_new_tokens: int, generation: Optional[GenerationConfig] = None):
+        super().__init__(model_name, max_new_tokens, generation)
+        # Adaptadores apenas registrados: a resposta indica qual foi usado
+        self.adapters: Dict[str, str] = {}
+
+    def load_adapter(self, name: str, path: str):
+        self.adapters[name] = path
+
+    def unload_adapter(self, name: str):
+        self._check_adapter(name)
+        del self.adapters[name]
+
+    def list_adapters(self) -> Dict[str, str]:
+        return dict(self.adapters)
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        words = []
+        for word in self._words(prompt, max_new_tokens, adapter):
+            # Cada palavra conta como um token para fins de prazo/cancelamento
+            if control is not None and control.should_stop():
+                break
+            words.append(word)
+        return " ".join(words)
+
+    def stream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> Iterator[str]:
+        for index, word in enumerate(self._words(prompt, max_new_tokens, adapter)):
+            if control is not None and control.should_stop():
+                return
+            yield word if index == 0 else f" {word}"
+
+    def _words(self, prompt: str, max_new_tokens: Optional[int], adapter: Optional[str] = None):
+        self._check_adapter(adapter)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        label = f"Nino/{adapter}" if adapter else "Nino"
+        words = f"Resposta simulada do {label} ({digest}) para um prompt de {len(prompt)} caracteres.".split()
+        return words[:max_new_tokens or self.max_new_tokens]
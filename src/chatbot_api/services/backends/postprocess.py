@@ -0,0 +1,197 @@
+"""
+Pós-processamento incremental da saída do modelo
+
+IncrementalDetokenizer decodifica apenas os tokens novos (uma janela curta
+de tokens por passo), em vez de decodificar a sequência inteira a cada token.
+
+ResponseFilter recebe o texto em pedaços durante a geração e para a resposta
+quando o modelo começa a escrever o próximo turno da conversa ("Usuário:",
+"Assistente:") ou entra em loop de repetição. Parar cedo economiza os
+tokens que seriam gerados (e depois descartados).
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+# Rótulos de turno usados no prompt (ver ChatbotService._build_conversation_context)
+USER_LABELS = ("Usuário", "Usuario", "User")
+ASSISTANT_LABELS = ("Assistente", "Nino")
+
+# Rótulo no início de uma linha, depois de algum conteúdo: o modelo está escrevendo outro turno
+TURN_PATTERN = re.compile(
+    r"\n[ \t]*(?:" + "|".join(USER_LABELS + ASSISTANT_LABELS) + r")[ \t]*:"
+)
+# Rótulo do assistente repetido no início da resposta
+LEADING_LABEL_PATTERN = re.compile(r"^\s*(?:" + "|".join(ASSISTANT_LABELS) + r")[ \t]*:[ \t]*")
+MARKERS = tuple(f"{label}:" for label in USER_LABELS + ASSISTANT_LABELS)
+
+
+class IncrementalDetokenizer:
+    """
+    Decodifica tokens à medida que chegam. Cada passo decodifica só a janela
+    entre o último trecho emitido e o token novo, mantendo o espaçamento
+    correto de tokenizers como o SentencePiece; bytes UTF-8 incompletos
+    ficam retidos até o token seguinte.
+    """
+
+    def __init__(self, tokenizer, skip_special_tokens: bool = True):
+        self.tokenizer = tokenizer
+        self.skip_special_tokens = skip_special_tokens
+        self.special_ids = set(tokenizer.all_special_ids) if skip_special_tokens else set()
+        self.ids: List[int] = []
+        self.prefix_offset = 0
+        self.read_offset = 0
+
+    def _decode(self, ids: List[int]) -> str:
+        return self.tokenizer.decode(ids, skip_special_tokens=self.skip_special_tokens)
+
+    def push(self, token_ids: Iterable[int]) -> str:
+        """Texto novo produzido pelos tokens recebidos"""
+        self.ids.extend(token for token in token_ids if token not in self.special_ids)
+        if len(self.ids) == self.read_offset:
+            return ""
+
+        prefix_text = self._decode(self.ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.ids[self.prefix_offset:])
+        if len(new_text) > len(prefix_text) and not new_text.endswith("�"):
+            self.prefix_offset = self.read_offset
+            self.read_offset = len(self.ids)
+            return new_text[len(prefix_text):]
+        return ""
+
+    def flush(self) -> str:
+        """Texto ainda retido (ex.: caractere incompleto no fim da geração)"""
+        prefix_text = self._decode(self.ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.ids[self.prefix_offset:])
+        self.prefix_offset = self.read_offset = len(self.ids)
+        return new_text[len(prefix_text):]
+
+
+class ResponseFilter:
+    """
+    Filtra a resposta em streaming. `feed` devolve o texto que já pode ser
+    emitido, segurando apenas o fim que pode ser o começo de um rótulo de
+    turno dividido entre pedaços; `finish` devolve o restante.
+
+    Depois que `stopped` fica verdadeiro, a geração deve ser interrompida:
+    o texto a partir do eco do turno, ou as repetições do loop, já foi descartado.
+    """
+
+    def __init__(self, min_period: int = 12, max_period: int = 200, repeats: int = 3):
+        # Loop: um mesmo trecho de min_period a max_period caracteres, com ao menos
+        # dois caracteres visíveis distintos, repetido `repeats` vezes seguidas
+        self.min_period = min_period
+        self.max_period = max_period
+        self.repeats = repeats
+        self.text = ""
+        self.emitted = 0
+        self.stopped = False
+        self.reason: Optional[str] = None
+        self._label_checked = False
+
+    def feed(self, piece: str) -> str:
+        if self.stopped or not piece:
+            return ""
+        start = len(self.text)
+        self.text += piece
+
+        if not self._label_checked:
+            # Remover "Assistente:" no começo, assim que houver texto suficiente para decidir
+            stripped = self.text.lstrip()
+            if any(marker.startswith(stripped) for marker in MARKERS) and len(stripped) < max(map(len, MARKERS)):
+                return ""
+            self.text = LEADING_LABEL_PATTERN.sub("", self.text, count=1)
+            self._label_checked = True
+            start = 0
+
+        cut = self._find_turn(start)
+        if cut is not None:
+            self._stop(cut, "echo")
+        else:
+            cut = self._find_loop()
+            if cut is not None:
+                self._stop(cut, "repetition")
+
+        if self.stopped:
+            return self.finish()
+        return self._emit(len(self.text) - self._held_back())
+
+    def finish(self) -> str:
+        """Emite o que restou (sem espaços no fim)"""
+        return self._emit(len(self.text.rstrip()))
+
+    @property
+    def output(self) -> str:
+        """Resposta completa filtrada"""
+        return self.text.strip()
+
+    def _emit(self, end: int) -> str:
+        if end <= self.emitted:
+            return ""
+        chunk = self.text[self.emitted:end]
+        self.emitted = end
+        return chunk
+
+    def _stop(self, cut: int, reason: str):
+        # Nunca "desemitir": o corte não recua para antes do que já saiu
+        self.text = self.text[:max(cut, self.emitted)]
+        self.stopped = True
+        self.reason = reason
+
+    def _find_turn(self, start: int) -> Optional[int]:
+        # O rótulo pode ter começado no pedaço anterior
+        window = max(0, start - max(map(len, MARKERS)) - 4)
+        match = TURN_PATTERN.search(self.text, window)
+        if match is None or not self.text[:match.start()].strip():
+            return None
+        return match.start()
+
+    def _find_loop(self) -> Optional[int]:
+        text = self.text
+        length = len(text)
+        last = text[-1]
+        for period in range(self.min_period, min(self.max_period, length // self.repeats) + 1):
+            # Comparação barata de um caractere antes de comparar os blocos
+            if text[-1 - period] != last:
+                continue
+            block = text[length - period:]
+            # Um único caractere repetido (pontilhado de sumário, "====") é formatação, não loop
+            if len(set("".join(block.split()))) < 2:
+                continue
+            if all(text[length - (k + 1) * period:length - k * period] == block for k in range(1, self.repeats)):
+                # Mantém a primeira ocorrência
+                return length - (self.repeats - 1) * period
+        return None
+
+    def _held_back(self) -> int:
+        """Caracteres do fim que podem ser o início de um rótulo de turno"""
+        newline = self.text.rfind("\n", max(0, len(self.text) - max(map(len, MARKERS)) - 4))
+        if newline < 0:
+            return 0
+        tail = self.text[newline + 1:].lstrip(" \t")
+        if any(marker.startswith(tail) for marker in MARKERS):
+            return len(self.text) - newline
+        return 0
+
+
+def filter_stream(pieces: Iterator[str], response_filter: Optional[ResponseFilter] = None) -> Iterator[str]:
+    """
+    Aplica o ResponseFilter a um stream de texto. Quando o filtro para, o
+    stream de origem é fechado, o que interrompe a geração no backend.
+    """
+    response_filter = response_filter or ResponseFilter()
+    try:
+        for piece in pieces:
+            text = response_filter.feed(piece)
+            if text:
+                yield text
+            if response_filter.stopped:
+                return
+        text = response_filter.finish()
+        if text:
+            yield text
+    finally:
+        close = getattr(pieces, "close", None)
+        if close is not None:
+            close()
+
@@ -0,0 +1,160 @@
+"""
+Backend que delega a geração aos workers de inferência via fila de jobs
+"""
+
+import time
+from typing import Iterator, List, Optional
+
+from ..queue import JobQueue
+from .base import AdapterError, BackendCapabilities, GenerationControl, InferenceBackend
+from .generation import GenerationConfig
+
+
+class QueueBackendError(RuntimeError):
+    """O worker falhou ao gerar, ou nenhum worker respondeu a tempo"""
+
+
+class QueueBackend(InferenceBackend):
+    """
+    Publica cada geração como um job e aguarda os eventos publicados pelo
+    worker que a executou. A API não carrega modelo; os workers escalam à parte.
+
+    O prazo de `control` segue no job e o cancelamento é repassado ao worker.
+    Adaptadores LoRA são carregados nos workers (LORA_ADAPTERS); o nome pedido
+    é validado por eles.
+    """
+
+    name = "queue"
+    capabilities = BackendCapabilities(streaming=True, batching=True)
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        model_name: str,
+        max_new_tokens: int,
+        timeout: float = 300.0,
+        poll_seconds: float = 0.5,
+        generation: Optional[GenerationConfig] = None,
+    ):
+        super().__init__(model_name, max_new_tokens, generation)
+        self.queue = queue
+        self.timeout = timeout
+        self.poll_seconds = poll_seconds
+
+    def _submit(self, payload: dict, control: Optional[GenerationControl]) -> Optional[str]:
+        """Publica o job; None (sem publicar) quando o prazo já expirou ou a requisição foi cancelada"""
+        if control is not None and control.should_stop():
+            return None
+        remaining = control.remaining() if control is not None else None
+        return self.queue.submit({**payload, "timeout_seconds": remaining})
+
+    def _events(self, job_id: str, control: Optional[GenerationControl]) -> Iterator[dict]:
+        """Eventos do job até o terminal; para (e cancela o job) quando `control` manda parar"""
+        deadline = time.monotonic() + self.timeout
+        cursor = "0"
+        try:
+            while True:
+                if control is not None and control.should_stop():
+                    self.queue.cancel(job_id)
+                    return
+                if time.monotonic() >= deadline:
+                    self.queue.cancel(job_id)
+                    raise QueueBackendError(f"Nenhum worker de inferência concluiu o job em {self.timeout:.0f}s")
+
+                events, cursor = self.queue.read_events(job_id, cursor, self.poll_seconds)
+                for event in events:
+                    if event["type"] == "error":
+                        self._raise(event)
+                    yield event
+                    if event["type"] == "done":
+                        return
+        except GeneratorExit:
+            # Consumidor abandonou o stream (ex.: filtro de resposta): o worker também para
+            self.queue.cancel(job_id)
+            raise
+        finally:
+            self.queue.forget(job_id)
+
+    @staticmethod
+    def _raise(event: dict):
+        if event.get("kind") == "adapter":
+            raise AdapterError(event["message"])
+        raise QueueBackendError(f"Erro no worker de inferência: {event['message']}")
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        job_id = self._submit({
+            "kind": "generate",
+            "prompt": prompt,
+            "max_new_tokens": max_new_tokens,
+            "adapter": adapter,
+            "generation": self._generation(generation).to_dict(),
+        }, control)
+        if job_id is None:
+            return ""
+
+        parts: List[str] = []
+        for event in self._events(job_id, control):
+            if event["type"] == "token":
+                parts.append(event["text"])
+            elif event["type"] == "restart":
+                parts = []
+            elif event["type"] == "done":
+                if event.get("truncated") and control is not None:
+                    control.truncated = True
+                return event["text"]
+        # Interrompido pelo prazo ou cancelamento: resposta parcial
+        return "".join(parts).strip()
+
+    def stream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> Iterator[str]:
+        job_id = self._submit({
+            "kind": "generate",
+            "prompt": prompt,
+            "max_new_tokens": max_new_tokens,
+            "adapter": adapter,
+            "generation": self._generation(generation).to_dict(),
+        }, control)
+        if job_id is None:
+            return
+
+        streamed = False
+        for event in self._events(job_id, control):
+            if event["type"] == "token":
+                streamed = True
+                yield event["text"]
+            elif event["type"] == "restart" and streamed:
+                # Trechos já entregues não podem ser desfeitos
+                raise QueueBackendError("O worker de inferência caiu durante o streaming")
+            elif event["type"] == "done" and event.get("truncated") and control is not None:
+                control.truncated = True
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        max_new_tokens: Optional[int] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> List[str]:
+        # Um único job: o worker gera o lote de uma vez
+        job_id = self._submit({
+            "kind": "batch",
+            "prompts": prompts,
+            "max_new_tokens": max_new_tokens,
+            "generation": self._generation(generation).to_dict(),
+        }, None)
+        for event in self._events(job_id, None):
+            if event["type"] == "done":
+                return event["texts"]
+        raise QueueBackendError("Job de lote encerrado sem resultado")
@@ -0,0 +1,172 @@
+"""
+Backend de inferência remoto, compatível com a API de completions da OpenAI
+(llama.cpp server, vLLM, TGI, etc.)
+"""
+
+import json
+import urllib.request
+from typing import Dict, Iterator, List, Optional
+
+from .base import AdapterError, BackendCapabilities, GenerationControl, InferenceBackend
+from .generation import GenerationConfig
+
+
+class RemoteBackendError(RuntimeError):
+    """Falha ao se comunicar com o servidor de inferência"""
+
+
+class RemoteBackend(InferenceBackend):
+    """
+    Envia os prompts para um servidor de inferência dedicado via HTTP.
+
+    Usa POST {base_url}/v1/completions; lotes são enviados como lista de
+    prompts e o streaming usa server-sent events ("data: {...}").
+
+    Adaptadores LoRA seguem a convenção do vLLM: são carregados com
+    /v1/load_lora_adapter e selecionados pelo campo "model".
+    """
+
+    name = "remote"
+    # O cache de prefixo é responsabilidade do servidor (ex.: cache_prompt no llama.cpp)
+    capabilities = BackendCapabilities(streaming=True, batching=True, prefix_cache=True, adapters=True)
+
+    def __init__(
+        self,
+        base_url: str,
+        model_name: str,
+        max_new_tokens: int,
+        api_key: Optional[str] = None,
+        timeout: float = 300.0,
+        generation: Optional[GenerationConfig] = None,
+    ):
+        super().__init__(model_name, max_new_tokens, generation)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.adapters: Dict[str, str] = {}
+
+    def _request(self, payload: dict, timeout: Optional[float] = None, path: str = "/v1/completions"):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers=headers,
+            method="POST",
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+        except OSError as e:
+            raise RemoteBackendError(f"Erro ao chamar servidor de inferência: {e}") from e
+
+    def load_adapter(self, name: str, path: str):
+        try:
+            with self._request({"lora_name": name, "lora_path": path}, path="/v1/load_lora_adapter"):
+                pass
+        except RemoteBackendError as e:
+            raise AdapterError(f"Servidor recusou o adaptador '{name}': {e}") from e
+        self.adapters[name] = path
+
+    def unload_adapter(self, name: str):
+        self._check_adapter(name)
+        with self._request({"lora_name": name}, path="/v1/unload_lora_adapter"):
+            pass
+        del self.adapters[name]
+
+    def list_adapters(self) -> Dict[str, str]:
+        return dict(self.adapters)
+
+    def _payload(
+        self,
+        prompt,
+        max_new_tokens: Optional[int],
+        stream: bool = False,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> dict:
+        self._check_adapter(adapter)
+        generation = self._generation(generation)
+        payload = {
+            "model": adapter or self.model_name,
+            "prompt": prompt,
+            "max_tokens": max_new_tokens or self.max_new_tokens,
+            "temperature": max(generation.temperature, 0.0),
+            "stream": stream,
+            "cache_prompt": True,
+        }
+        # top_k, repetition_penalty e seed: extensões aceitas por vLLM e llama.cpp server
+        for name in ("top_p", "top_k", "repetition_penalty", "seed"):
+            value = getattr(generation, name)
+            if value is not None:
+                payload[name] = value
+        return payload
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> str:
+        if control is not None:
+            # Via streaming: fechar a conexão interrompe a geração no servidor
+            return self._collect_stream(prompt, max_new_tokens, control, adapter, generation)
+        return self._complete([prompt], max_new_tokens, adapter, generation)[0]
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        max_new_tokens: Optional[int] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> List[str]:
+        return self._complete(prompts, max_new_tokens, generation=generation)
+
+    def _complete(
+        self,
+        prompts: List[str],
+        max_new_tokens: Optional[int],
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> List[str]:
+        with self._request(self._payload(prompts, max_new_tokens, adapter=adapter, generation=generation)) as response:
+            body = json.loads(response.read().decode("utf-8"))
+
+        choices = sorted(body.get("choices", []), key=lambda choice: choice.get("index", 0))
+        if len(choices) != len(prompts):
+            raise RemoteBackendError(
+                f"Servidor retornou {len(choices)} respostas para {len(prompts)} prompts"
+            )
+        return [choice.get("text", "").strip() for choice in choices]
+
+    def stream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[GenerationConfig] = None
+    ) -> Iterator[str]:
+        # O timeout do socket acompanha o prazo restante da requisição
+        timeout = max(control.remaining(), 0.1) if control is not None and control.deadline is not None else None
+        with self._request(self._payload(prompt, max_new_tokens, stream=True, adapter=adapter, generation=generation), timeout=timeout) as response:
+            while True:
+                try:
+                    raw_line = response.readline()
+                except TimeoutError:
+                    if control is not None and control.should_stop():
+                        return
+                    raise RemoteBackendError("Tempo esgotado aguardando o servidor de inferência")
+                if not raw_line:
+                    break
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices", [])
+                if choices and choices[0].get("text"):
+                    yield choices[0]["text"]
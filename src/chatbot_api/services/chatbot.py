@@ -1,81 +1,99 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Tuple, AsyncIterator, Mapping
+from collections import OrderedDict
 import asyncio
+import hashlib
 import json
+import logging
 import uuid
 from sqlalchemy.orm import selectinload
 from sqlalchemy import select, desc
 
 from ..core.config import settings
-from ..prompts.legal_prompts import SYSTEM_PROMPT, get_prompt_by_type
+from ..prompts.legal_prompts import DOCUMENT_CHUNK_SUMMARY_PROMPT, PROMPT_REGISTRY
+from ..prompts.registry import AssembledPrompt, PromptSegment
 from ..database.database import AsyncSessionLocal
 from ..models.database import ConversationHistory
+from .document_service import DocumentService
+from .document_structure import DocumentStructure
+from .backends import GenerationConfig, GenerationControl, InferenceBackend, create_backend, filter_stream
+from .memory_service import ConversationMemory
+from .memory_governor import MemoryGovernor, get_memory_governor
+from .coalescing import InFlightRequests
 
+logger = logging.getLogger(__name__)
 
-class JuremaLLM:
-    def __init__(self):
-        self.hf_model = None
-        self.tokenizer = None
-        self.model_name = settings.model_name
-        self.max_new_tokens = settings.max_new_tokens
-        self._load_model()
+REDUCED_DOCUMENT_HEADER = "(Resumo por páginas do documento completo)\n\n"
+# Níveis de agrupamento de resumos além do primeiro (cada nível reduz o texto várias vezes)
+MAX_REDUCE_LEVELS = 4
 
-    def _load_model(self):
-        # Set up authentication if token is provided
-        token = settings.huggingface_hub_token
 
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self.model_name,
-            token=token
-        )
-
-        # Determine the best device for macOS
-        if torch.backends.mps.is_available():
-            device = "mps"
-            torch_dtype = torch.float16  # MPS works better with float16
-        elif torch.cuda.is_available():
-            device = "cuda"
-            torch_dtype = torch.bfloat16
-        else:
-            device = "cpu"
-            torch_dtype = torch.float32
-
-        self.hf_model = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            torch_dtype=torch_dtype,
-            token=token,
-            low_cpu_mem_usage=True
-        ).to(device)
-
-    def generate(self, prompt: str) -> str:
-        input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids.to(self.hf_model.device)
-
-        with torch.no_grad():
-            output = self.hf_model.generate(
-                input_ids,
-                max_new_tokens=self.max_new_tokens,
-                do_sample=True,
-                temperature=0.7,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
-
-        response = self.tokenizer.decode(output[0], skip_special_tokens=True)
-        return response[len(prompt):].strip()
+class ChatbotService:
+    # Conversas buscadas no banco e mensagens usadas como contexto
+    history_limit = 10
+    context_messages = 6
+    # Limites opcionais de tamanho (None = sem corte)
+    context_message_chars: Optional[int] = None
+    max_prompt_chars: Optional[int] = None
+    assistant_label = "Assistente"
 
+    def __init__(self, backend: Optional[InferenceBackend] = None, governor: Optional[MemoryGovernor] = None):
+        # Criado no primeiro uso (ver _get_llm): /health e /history não pagam
+        # a importação de torch/transformers nem o carregamento do modelo
+        self.llm: Optional[InferenceBackend] = backend
+        self._backend_lock = asyncio.Lock()
+        # Resumos parciais de documentos longos, indexados pelo hash do trecho
+        self._chunk_summaries: "OrderedDict[str, str]" = OrderedDict()
+        # Resumo contínuo das trocas antigas, usado no lugar delas no prompt
+        self.memory = ConversationMemory(
+            recent_turns=settings.memory_recent_turns,
+            summary_max_tokens=settings.memory_summary_max_tokens,
+            message_chars=settings.memory_message_chars,
+            fold_turns=settings.memory_fold_turns
+        ) if settings.memory_enabled else None
+        # Trocas do histórico escolhidas por relevância para a mensagem atual
+        # (numpy e o encoder só são importados quando o serviço é criado)
+        self.history_index = None
+        if settings.history_selection == "relevance":
+            from .embeddings import create_embedding_service
+            from .history_index import HistoryIndex
 
-class ChatbotService:
-    def __init__(self):
-        self.llm = JuremaLLM()
+            self.history_index = HistoryIndex(
+                create_embedding_service(),
+                recency_weight=settings.history_recency_weight,
+                recency_decay=settings.history_recency_decay,
+                max_turns=settings.history_index_max_turns,
+                max_sessions=settings.history_index_sessions,
+                message_chars=self.context_message_chars
+            )
+        # Gerações idênticas (mesma sessão, tipo e mensagem) em andamento são compartilhadas
+        self._inflight = InFlightRequests()
+        # Adaptador LoRA usado por padrão em cada tipo de consulta (alterável via /admin/adapters)
+        self.consultation_adapters = dict(settings.consultation_adapters)
+        # Parâmetros de geração de cada tipo de consulta, sobre os padrões do backend
+        self.consultation_generation = {
+            name: dict(values) for name, values in settings.consultation_generation.items()
+        }
+        # Respostas de gerações determinísticas, por (modelo, adaptador, parâmetros, prompt)
+        self._responses: "OrderedDict[str, str]" = OrderedDict()
+        # Sob pressão de memória, os caches encolhem e as gerações ficam menores
+        self.governor = governor or get_memory_governor()
+        self.governor.register_lru("document_summaries", self._chunk_summaries)
+        self.governor.register_lru("responses", self._responses)
+        self.governor.register("kv_cache", lambda: self.llm.memory_footprint().get("kv_cache", 0) if self.llm else 0)
+        if self.history_index is not None:
+            self.governor.register("history_index", lambda: self.history_index.nbytes, self.history_index.shrink)
+            # Matriz pré-alocada: observada, não reduzida
+            self.governor.register("embedding_vectors", lambda: self.history_index.embeddings.cache.nbytes)
 
-    async def _get_conversation_history(self, session_id: str) -> List[dict]:
-        """Get conversation history from PostgreSQL"""
+    async def _get_conversation_history(self, session_id: str, after_id: int = 0) -> List[dict]:
+        """Get conversation history from PostgreSQL (only entries newer than after_id)"""
         try:
             async with AsyncSessionLocal() as db_session:
-                # Get last 10 conversations for this session
+                # Get last conversations for this session
                 query = select(ConversationHistory).where(
-                    ConversationHistory.session_id == session_id
-                ).order_by(desc(ConversationHistory.timestamp)).limit(10)
+                    ConversationHistory.session_id == session_id,
+                    ConversationHistory.id > after_id
+                ).order_by(desc(ConversationHistory.timestamp)).limit(self.history_limit)
 
                 result = await db_session.execute(query)
                 conversations = result.scalars().all()
@@ -96,8 +114,8 @@ class ChatbotService:
 
                 return history[-20:]  # Keep last 20 messages to limit context
 
-        except Exception as e:
-            print(f"Error retrieving conversation history: {e}")
+        except Exception:
+            logger.exception("Error retrieving conversation history", extra={"session_id": session_id})
             return []
 
     async def _save_conversation_to_db(self, session_id: str, user_message: str, bot_response: str):
@@ -113,56 +131,424 @@ class ChatbotService:
                 db_session.add(conversation)
                 await db_session.commit()
 
-        except Exception as e:
-            print(f"❌ Error saving conversation to database: {e}")
-
-    async def generate_response(self, message: str, session_id: Optional[str] = None, consultation_type: str = "consultation") -> str:
-        if not session_id:
-            session_id = str(uuid.uuid4())
+        except Exception:
+            logger.exception("Error saving conversation to database", extra={"session_id": session_id})
 
-        # Get conversation history
-        history = await self._get_conversation_history(session_id)
+    def load_backend(self) -> InferenceBackend:
+        """Cria o backend imediatamente (ex.: pré-carregamento antes do fork dos workers)"""
+        if self.llm is None:
+            self.llm = create_backend()
+        return self.llm
 
-        # Build system prompt and context
-        system_context = SYSTEM_PROMPT
+    async def _get_llm(self) -> InferenceBackend:
+        """Carrega o backend apenas quando necessário (lazy loading)"""
+        if self.llm is None:
+            async with self._backend_lock:
+                if self.llm is None:
+                    logger.info("Initializing inference backend")
+                    # Carregar em thread separada para não bloquear o event loop
+                    await asyncio.to_thread(self.load_backend)
+                    logger.info("Model ready", extra={"backend": self.llm.name})
+        return self.llm
 
-        # Build conversation context from history
+    def _build_conversation_context(self, history: List[dict], summary: str = "") -> str:
         conversation_context = ""
-        for entry in history[-6:]:  # Keep last 6 messages (3 exchanges) for context
+        if summary:
+            conversation_context += f"RESUMO DA CONVERSA ATÉ AQUI:\n{summary}\n\n"
+
+        for entry in history:
+            content = entry['content']
+            if self.context_message_chars and len(content) > self.context_message_chars:
+                content = content[:self.context_message_chars] + "..."
+
             if entry['role'] == 'user':
-                conversation_context += f"Usuário: {entry['content']}\n"
+                conversation_context += f"Usuário: {content}\n"
             elif entry['role'] == 'assistant':
-                conversation_context += f"Assistente: {entry['content']}\n\n"
-
-        # Get the appropriate prompt based on consultation type
-        if consultation_type != "consultation":
-            # For specific consultation types, use structured prompts
-            if consultation_type == "case_analysis":
-                structured_prompt = get_prompt_by_type("case_analysis", case_description=message)
-            elif consultation_type == "legal_research":
-                structured_prompt = get_prompt_by_type("legal_research", research_topic=message)
-            elif consultation_type == "document_draft":
-                structured_prompt = get_prompt_by_type("document_draft", document_type="documento legal", document_info=message)
-            elif consultation_type == "legislation_search":
-                structured_prompt = get_prompt_by_type("legislation_search", legislation_query=message)
-            else:
-                structured_prompt = get_prompt_by_type("consultation", query=message)
-
-            full_prompt = f"{system_context}\n\n{conversation_context}{structured_prompt}"
-        else:
-            # For general consultation, use conversation format
-            consultation_prompt = get_prompt_by_type("consultation", query=message)
-            full_prompt = f"{system_context}\n\n{conversation_context}{consultation_prompt}"
-
-        # Generate response using LLM in thread pool
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            self.llm.generate,
-            full_prompt
+                conversation_context += f"{self.assistant_label}: {content}\n\n"
+        return conversation_context
+
+    def _build_prompt(self, message: str, history: List[dict], consultation_type: str, summary: str = "") -> AssembledPrompt:
+        # System prompt + conversation context + template for the consultation type
+        conversation_context = self._build_conversation_context(history, summary)
+        prompt = PROMPT_REGISTRY.build(consultation_type, message, conversation_context)
+
+        # Limitar tamanho total do prompt
+        if self.max_prompt_chars:
+            full_prompt = prompt.text
+            if len(full_prompt) > self.max_prompt_chars:
+                return AssembledPrompt([PromptSegment(full_prompt[-self.max_prompt_chars:])])
+
+        return prompt
+
+    async def generate_response(
+        self,
+        message: str,
+        session_id: Optional[str] = None,
+        consultation_type: str = "consultation",
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[Mapping[str, Any]] = None
+    ) -> str:
+        """
+        Gera a resposta respeitando o prazo de `control`. Se o prazo expirar, a
+        resposta parcial é devolvida e `control.truncated` fica verdadeiro.
+
+        `adapter` escolhe o adaptador LoRA; sem ele, vale o configurado para o tipo de consulta.
+        `generation` ajusta os parâmetros de geração desta requisição (ValueError se inválidos).
+        """
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        adapter = self.resolve_adapter(consultation_type, adapter)
+        config = self.resolve_generation(await self._get_llm(), consultation_type, generation)
+
+        # A geração compartilhada tem seu próprio controle: ela só é cancelada
+        # quando todos os chamadores que a aguardam desistem
+        shared = GenerationControl(control.deadline if control is not None else None)
+
+        # Envio duplicado (ex.: clique duplo, rerun do Streamlit) reaproveita a geração em curso
+        response, truncated = await self._inflight.run(
+            (session_id, consultation_type, adapter, config.key(), message),
+            lambda: self._generate_response(message, session_id, consultation_type, shared, adapter, config),
+            on_abandoned=shared.cancel
+        )
+        if control is not None and truncated:
+            control.truncated = True
+        return response
+
+    async def _generate_response(
+        self,
+        message: str,
+        session_id: str,
+        consultation_type: str,
+        control: GenerationControl,
+        adapter: Optional[str] = None,
+        config: Optional[GenerationConfig] = None
+    ) -> Tuple[str, bool]:
+        llm = await self._get_llm()
+        config = config or llm.generation
+        full_prompt = await self._prepare_prompt(message, session_id, consultation_type)
+
+        # Geração determinística: o mesmo prompt com os mesmos parâmetros dá a mesma resposta
+        cache_key = None
+        if config.deterministic and settings.generation_cache_size > 0:
+            cache_key = self._response_key(llm, adapter, config, full_prompt.text)
+            cached = self._responses.get(cache_key)
+            if cached is not None:
+                self._responses.move_to_end(cache_key)
+                await self._finish_response(session_id, message, cached, llm)
+                return cached, False
+
+        # Sob pressão de memória, respostas mais curtas (cache KV menor); None = padrão do backend
+        max_new_tokens = self.governor.max_new_tokens(llm.max_new_tokens)
+
+        # Generate response using LLM in thread pool (interrompida por prazo ou cancelamento)
+        response = await asyncio.to_thread(
+            llm.generate_prompt,
+            full_prompt,
+            max_new_tokens,
+            control,
+            adapter,
+            config
         )
 
+        # Ninguém mais aguarda a resposta: não registrar a troca
+        if control.cancelled:
+            return response, True
+
+        # Respostas parciais (prazo expirado ou encurtadas pelo governador) não vão ao cache
+        if cache_key is not None and not control.truncated and max_new_tokens is None:
+            self._remember_response(cache_key, response)
+        await self._finish_response(session_id, message, response, llm)
+        return response, control.truncated
+
+    async def _prepare_prompt(self, message: str, session_id: str, consultation_type: str) -> AssembledPrompt:
+        # Get conversation summary and the raw turns it does not cover yet
+        summary, summarized_until = "", 0
+        if self.memory:
+            summary, summarized_until = await self.memory.get_summary(session_id)
+        history = await self._select_history(message, session_id, summarized_until)
+        return self._build_prompt(message, history, consultation_type, summary)
+
+    async def _select_history(self, message: str, session_id: str, summarized_until: int) -> List[dict]:
+        """
+        Trocas anteriores que vão ao prompt. Por relevância, qualquer troca da
+        sessão pode voltar (inclusive as já resumidas, com seus detalhes); sem
+        índice, ou se ele falhar, ficam as últimas trocas ainda não resumidas.
+        """
+        if self.history_index is not None:
+            try:
+                llm = await self._get_llm()
+                return await self.history_index.select(
+                    session_id, message, settings.history_token_budget, llm.count_tokens
+                )
+            except Exception:
+                logger.exception("Relevance history selection failed, using recent turns", extra={"session_id": session_id})
+
+        history = await self._get_conversation_history(session_id, after_id=summarized_until)
+        return history[-self.context_messages:]
+
+    async def _finish_response(self, session_id: str, message: str, response: str, llm):
         # Save conversation to database
         await self._save_conversation_to_db(session_id, message, response)
 
-        return response
\ No newline at end of file
+        # Atualizar o resumo da sessão em segundo plano
+        if self.memory:
+            self.memory.schedule_update(session_id, llm)
+
+    async def stream_response(
+        self,
+        message: str,
+        session_id: str,
+        consultation_type: str = "consultation",
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None,
+        generation: Optional[Mapping[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Gera a resposta em partes, à medida que o modelo produz os tokens.
+
+        A troca só é gravada se o stream for consumido até o fim; se o consumidor
+        desistir (cliente desconectado), a geração é cancelada e nada é salvo.
+        Duplicatas não são agrupadas como em `generate_response`: cada stream
+        tem seu próprio consumidor.
+        """
+        control = control or GenerationControl()
+        adapter = self.resolve_adapter(consultation_type, adapter)
+        llm = await self._get_llm()
+        config = self.resolve_generation(llm, consultation_type, generation)
+        full_prompt = await self._prepare_prompt(message, session_id, consultation_type)
+        max_new_tokens = self.governor.max_new_tokens(llm.max_new_tokens)
+
+        # O backend produz os tokens numa thread; a fila os entrega ao event loop
+        loop = asyncio.get_running_loop()
+        pieces: asyncio.Queue = asyncio.Queue()
+        finished = object()
+
+        def produce():
+            try:
+                # Eco de turno ou loop de repetição encerram o stream (e a geração)
+                for piece in filter_stream(llm.stream(full_prompt.text, max_new_tokens, control, adapter, config)):
+                    loop.call_soon_threadsafe(pieces.put_nowait, piece)
+                    if control.should_stop():
+                        break
+            except Exception as e:
+                loop.call_soon_threadsafe(pieces.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(pieces.put_nowait, finished)
+
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        parts: List[str] = []
+        completed = False
+        try:
+            while True:
+                piece = await pieces.get()
+                if piece is finished:
+                    break
+                if isinstance(piece, Exception):
+                    raise piece
+                parts.append(piece)
+                yield piece
+            completed = True
+        finally:
+            if not completed:
+                control.cancel()
+        await producer
+
+        if control.cancelled:
+            return
+        await self._finish_response(session_id, message, "".join(parts).strip(), llm)
+
+    def resolve_adapter(self, consultation_type: Optional[str], adapter: Optional[str] = None) -> Optional[str]:
+        """Adaptador pedido explicitamente ou o associado ao tipo de consulta"""
+        return adapter or self.consultation_adapters.get(consultation_type or "")
+
+    def resolve_generation(
+        self,
+        llm: InferenceBackend,
+        consultation_type: Optional[str],
+        overrides: Optional[Mapping[str, Any]] = None
+    ) -> GenerationConfig:
+        """Padrões do backend, ajustados pelo tipo de consulta e depois pela requisição"""
+        return llm.generation.merged(
+            self.consultation_generation.get(consultation_type or "")
+        ).merged(overrides)
+
+    async def analyze_document(
+        self,
+        extracted_text: str,
+        filename: str,
+        session_id: str,
+        consultation_type: str = "consultation",
+        structure: Optional[DocumentStructure] = None,
+        control: Optional[GenerationControl] = None,
+        adapter: Optional[str] = None
+    ) -> str:
+        """
+        Gera a análise de um documento. Documentos que cabem no limite do prompt
+        são enviados diretamente; documentos longos passam por map-reduce:
+        cada grupo de páginas é resumido (em lote) e, enquanto os resumos
+        juntos não couberem no prompt, resumos vizinhos são agrupados e
+        resumidos de novo (ver _reduce_summaries).
+        """
+        if len(extracted_text) <= DocumentService.MAX_CHAT_CHARS:
+            formatted_message = DocumentService.format_document_for_chat(
+                extracted_text, filename, consultation_type
+            )
+            return await self.generate_response(formatted_message, session_id, consultation_type, control, adapter)
+
+        chunks = DocumentService.chunk_pages(extracted_text, settings.document_chunk_chars, structure)
+        sections = await self._reduce_summaries(chunks, filename, control)
+
+        reduced_text = REDUCED_DOCUMENT_HEADER + self._join_sections(sections)
+        formatted_message = DocumentService.format_document_for_chat(
+            reduced_text, filename, consultation_type
+        )
+        return await self.generate_response(formatted_message, session_id, consultation_type, control, adapter)
+
+    async def _reduce_summaries(
+        self,
+        chunks: List[dict],
+        filename: str,
+        control: Optional[GenerationControl] = None
+    ) -> List[dict]:
+        """
+        Etapa "reduce" hierárquica: resume os trechos e, enquanto os resumos
+        juntos passarem do limite do prompt (que os cortaria), agrupa resumos
+        vizinhos em blocos de até MAX_CHAT_CHARS e resume cada bloco. Devolve
+        as seções finais ({"first_page", "last_page", "text"}) em ordem.
+        """
+        budget = DocumentService.MAX_CHAT_CHARS - len(REDUCED_DOCUMENT_HEADER)
+        sections = chunks
+        for level in range(MAX_REDUCE_LEVELS + 1):
+            summaries = await self._summarize_chunks(sections, filename, control)
+            sections = [{**section, "text": summary} for section, summary in zip(sections, summaries)]
+            if len(self._join_sections(sections)) <= budget:
+                return sections
+
+            groups = self._group_sections(sections, budget)
+            if len(groups) == len(sections):
+                # Nenhum par de resumos cabe junto: agrupar não reduz mais nada
+                break
+            logger.info("Document summaries reduced", extra={
+                "level": level + 1,
+                "sections": len(sections),
+                "groups": len(groups),
+            })
+            sections = groups
+
+        logger.warning("Document summaries still exceed the prompt limit", extra={"sections": len(sections)})
+        return sections
+
+    def _join_sections(self, sections: List[dict]) -> str:
+        return "\n\n".join(f"[{self._page_range(section)}]\n{section['text']}" for section in sections)
+
+    def _group_sections(self, sections: List[dict], max_chars: int) -> List[dict]:
+        """Junta seções consecutivas em blocos de até max_chars (uma seção maior fica sozinha)"""
+        groups: List[List[dict]] = []
+        size = 0
+        for section in sections:
+            length = len(self._join_sections([section]))
+            if groups and size + 2 + length <= max_chars:
+                groups[-1].append(section)
+                size += 2 + length
+            else:
+                groups.append([section])
+                size = length
+        return [
+            {
+                "first_page": group[0]["first_page"],
+                "last_page": group[-1]["last_page"],
+                "text": self._join_sections(group),
+            }
+            for group in groups
+        ]
+
+    async def _summarize_chunks(
+        self,
+        chunks: List[dict],
+        filename: str,
+        control: Optional[GenerationControl] = None
+    ) -> List[str]:
+        """Etapa "map": resume os trechos, reaproveitando resumos já calculados"""
+        summaries: List[Optional[str]] = [None] * len(chunks)
+        pending = []
+        for index, chunk in enumerate(chunks):
+            key = self._chunk_key(chunk["text"])
+            cached = self._chunk_summaries.get(key)
+            if cached is not None:
+                self._chunk_summaries.move_to_end(key)
+                summaries[index] = cached
+            else:
+                pending.append(index)
+
+        llm = await self._get_llm()
+        while pending:
+            # Lotes são indivisíveis: o prazo é verificado entre eles
+            if control is not None and control.should_stop():
+                raise TimeoutError(
+                    "Tempo limite excedido ao resumir o documento. Os trechos já resumidos foram "
+                    "guardados; tente novamente para concluir a análise."
+                )
+            # Lote e tamanho dos resumos seguem a pressão de memória, reavaliada a cada lote
+            batch_size = self.governor.batch_size(max(1, settings.document_map_batch_size))
+            max_new_tokens = (
+                self.governor.max_new_tokens(settings.document_summary_max_tokens)
+                or settings.document_summary_max_tokens
+            )
+            batch, pending = pending[:batch_size], pending[batch_size:]
+            prompts = [
+                DOCUMENT_CHUNK_SUMMARY_PROMPT.format(
+                    filename=filename,
+                    page_range=self._page_range(chunks[index]),
+                    chunk_text=chunks[index]["text"]
+                )
+                for index in batch
+            ]
+            try:
+                results = await asyncio.to_thread(
+                    llm.generate_batch,
+                    prompts,
+                    max_new_tokens
+                )
+            except Exception:
+                logger.exception("Error summarizing document chunks", extra={"chunks": batch})
+                continue
+
+            for index, summary in zip(batch, results):
+                if summary:
+                    summaries[index] = summary
+                    self._remember_summary(chunks[index]["text"], summary)
+
+        failed = [index for index, summary in enumerate(summaries) if summary is None]
+        if failed:
+            # Os trechos já resumidos ficam em cache; uma nova tentativa refaz apenas os que falharam
+            raise RuntimeError(
+                f"Falha ao resumir {len(failed)} de {len(chunks)} trechos do documento. Tente novamente."
+            )
+
+        return summaries
+
+    def _remember_summary(self, chunk_text: str, summary: str):
+        self._chunk_summaries[self._chunk_key(chunk_text)] = summary
+        while len(self._chunk_summaries) > settings.document_summary_cache_size:
+            self._chunk_summaries.popitem(last=False)
+
+    def _remember_response(self, key: str, response: str):
+        self._responses[key] = response
+        while len(self._responses) > settings.generation_cache_size:
+            self._responses.popitem(last=False)
+
+    @staticmethod
+    def _response_key(llm: InferenceBackend, adapter: Optional[str], config: GenerationConfig, prompt: str) -> str:
+        identity = json.dumps([llm.name, llm.model_name, adapter, config.key()])
+        return hashlib.sha256(f"{identity}\n{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _chunk_key(chunk_text: str) -> str:
+        return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _page_range(chunk: dict) -> str:
+        if chunk["first_page"] == chunk["last_page"]:
+            return f"Página {chunk['first_page']}"
+        return f"Páginas {chunk['first_page']}-{chunk['last_page']}"
@@ -0,0 +1,61 @@
+"""
+Deduplicação de requisições idênticas em andamento
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class InFlightRequests:
+    """
+    Chamadas concorrentes com a mesma chave compartilham uma única execução:
+    a primeira cria a tarefa e as demais aguardam o mesmo resultado.
+
+    Quando todos os chamadores desistem (desconexão, cancelamento), o
+    callback `on_abandoned` da execução é chamado para interrompê-la.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._on_abandoned: Dict[Hashable, Callable[[], None]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[T]],
+        on_abandoned: Optional[Callable[[], None]] = None
+    ) -> T:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            if on_abandoned is not None:
+                self._on_abandoned[key] = on_abandoned
+            future.add_done_callback(lambda _: self._forget(key))
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # shield: o cancelamento de um chamador não cancela a execução compartilhada
+            return await asyncio.shield(future)
+        finally:
+            remaining = self._waiters.get(key, 1) - 1
+            if remaining > 0:
+                self._waiters[key] = remaining
+            else:
+                self._waiters.pop(key, None)
+                callback = self._on_abandoned.pop(key, None)
+                if callback is not None and not future.done():
+                    callback()
+
+    def _forget(self, key: Hashable):
+        self._inflight.pop(key, None)
+        self._on_abandoned.pop(key, None)
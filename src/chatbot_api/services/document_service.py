@@ -2,15 +2,77 @@
 Serviço para processamento de documentos PDF
 """
 
-import PyPDF2
 import io
-from typing import Optional, Dict, Any
+import mmap
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple, BinaryIO, Iterator
 import re
 
+from .document_structure import DocumentStructure
+
+if TYPE_CHECKING:
+    import PyPDF2
+
+
+PAGE_MARKER_PATTERN = re.compile(r'^--- Página (\d+) ---$', re.MULTILINE)
+
+
+class InvalidPDFError(Exception):
+    """Arquivo enviado não pode ser lido como PDF"""
+
 
 class DocumentService:
     """Serviço para extração de texto de documentos"""
 
+    # Limite de caracteres enviados diretamente ao modelo em uma única chamada
+    MAX_CHAT_CHARS = 8000
+
+    # Tamanho máximo de upload (10MB)
+    MAX_FILE_SIZE = 10 * 1024 * 1024
+
+    @staticmethod
+    @contextmanager
+    def open_pdf(file_obj: BinaryIO) -> Iterator["PyPDF2.PdfReader"]:
+        """
+        Abre um único leitor de PDF sobre o arquivo enviado, sem copiar o conteúdo.
+        Arquivos que já foram despejados em disco são lidos via mmap; arquivos
+        ainda em memória são lidos diretamente do buffer.
+
+        Args:
+            file_obj: Arquivo binário (ex.: SpooledTemporaryFile do UploadFile)
+
+        Yields:
+            PdfReader compartilhado entre validação e extração
+
+        Raises:
+            InvalidPDFError: se o arquivo não puder ser lido como PDF
+        """
+        mapped = None
+        stream: BinaryIO = file_obj
+
+        # SpooledTemporaryFile._rolled indica se o conteúdo já está em disco
+        # (mesma verificação usada pelo Starlette); fileno() forçaria o despejo
+        if getattr(file_obj, "_rolled", True):
+            try:
+                mapped = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+                stream = mapped
+            except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+                mapped = None
+
+        # PyPDF2 só é importado quando um PDF é de fato aberto
+        import PyPDF2
+
+        try:
+            stream.seek(0)
+            try:
+                pdf_reader = PyPDF2.PdfReader(stream)
+            except Exception as e:
+                raise InvalidPDFError(f"Arquivo PDF inválido ou corrompido: {str(e)}") from e
+            yield pdf_reader
+        finally:
+            if mapped is not None:
+                mapped.close()
+
     @staticmethod
     def extract_text_from_pdf(file_content: bytes, filename: str) -> Dict[str, Any]:
         """
@@ -23,24 +85,40 @@ class DocumentService:
         Returns:
             Dict com texto extraído e metadados
         """
+        import PyPDF2
+
         try:
-            # Criar objeto de arquivo em memória
-            pdf_file = io.BytesIO(file_content)
+            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+        except Exception as e:
+            return {
+                "success": False,
+                "text": "",
+                "metadata": {"filename": filename},
+                "error": f"Erro ao extrair texto do PDF: {str(e)}"
+            }
 
-            # Ler PDF
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+        return DocumentService.extract_text_from_reader(pdf_reader, filename)
 
-            # Extrair texto de todas as páginas
-            text_content = ""
-            num_pages = len(pdf_reader.pages)
+    @staticmethod
+    def extract_text_from_reader(pdf_reader: "PyPDF2.PdfReader", filename: str) -> Dict[str, Any]:
+        """
+        Extrai texto de um PDF já aberto
 
-            for page_num in range(num_pages):
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                text_content += f"\n--- Página {page_num + 1} ---\n{page_text}\n"
+        Args:
+            pdf_reader: Leitor de PDF (ver open_pdf)
+            filename: Nome do arquivo
 
-            # Limpar texto extraído
-            clean_text = DocumentService._clean_extracted_text(text_content)
+        Returns:
+            Dict com texto extraído e metadados
+        """
+        try:
+            # Extrair texto de todas as páginas
+            page_texts = [page.extract_text() or "" for page in pdf_reader.pages]
+            num_pages = len(page_texts)
+
+            # Limpar texto e indexar páginas/seções em uma única passada
+            structure = DocumentStructure.from_pages(page_texts)
+            clean_text = structure.text
 
             # Metadados do PDF
             metadata = {}
@@ -55,11 +133,13 @@ class DocumentService:
             return {
                 "success": True,
                 "text": clean_text,
+                "structure": structure,
                 "metadata": {
                     "filename": filename,
                     "num_pages": num_pages,
                     "char_count": len(clean_text),
                     "word_count": len(clean_text.split()),
+                    "sections": structure.summary(),
                     **metadata
                 },
                 "error": None
@@ -74,39 +154,80 @@ class DocumentService:
             }
 
     @staticmethod
-    def _clean_extracted_text(text: str) -> str:
+    def merge_ocr_pages(extraction_result: Dict[str, Any], ocr_results: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Limpa e normaliza o texto extraído
+        Incorpora o texto obtido por OCR às páginas sem texto e reconstrói a estrutura
 
         Args:
-            text: Texto bruto extraído
+            extraction_result: Resultado de extract_text_from_reader
+            ocr_results: Resultado de OCRService.ocr_pages (página -> dados do OCR)
 
         Returns:
-            Texto limpo e normalizado
+            Novo resultado de extração, com metadados do OCR
         """
-        # Remover linhas em branco excessivas
-        text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
+        structure: DocumentStructure = extraction_result["structure"]
+        page_texts = [
+            ocr_results[page.number]["text"] if page.number in ocr_results else structure.page_text(page.number)
+            for page in structure.pages
+        ]
+        structure = DocumentStructure.from_pages(page_texts)
+        clean_text = structure.text
+
+        return {
+            **extraction_result,
+            "text": clean_text,
+            "structure": structure,
+            "metadata": {
+                **extraction_result["metadata"],
+                "char_count": len(clean_text),
+                "word_count": len(clean_text.split()),
+                "sections": structure.summary(),
+                "ocr": {
+                    "pages": {
+                        page_number: {"seconds": result["seconds"], "cached": result["cached"], "error": result["error"]}
+                        for page_number, result in ocr_results.items()
+                    },
+                    "total_seconds": round(sum(result["seconds"] for result in ocr_results.values()), 3),
+                },
+            },
+        }
+
+    @staticmethod
+    def validate_pdf_file(file_content: bytes, filename: str) -> Dict[str, Any]:
+        """
+        Valida se o arquivo é um PDF válido
 
-        # Normalizar espaços
-        text = re.sub(r'[ \t]+', ' ', text)
+        Args:
+            file_content: Conteúdo do arquivo
+            filename: Nome do arquivo
 
-        # Remover espaços no início e fim das linhas
-        lines = [line.strip() for line in text.split('\n')]
-        text = '\n'.join(lines)
+        Returns:
+            Dict com resultado da validação
+        """
+        validation = DocumentService.validate_upload(filename, len(file_content))
+        if not validation["valid"]:
+            return validation
 
-        # Remover linhas vazias no início e fim
-        text = text.strip()
+        import PyPDF2
 
-        return text
+        try:
+            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+        except Exception as e:
+            return {
+                "valid": False,
+                "error": f"Arquivo PDF inválido ou corrompido: {str(e)}"
+            }
+
+        return DocumentService.validate_pdf_reader(pdf_reader, len(file_content))
 
     @staticmethod
-    def validate_pdf_file(file_content: bytes, filename: str) -> Dict[str, Any]:
+    def validate_upload(filename: str, size_bytes: int) -> Dict[str, Any]:
         """
-        Valida se o arquivo é um PDF válido
+        Validações baratas, feitas antes de abrir o PDF
 
         Args:
-            file_content: Conteúdo do arquivo
             filename: Nome do arquivo
+            size_bytes: Tamanho do arquivo em bytes
 
         Returns:
             Dict com resultado da validação
@@ -119,18 +240,28 @@ class DocumentService:
             }
 
         # Verificar tamanho (máximo 10MB)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if len(file_content) > max_size:
+        max_size = DocumentService.MAX_FILE_SIZE
+        if size_bytes > max_size:
             return {
                 "valid": False,
                 "error": f"Arquivo muito grande. Máximo permitido: {max_size // (1024*1024)}MB"
             }
 
-        # Verificar se é um PDF válido
-        try:
-            pdf_file = io.BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+        return {"valid": True, "error": None}
 
+    @staticmethod
+    def validate_pdf_reader(pdf_reader: "PyPDF2.PdfReader", size_bytes: int) -> Dict[str, Any]:
+        """
+        Valida a estrutura de um PDF já aberto
+
+        Args:
+            pdf_reader: Leitor de PDF (ver open_pdf)
+            size_bytes: Tamanho do arquivo em bytes
+
+        Returns:
+            Dict com resultado da validação
+        """
+        try:
             # Tentar acessar metadados básicos
             num_pages = len(pdf_reader.pages)
 
@@ -145,7 +276,7 @@ class DocumentService:
                 "error": None,
                 "metadata": {
                     "num_pages": num_pages,
-                    "size_mb": round(len(file_content) / (1024*1024), 2)
+                    "size_mb": round(size_bytes / (1024*1024), 2)
                 }
             }
 
@@ -155,6 +286,85 @@ class DocumentService:
                 "error": f"Arquivo PDF inválido ou corrompido: {str(e)}"
             }
 
+    @staticmethod
+    def split_pages(extracted_text: str) -> List[Tuple[int, str]]:
+        """
+        Divide o texto extraído nas páginas originais usando os marcadores
+        "--- Página N ---" inseridos por extract_text_from_pdf
+
+        Args:
+            extracted_text: Texto extraído do documento
+
+        Returns:
+            Lista de tuplas (número da página, texto da página)
+        """
+        markers = list(PAGE_MARKER_PATTERN.finditer(extracted_text))
+        if not markers:
+            return [(1, extracted_text.strip())] if extracted_text.strip() else []
+
+        pages = []
+        for index, marker in enumerate(markers):
+            end = markers[index + 1].start() if index + 1 < len(markers) else len(extracted_text)
+            page_text = extracted_text[marker.end():end].strip()
+            if page_text:
+                pages.append((int(marker.group(1)), page_text))
+
+        return pages
+
+    @staticmethod
+    def chunk_pages(extracted_text: str, max_chars: int, structure: Optional[DocumentStructure] = None) -> List[Dict[str, Any]]:
+        """
+        Agrupa páginas consecutivas em trechos de até max_chars caracteres.
+        Páginas maiores que o limite são divididas em partes.
+
+        Args:
+            extracted_text: Texto extraído do documento
+            max_chars: Tamanho máximo de cada trecho
+            structure: Índice de páginas, se disponível (evita reprocessar o texto)
+
+        Returns:
+            Lista de dicts com "first_page", "last_page" e "text"
+        """
+        chunks: List[Dict[str, Any]] = []
+        current: List[str] = []
+        current_len = 0
+        first_page = last_page = None
+
+        def flush():
+            nonlocal current, current_len, first_page
+            if current:
+                chunks.append({
+                    "first_page": first_page,
+                    "last_page": last_page,
+                    "text": "\n\n".join(current)
+                })
+            current, current_len, first_page = [], 0, None
+
+        pages = structure.iter_pages() if structure else DocumentService.split_pages(extracted_text)
+        for page_num, page_text in pages:
+            # Páginas muito longas viram trechos próprios
+            if len(page_text) > max_chars:
+                flush()
+                for start in range(0, len(page_text), max_chars):
+                    chunks.append({
+                        "first_page": page_num,
+                        "last_page": page_num,
+                        "text": page_text[start:start + max_chars]
+                    })
+                continue
+
+            if current_len + len(page_text) > max_chars:
+                flush()
+
+            if first_page is None:
+                first_page = page_num
+            last_page = page_num
+            current.append(page_text)
+            current_len += len(page_text)
+
+        flush()
+        return chunks
+
     @staticmethod
     def format_document_for_chat(extracted_text: str, filename: str, consultation_type: str = "consultation") -> str:
         """
@@ -169,7 +379,7 @@ class DocumentService:
             Texto formatado para o chat
         """
         # Limitar tamanho do texto para evitar prompts muito longos
-        max_chars = 8000  # Limite conservador
+        max_chars = DocumentService.MAX_CHAT_CHARS  # Limite conservador
         if len(extracted_text) > max_chars:
             truncated_text = extracted_text[:max_chars] + "\n\n[... texto truncado para brevidade ...]"
         else:
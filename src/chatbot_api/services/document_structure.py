@@ -0,0 +1,237 @@
+"""
+Representação estruturada de documentos extraídos: páginas, títulos,
+artigos, parágrafos e cláusulas com seus offsets no texto
+"""
+
+import bisect
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Padrões aplicados apenas ao início de cada linha (nunca ao texto inteiro)
+HEADING_PATTERN = re.compile(r'^(CAP[ÍI]TULO|SE[ÇC][ÃA]O|T[ÍI]TULO)\s+([IVXLCDM]+|\d+)\b', re.IGNORECASE)
+CLAUSE_PATTERN = re.compile(r'^CL[ÁA]USULA\s+(\d+|[A-ZÀ-Ú]+)\s*[ªº°a]?', re.IGNORECASE)
+ARTICLE_PATTERN = re.compile(r'^Art(?:igo)?\.?\s*(\d+)\s*[º°o]?', re.IGNORECASE)
+PARAGRAPH_PATTERN = re.compile(r'^(?:§\s*(\d+)\s*[º°o]?|Par[áa]grafo\s+[úu]nico)', re.IGNORECASE)
+
+# Hierarquia: uma seção termina onde começa a próxima de nível igual ou superior
+SECTION_LEVELS = {"heading": 0, "clause": 1, "article": 1, "paragraph": 2}
+
+# Espaços e tabulações dentro da linha viram um espaço (demais espaços Unicode são mantidos)
+INLINE_SPACES_PATTERN = re.compile(r"[ \t]+")
+
+ORDINALS = {
+    "primeira": 1, "segunda": 2, "terceira": 3, "quarta": 4, "quinta": 5,
+    "sexta": 6, "setima": 7, "oitava": 8, "nona": 9, "decima": 10,
+    "unica": 1,
+}
+
+
+@dataclass(frozen=True)
+class PageSpan:
+    number: int
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class Section:
+    kind: str  # 'heading', 'clause', 'article' ou 'paragraph'
+    label: str  # chave normalizada, ex.: 'clausula 5', 'art 12', '§ 2'
+    title: str  # linha original
+    page: int
+    start: int
+    end: int
+
+
+@dataclass
+class DocumentStructure:
+    """
+    Texto limpo do documento com índice de páginas e seções.
+
+    Fatiar uma página ou seção é O(1) sobre `text`, sem novas buscas por
+    expressões regulares.
+    """
+
+    text: str
+    pages: List[PageSpan] = field(default_factory=list)
+    sections: List[Section] = field(default_factory=list)
+    _page_index: Dict[int, int] = field(default_factory=dict, repr=False)
+    _section_index: Dict[str, int] = field(default_factory=dict, repr=False)
+    _page_starts: List[int] = field(default_factory=list, repr=False)
+
+    @classmethod
+    def from_pages(cls, page_texts: List[str]) -> "DocumentStructure":
+        """
+        Monta o texto limpo ("--- Página N ---" + conteúdo) e o índice em uma
+        única passada pelas linhas de cada página.
+
+        A normalização é a mesma da antiga limpeza por regex sobre o texto
+        inteiro: espaços/tabulações colapsados, linhas aparadas e no máximo
+        uma linha em branco entre linhas com conteúdo, inclusive logo após o
+        marcador da página (nunca no fim da página).
+        """
+        parts: List[str] = []
+        pages: List[PageSpan] = []
+        raw_sections: List[Tuple[str, str, str, int, int]] = []
+        offset = 0
+
+        for page_number, page_text in enumerate(page_texts, start=1):
+            if parts:
+                parts.append("\n\n")
+                offset += 2
+
+            marker = f"--- Página {page_number} ---"
+            parts.append(marker)
+            offset += len(marker)
+            page_start = offset
+
+            pending_blank = False
+            for raw_line in (page_text or "").split("\n"):
+                # Normalizar espaços e remover espaços no início e fim da linha
+                line = INLINE_SPACES_PATTERN.sub(" ", raw_line).strip()
+                if not line:
+                    # Sequências de linhas em branco viram uma só, emitida antes da próxima linha com conteúdo
+                    pending_blank = True
+                    continue
+
+                if pending_blank:
+                    parts.append("\n")
+                    offset += 1
+                    pending_blank = False
+
+                parts.append("\n")
+                offset += 1
+                section = cls._detect_section(line)
+                if section:
+                    raw_sections.append((*section, line, page_number, offset))
+                parts.append(line)
+                offset += len(line)
+
+            pages.append(PageSpan(page_number, page_start, offset))
+
+        text = "".join(parts)
+        structure = cls(text=text, pages=pages)
+        structure._index_sections(raw_sections)
+        return structure
+
+    @classmethod
+    def from_text(cls, extracted_text: str) -> "DocumentStructure":
+        """Reconstrói a estrutura a partir de um texto com marcadores de página"""
+        from .document_service import DocumentService
+
+        page_texts: List[str] = []
+        for page_number, page_text in DocumentService.split_pages(extracted_text):
+            # Preservar numeração, preenchendo páginas vazias
+            page_texts.extend([""] * (page_number - 1 - len(page_texts)))
+            page_texts.append(page_text)
+        return cls.from_pages(page_texts)
+
+    @staticmethod
+    def _detect_section(line: str) -> Optional[Tuple[str, str]]:
+        first = line[0]
+        if first == "§" or first in "Pp":
+            match = PARAGRAPH_PATTERN.match(line)
+            if match:
+                return "paragraph", f"§ {match.group(1)}" if match.group(1) else "§ unico"
+        if first in "Aa":
+            match = ARTICLE_PATTERN.match(line)
+            if match:
+                return "article", f"art {int(match.group(1))}"
+        if first in "Cc":
+            match = CLAUSE_PATTERN.match(line)
+            if match:
+                number = DocumentStructure._clause_number(match.group(1))
+                if number is not None:
+                    return "clause", f"clausula {number}"
+        if first in "CcSsTt":
+            match = HEADING_PATTERN.match(line)
+            if match:
+                kind = _strip_accents(match.group(1)).lower()
+                return "heading", f"{kind} {match.group(2).upper()}"
+        return None
+
+    @staticmethod
+    def _clause_number(value: str) -> Optional[int]:
+        if value.isdigit():
+            return int(value)
+        return ORDINALS.get(_strip_accents(value).lower())
+
+    def _index_sections(self, raw_sections: List[Tuple[str, str, str, int, int]]):
+        # Fim de cada seção: início da próxima de nível igual ou superior
+        ends = [len(self.text)] * len(raw_sections)
+        open_sections: List[int] = []
+        for index, (kind, *_rest, start) in enumerate(raw_sections):
+            level = SECTION_LEVELS[kind]
+            while open_sections and SECTION_LEVELS[raw_sections[open_sections[-1]][0]] >= level:
+                ends[open_sections.pop()] = start
+            open_sections.append(index)
+
+        self.sections = [
+            Section(kind, label, title, page, start, end)
+            for (kind, label, title, page, start), end in zip(raw_sections, ends)
+        ]
+        self._page_index = {page.number: index for index, page in enumerate(self.pages)}
+        self._page_starts = [page.start for page in self.pages]
+        # Primeira ocorrência de cada rótulo (ex.: 'clausula 5')
+        self._section_index = {}
+        for index, section in enumerate(self.sections):
+            self._section_index.setdefault(section.label, index)
+
+    @property
+    def has_text(self) -> bool:
+        return any(page.end > page.start for page in self.pages)
+
+    def empty_pages(self) -> List[int]:
+        """Páginas sem camada de texto (candidatas a OCR)"""
+        return [page.number for page in self.pages if page.end == page.start]
+
+    def iter_pages(self) -> Iterator[Tuple[int, str]]:
+        for page in self.pages:
+            page_text = self.text[page.start:page.end].strip()
+            if page_text:
+                yield page.number, page_text
+
+    def page_text(self, number: int) -> str:
+        index = self._page_index.get(number)
+        if index is None:
+            return ""
+        page = self.pages[index]
+        return self.text[page.start:page.end].strip()
+
+    def page_of(self, offset: int) -> Optional[int]:
+        index = bisect.bisect_right(self._page_starts, offset) - 1
+        return self.pages[index].number if index >= 0 else None
+
+    def find_section(self, label: str) -> Optional[Section]:
+        """Busca por rótulo, ex.: 'Cláusula 5ª', 'clausula quinta', 'Art. 12', '§ 2º'"""
+        key = self._normalize_label(label)
+        index = self._section_index.get(key) if key else None
+        return self.sections[index] if index is not None else None
+
+    def section_text(self, label: str) -> str:
+        section = self.find_section(label)
+        return self.text[section.start:section.end].strip() if section else ""
+
+    @classmethod
+    def _normalize_label(cls, label: str) -> Optional[str]:
+        label = " ".join(label.split())
+        if not label:
+            return None
+        section = cls._detect_section(label)
+        return section[1] if section else _strip_accents(label).lower()
+
+    def summary(self) -> Dict[str, int]:
+        """Contagens compactas para metadados de resposta"""
+        counts: Dict[str, int] = {kind: 0 for kind in SECTION_LEVELS}
+        for section in self.sections:
+            counts[section.kind] += 1
+        return {"pages": len(self.pages), **{f"{kind}s": count for kind, count in counts.items()}}
+
+
+def _strip_accents(value: str) -> str:
+    return "".join(
+        char for char in unicodedata.normalize("NFD", value)
+        if unicodedata.category(char) != "Mn"
+    )
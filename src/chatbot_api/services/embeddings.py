@@ -0,0 +1,341 @@
+"""
+Embeddings de texto: codificação em micro-lotes com cache de vetores
+
+EmbeddingService junta os textos pedidos por chamadores concorrentes: cada
+pedido entra numa fila e o lote é codificado quando atinge `batch_size` ou
+após `max_wait_ms`. A codificação roda numa thread dedicada (o encoder não é
+reentrante e não deve ocupar o event loop).
+
+Os vetores são normalizados (produto interno = cosseno) e guardados no
+VectorCache: uma matriz float16 indexada pelo hash do texto, com despejo
+LRU. Um texto já codificado, ou em codificação, nunca é codificado de novo.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import Settings, settings as default_settings
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Após uma falha ao carregar o encoder, nova tentativa só depois desse
+# intervalo (dobrado a cada falha seguida, até o teto)
+LOAD_RETRY_SECONDS = 60.0
+MAX_LOAD_RETRY_SECONDS = 3600.0
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class TextEncoder(ABC):
+    name: str = "base"
+
+    @property
+    @abstractmethod
+    def dim(self) -> int:
+        ...
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Matriz float32 (len(texts), dim) com linhas de norma 1"""
+
+
+class HashingEncoder(TextEncoder):
+    """
+    Feature hashing de palavras e bigramas. Não precisa de modelo: serve para
+    testes, para o backend mock e como alternativa quando não há encoder.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 256):
+        self._dim = dim
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self._dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = WORD_PATTERN.findall(text.lower())
+            for feature in chain(words, (f"{a} {b}" for a, b in zip(words, words[1:]))):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                # Bit alto como sinal: colisões tendem a se cancelar
+                vectors[row, digest % self._dim] += 1.0 if digest & 0x80000000 else -1.0
+        return normalize(vectors)
+
+
+class TransformersEncoder(TextEncoder):
+    """
+    Encoder de sentenças pequeno (ex.: MiniLM multilíngue) em CPU, com mean
+    pooling. torch/transformers e o modelo são carregados na primeira chamada.
+
+    Se o carregamento falhar (modelo indisponível, sem rede), a falha é
+    lembrada: as chamadas seguintes falham de imediato, sem novo download,
+    até o fim do intervalo de espera.
+    """
+
+    name = "transformers"
+
+    def __init__(self, model_name: str, max_length: int = 256, sub_batch_size: int = 16):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.sub_batch_size = sub_batch_size
+        self._tokenizer = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._load_error: Optional[Exception] = None
+        self._load_failures = 0
+        self._retry_at = 0.0
+
+    def _load(self):
+        with self._lock:
+            if self._model is not None:
+                return
+            if self._load_error is not None and time.monotonic() < self._retry_at:
+                raise RuntimeError(f"Encoder {self.model_name} indisponível: {self._load_error}") from self._load_error
+            try:
+                from transformers import AutoModel, AutoTokenizer
+
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                self._model = AutoModel.from_pretrained(self.model_name).eval()
+            except Exception as e:
+                self._load_failures += 1
+                self._load_error = e
+                delay = min(MAX_LOAD_RETRY_SECONDS, LOAD_RETRY_SECONDS * 2 ** (self._load_failures - 1))
+                self._retry_at = time.monotonic() + delay
+                logger.warning("Embedding encoder failed to load", extra={
+                    "model": self.model_name, "error": str(e), "retry_seconds": delay,
+                })
+                raise
+            self._load_error = None
+            self._load_failures = 0
+
+    @property
+    def dim(self) -> int:
+        self._load()
+        return self._model.config.hidden_size
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        import torch
+
+        self._load()
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        # Textos de tamanho parecido no mesmo sub-lote: menos padding a processar
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        for start in range(0, len(order), self.sub_batch_size):
+            indices = order[start:start + self.sub_batch_size]
+            batch = self._tokenizer(
+                [texts[index] for index in indices],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt",
+            )
+            with torch.inference_mode():
+                hidden = self._model(**batch).last_hidden_state
+            mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors[indices] = pooled.float().numpy()
+        return normalize(vectors)
+
+
+class VectorCache:
+    """
+    Vetores float16 numa matriz pré-alocada (capacity x dim), indexados pelo
+    hash do texto, com despejo LRU. A matriz é criada no primeiro `put_many`,
+    quando a dimensão do encoder é conhecida.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.vectors: Optional[np.ndarray] = None
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.vectors is None else self.vectors.nbytes
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    continue
+                self._slots.move_to_end(key)
+                found[key] = self.vectors[slot].astype(np.float32)
+                self.hits += 1
+        return found
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        with self._lock:
+            if self.vectors is None:
+                self.vectors = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float16)
+            for key, vector in zip(keys, vectors):
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        # Reaproveitar a linha do menos usado recentemente
+                        _, slot = self._slots.popitem(last=False)
+                    self._slots[key] = slot
+                self._slots.move_to_end(key)
+                self.vectors[slot] = vector
+
+
+class EmbeddingService:
+    """Embeddings com micro-lotes entre chamadores concorrentes e cache por conteúdo"""
+
+    def __init__(
+        self,
+        encoder: TextEncoder,
+        cache_size: int = 20000,
+        batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encoder = encoder
+        self.cache = VectorCache(cache_size)
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.encoded = 0
+        self.batches = 0
+        self._pending: List[Tuple[str, str]] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embeddings")
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Vetores float32 (len(texts), dim), na ordem de `texts`"""
+        if not texts:
+            return np.zeros((0, self.encoder.dim), dtype=np.float32)
+
+        keys = [self.key(text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        loop = asyncio.get_running_loop()
+        waiting: Dict[str, asyncio.Future] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in waiting:
+                continue
+            future = self._inflight.get(key)
+            if future is None:
+                # Primeiro pedido deste texto: entra no próximo lote
+                future = loop.create_future()
+                self._inflight[key] = future
+                self._pending.append((key, text))
+            waiting[key] = future
+
+        if self._pending:
+            self._schedule_flush(loop)
+        if waiting:
+            # shield: um chamador cancelado não cancela o vetor esperado pelos demais
+            vectors = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()))
+            found.update(zip(waiting, vectors))
+
+        return np.stack([found[key] for key in keys])
+
+    async def embed_one(self, text: str) -> np.ndarray:
+        return (await self.embed([text]))[0]
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop):
+        if len(self._pending) >= self.batch_size:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            asyncio.ensure_future(self._encode_batch(batch))
+
+    async def _encode_batch(self, batch: List[Tuple[str, str]]):
+        keys = [key for key, _ in batch]
+        texts = [text for _, text in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            # Executor próprio: copiar o contexto para manter o request_id nos logs da thread
+            context = contextvars.copy_context()
+            vectors = await loop.run_in_executor(self._executor, context.run, self._encode_and_store, keys, texts)
+        except Exception as e:
+            for key in keys:
+                future = self._inflight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, vector in zip(keys, vectors):
+            future = self._inflight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(vector)
+
+    def _encode_and_store(self, keys: List[str], texts: List[str]) -> np.ndarray:
+        vectors = self.encoder.encode(texts)
+        self.cache.put_many(keys, vectors)
+        self.encoded += len(texts)
+        self.batches += 1
+        # Mesma precisão do cache: o vetor não muda entre a primeira chamada e as seguintes
+        return vectors.astype(np.float16).astype(np.float32)
+
+    def stats(self) -> dict:
+        return {
+            "encoder": self.encoder.name,
+            "cached": len(self.cache),
+            "cache_bytes": self.cache.nbytes,
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "encoded": self.encoded,
+            "batches": self.batches,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def create_embedding_service(config: Optional[Settings] = None) -> EmbeddingService:
+    """Serviço de embeddings configurado em Settings"""
+    config = config or default_settings
+    if config.embedding_encoder == "hashing":
+        encoder: TextEncoder = HashingEncoder()
+    else:
+        encoder = TransformersEncoder(config.embedding_model, max_length=config.embedding_max_length)
+    return EmbeddingService(
+        encoder,
+        cache_size=config.embedding_cache_size,
+        batch_size=config.embedding_batch_size,
+        max_wait_ms=config.embedding_max_wait_ms,
+    )
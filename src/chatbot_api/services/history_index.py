@@ -0,0 +1,184 @@
+"""
+Seleção do histórico por relevância
+
+Em vez das últimas N trocas, o prompt recebe as trocas da sessão mais úteis
+para a mensagem atual: cada troca recebe uma nota que combina a similaridade
+com a mensagem (embeddings) e a recência, e as de maior nota entram até
+o orçamento de tokens do histórico. A troca mais recente sempre entra.
+
+O índice de cada sessão (vetores e custo em tokens de cada troca) fica em
+memória e é atualizado incrementalmente: a cada seleção, apenas as trocas
+gravadas desde a última são lidas do banco e codificadas.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from ..database.database import AsyncSessionLocal
+from ..models.database import ConversationHistory
+from .embeddings import EmbeddingService
+from .memory_governor import shrink_lru
+
+logger = logging.getLogger(__name__)
+
+# Trecho de cada troca usado no embedding (o encoder trunca o resto de qualquer forma)
+EMBEDDING_CHARS = 2000
+
+
+@dataclass
+class IndexedTurn:
+    id: int
+    user_message: str
+    bot_response: str
+    tokens: int
+
+
+@dataclass
+class SessionIndex:
+    turns: List[IndexedTurn] = field(default_factory=list)
+    vectors: Optional[np.ndarray] = None
+    last_id: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class HistoryIndex:
+    def __init__(
+        self,
+        embeddings: EmbeddingService,
+        recency_weight: float = 0.3,
+        recency_decay: float = 0.8,
+        max_turns: int = 200,
+        max_sessions: int = 1000,
+        message_chars: Optional[int] = None,
+    ):
+        self.embeddings = embeddings
+        self.recency_weight = recency_weight
+        self.recency_decay = recency_decay
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        # Mesmo corte aplicado ao montar o contexto: o custo em tokens é o do texto que vai ao prompt
+        self.message_chars = message_chars
+        self._sessions: "OrderedDict[str, SessionIndex]" = OrderedDict()
+
+    def _session(self, session_id: str) -> SessionIndex:
+        index = self._sessions.get(session_id)
+        if index is None:
+            index = self._sessions[session_id] = SessionIndex()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return index
+
+    def _clip(self, content: str) -> str:
+        if self.message_chars and len(content) > self.message_chars:
+            return content[:self.message_chars] + "..."
+        return content
+
+    async def _refresh(self, session_id: str, index: SessionIndex, count_tokens: Callable[[str], int]):
+        """Indexa as trocas gravadas desde a última atualização"""
+        async with AsyncSessionLocal() as db_session:
+            result = await db_session.execute(
+                select(ConversationHistory)
+                .where(
+                    ConversationHistory.session_id == session_id,
+                    ConversationHistory.id > index.last_id
+                )
+                .order_by(ConversationHistory.id.desc())
+                .limit(self.max_turns)
+            )
+            rows = list(reversed(result.scalars().all()))
+        if not rows:
+            return
+
+        texts = [f"{row.user_message or ''}\n{row.bot_response or ''}"[:EMBEDDING_CHARS] for row in rows]
+        vectors = (await self.embeddings.embed(texts)).astype(np.float16)
+
+        tokens = await asyncio.to_thread(lambda: [
+            count_tokens(self._clip(row.user_message or "")) + count_tokens(self._clip(row.bot_response or ""))
+            for row in rows
+        ])
+
+        index.turns.extend(
+            IndexedTurn(row.id, row.user_message or "", row.bot_response or "", cost)
+            for row, cost in zip(rows, tokens)
+        )
+        index.vectors = vectors if index.vectors is None else np.vstack([index.vectors, vectors])
+        index.last_id = rows[-1].id
+
+        # Sessões muito longas: manter só as trocas mais recentes
+        if len(index.turns) > self.max_turns:
+            index.turns = index.turns[-self.max_turns:]
+            index.vectors = index.vectors[-self.max_turns:]
+
+    async def select(
+        self,
+        session_id: str,
+        message: str,
+        token_budget: int,
+        count_tokens: Callable[[str], int]
+    ) -> List[dict]:
+        """Trocas selecionadas para o prompt, em ordem cronológica, no formato de _get_conversation_history"""
+        index = self._session(session_id)
+        async with index.lock:
+            await self._refresh(session_id, index, count_tokens)
+            turns = list(index.turns)
+            vectors = index.vectors
+
+        if not turns:
+            return []
+
+        query = await self.embeddings.embed_one(message)
+        similarity = vectors.astype(np.float32) @ query
+        ages = np.arange(len(turns) - 1, -1, -1)
+        scores = (1 - self.recency_weight) * similarity + self.recency_weight * self.recency_decay ** ages
+
+        # A troca mais recente sempre entra (continuidade da conversa)
+        selected = {len(turns) - 1}
+        used = turns[-1].tokens
+        for position in np.argsort(-scores):
+            position = int(position)
+            if position in selected or used + turns[position].tokens > token_budget:
+                continue
+            selected.add(position)
+            used += turns[position].tokens
+
+        logger.debug("History selected", extra={
+            "session_id": session_id,
+            "candidates": len(turns),
+            "selected": len(selected),
+            "tokens": used,
+        })
+
+        history = []
+        for position in sorted(selected):
+            turn = turns[position]
+            if turn.user_message:
+                history.append({"role": "user", "content": turn.user_message})
+            if turn.bot_response:
+                history.append({"role": "assistant", "content": turn.bot_response})
+        return history
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "turns": sum(len(index.turns) for index in self._sessions.values()),
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Tamanho aproximado dos índices em memória (vetores e textos das trocas)"""
+        return sum(
+            (0 if index.vectors is None else index.vectors.nbytes)
+            + sum(len(turn.user_message) + len(turn.bot_response) for turn in index.turns)
+            for index in list(self._sessions.values())
+        )
+
+    def shrink(self, keep: float) -> int:
+        """Descarta os índices das sessões usadas há mais tempo; são refeitos do banco quando necessários"""
+        return shrink_lru(self._sessions, keep)
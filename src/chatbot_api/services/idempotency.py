@@ -0,0 +1,115 @@
+"""
+Chaves de idempotência: uma repetição com a mesma chave devolve o resultado armazenado
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Optional, Tuple
+
+from ..database.database import AsyncSessionLocal
+from ..models.database import IdempotencyRecord
+from .coalescing import InFlightRequests
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflictError(Exception):
+    """A chave já foi usada com outra requisição"""
+
+
+class IdempotencyStore:
+    """
+    Armazena no banco o resultado de requisições com cabeçalho Idempotency-Key.
+
+    Repetições concluídas recebem o resultado salvo; repetições que chegam
+    enquanto a original ainda executa aguardam a mesma execução, desde que
+    tenham a mesma impressão digital.
+    """
+
+    def __init__(self, ttl_hours: int = 24):
+        self.ttl = timedelta(hours=ttl_hours)
+        self._inflight = InFlightRequests()
+        # Impressão digital de cada execução em andamento, por (endpoint, chave)
+        self._inflight_fingerprints: Dict[Tuple[str, str], str] = {}
+
+    @staticmethod
+    def fingerprint(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def file_digest(fileobj: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+        """SHA-256 do conteúdo de um arquivo, lido em blocos; a posição volta ao início"""
+        digest = hashlib.sha256()
+        fileobj.seek(0)
+        for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+            digest.update(chunk)
+        fileobj.seek(0)
+        return digest.hexdigest()
+
+    async def run(
+        self,
+        key: str,
+        endpoint: str,
+        fingerprint: str,
+        factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Returns:
+            (resultado, True se foi reaproveitado de uma execução anterior)
+        """
+        stored = await self._load(key, endpoint, fingerprint)
+        if stored is not None:
+            return stored, True
+
+        record_key = (endpoint, key)
+        replayed = record_key in self._inflight
+        if replayed:
+            if self._inflight_fingerprints.get(record_key, fingerprint) != fingerprint:
+                raise IdempotencyConflictError(
+                    "Idempotency-Key já utilizada com uma requisição diferente"
+                )
+        else:
+            self._inflight_fingerprints[record_key] = fingerprint
+
+        async def execute():
+            try:
+                result = await factory()
+                await self._save(key, endpoint, fingerprint, result)
+                return result
+            finally:
+                self._inflight_fingerprints.pop(record_key, None)
+
+        return await self._inflight.run(record_key, execute), replayed
+
+    async def _load(self, key: str, endpoint: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db_session:
+            record = await db_session.get(IdempotencyRecord, (endpoint, key))
+            if record is None:
+                return None
+
+            if record.created_at < datetime.utcnow() - self.ttl:
+                await db_session.delete(record)
+                await db_session.commit()
+                return None
+
+            if record.request_fingerprint != fingerprint:
+                raise IdempotencyConflictError(
+                    "Idempotency-Key já utilizada com uma requisição diferente"
+                )
+            return json.loads(record.response)
+
+    async def _save(self, key: str, endpoint: str, fingerprint: str, result: Dict[str, Any]):
+        try:
+            async with AsyncSessionLocal() as db_session:
+                await db_session.merge(IdempotencyRecord(
+                    endpoint=endpoint,
+                    key=key,
+                    request_fingerprint=fingerprint,
+                    response=json.dumps(result, ensure_ascii=False),
+                    created_at=datetime.utcnow()
+                ))
+                await db_session.commit()
+        except Exception:
+            logger.exception("Error saving idempotency record", extra={"endpoint": endpoint})
@@ -0,0 +1,184 @@
+"""
+Worker de inferência: consome os jobs de geração da fila e publica os resultados
+
+Roda separado da API (que usa INFERENCE_BACKEND=queue), com o backend de
+inferência real configurado no próprio ambiente do worker:
+
+    INFERENCE_BACKEND=huggingface REDIS_URL=redis://... python -m src.chatbot_api.services.inference_worker
+
+Cada worker processa um job por vez; para usar mais réplicas do modelo,
+execute mais workers. Enquanto processa, o worker envia heartbeats que
+renovam a posse do job; se ele cair, o job é reentregue a outro worker.
+"""
+
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Optional
+
+from ..core.config import settings
+from ..core.log import setup_logging, start_request
+from .backends import (
+    AdapterError,
+    GenerationConfig,
+    GenerationControl,
+    InferenceBackend,
+    create_backend,
+    filter_stream,
+)
+from .queue import Job, JobQueue, create_job_queue
+
+logger = logging.getLogger(__name__)
+
+
+class JobControl(GenerationControl):
+    """Prazo do job e cancelamento pedido pela API, consultado na fila a cada `poll_seconds`"""
+
+    def __init__(self, queue: JobQueue, job_id: str, timeout: Optional[float], poll_seconds: float = 0.5):
+        super().__init__(time.monotonic() + timeout if timeout is not None else None)
+        self.queue = queue
+        self.job_id = job_id
+        self.poll_seconds = poll_seconds
+        self._next_poll = 0.0
+
+    def should_stop(self) -> bool:
+        now = time.monotonic()
+        if not self.cancelled and now >= self._next_poll:
+            self._next_poll = now + self.poll_seconds
+            if self.queue.is_cancelled(self.job_id):
+                self.cancel()
+        return super().should_stop()
+
+
+class InferenceWorker:
+    def __init__(
+        self,
+        queue: JobQueue,
+        backend: InferenceBackend,
+        consumer: Optional[str] = None,
+        heartbeat_seconds: float = 5.0,
+        max_deliveries: int = 3,
+    ):
+        self.queue = queue
+        self.backend = backend
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_deliveries = max_deliveries
+        self.current: Optional[Job] = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        """Processa jobs até `stop()`; o job em andamento é concluído antes de sair"""
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="worker-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info("Inference worker started", extra={"consumer": self.consumer, "backend": self.backend.name})
+        while not self._stop.is_set():
+            job = self.queue.claim(self.consumer, block=1.0)
+            if job is not None:
+                self.process(job)
+        heartbeat.join()
+        logger.info("Inference worker stopped", extra={"consumer": self.consumer})
+
+    def _heartbeat_loop(self):
+        while True:
+            try:
+                self.queue.heartbeat(self.consumer, self.current, {"backend": self.backend.name})
+            except Exception:
+                logger.exception("Heartbeat failed", extra={"consumer": self.consumer})
+            if self._stop.wait(self.heartbeat_seconds):
+                return
+
+    def process(self, job: Job):
+        self.current = job
+        # Logs do job identificados pelo id do job
+        start_request(job.id)
+        start_time = time.time()
+        try:
+            if job.deliveries > self.max_deliveries:
+                logger.error("Job discarded after repeated deliveries", extra={"deliveries": job.deliveries})
+                self.queue.publish(job.id, {
+                    "type": "error",
+                    "kind": "poison",
+                    "message": f"Job abandonado após {job.deliveries - 1} tentativas",
+                })
+                return
+            if job.deliveries > 1:
+                logger.warning("Job redelivered", extra={"deliveries": job.deliveries})
+                self.queue.publish(job.id, {"type": "restart"})
+
+            self._execute(job)
+            logger.info("Job done", extra={"kind": job.payload.get("kind"), "seconds": round(time.time() - start_time, 3)})
+        except AdapterError as e:
+            self.queue.publish(job.id, {"type": "error", "kind": "adapter", "message": str(e)})
+        except Exception as e:
+            logger.exception("Job failed")
+            self.queue.publish(job.id, {"type": "error", "kind": "internal", "message": str(e)})
+        finally:
+            # Confirmado só depois do resultado publicado (entrega pelo menos uma vez)
+            self.queue.ack(job)
+            self.current = None
+
+    def _execute(self, job: Job):
+        payload = job.payload
+        max_new_tokens = payload.get("max_new_tokens")
+        # Parâmetros resolvidos pela API (ausentes em jobs de versões anteriores)
+        generation = GenerationConfig.from_dict(payload["generation"]) if payload.get("generation") else None
+
+        if payload["kind"] == "batch":
+            texts = self.backend.generate_batch(payload["prompts"], max_new_tokens, generation)
+            self.queue.publish(job.id, {"type": "done", "texts": texts})
+            return
+
+        timeout = payload.get("timeout_seconds")
+        if timeout is not None and timeout <= 0:
+            # Prazo esgotado antes de o job ser publicado: nada a gerar
+            logger.warning("Job rejected, deadline already expired")
+            self.queue.publish(job.id, {"type": "done", "text": "", "truncated": True})
+            return
+
+        control = JobControl(self.queue, job.id, timeout)
+        parts = []
+        pieces = self.backend.stream(
+            payload["prompt"], max_new_tokens, control, payload.get("adapter"), generation
+        )
+        for piece in filter_stream(pieces):
+            parts.append(piece)
+            self.queue.publish(job.id, {"type": "token", "text": piece})
+            if control.should_stop():
+                break
+        self.queue.publish(job.id, {
+            "type": "done",
+            "text": "".join(parts).strip(),
+            "truncated": control.truncated,
+        })
+
+
+def main():
+    setup_logging()
+    if settings.inference_backend == "queue":
+        raise SystemExit("O worker precisa de um backend de inferência real (INFERENCE_BACKEND=huggingface, gguf, ...)")
+
+    worker = InferenceWorker(
+        create_job_queue(),
+        create_backend(),
+        heartbeat_seconds=settings.queue_heartbeat_seconds,
+        max_deliveries=settings.queue_max_deliveries,
+    )
+
+    def handle_signal(signum, frame):
+        logger.info("Stopping inference worker", extra={"signal": signum})
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Governador de memória: degrada o serviço antes que o processo seja morto por OOM
+
+Compara o uso de memória com o limite e classifica a pressão em três níveis.
+Sem MEMORY_LIMIT_MB, vale o limite do cgroup do contêiner, comparado com o uso
+do cgroup inteiro: com o servidor pre-fork, os N workers somam esse uso, e o
+RSS de um só processo seria ~1/N dele. Com MEMORY_LIMIT_MB (limite por
+processo), ou sem cgroup (RAM física), compara-se o RSS do processo:
+
+- normal: nada muda;
+- pressure (MEMORY_PRESSURE_RATIO): os caches registrados são reduzidos à
+  metade a cada verificação, o lote do map-reduce e o `max_new_tokens` caem
+  à metade;
+- critical (MEMORY_CRITICAL_RATIO): os caches são esvaziados, lote de 1,
+  `max_new_tokens` a um quarto e novos documentos são recusados (503) até a
+  pressão baixar.
+
+Depois de reduzir os caches, o GC roda e o malloc do glibc devolve ao sistema
+a memória livre (`malloc_trim`), que de outro modo continuaria no RSS.
+Footprints (cache KV estimado do backend, caches de documentos, documentos em
+processamento) e as decisões tomadas ficam em `stats()`, servido em
+/admin/memory.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import gc
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional
+
+from ..core.config import Settings, settings
+
+logger = logging.getLogger(__name__)
+
+NORMAL = "normal"
+PRESSURE = "pressure"
+CRITICAL = "critical"
+
+# Fração mantida nos caches, lote e max_new_tokens em cada nível
+KEEP_FRACTION = {NORMAL: 1.0, PRESSURE: 0.5, CRITICAL: 0.0}
+TOKENS_FRACTION = {NORMAL: 1.0, PRESSURE: 0.5, CRITICAL: 0.25}
+# Piso do max_new_tokens reduzido: respostas ainda legíveis
+MIN_NEW_TOKENS = 64
+
+# Limites de cgroup acima disso significam "sem limite" (cgroup v1 usa ~2^63)
+_UNLIMITED = 1 << 60
+
+
+class MemoryPressureError(RuntimeError):
+    """Trabalho recusado porque o processo está perto do limite de memória"""
+
+
+def process_rss() -> Optional[int]:
+    """RSS atual do processo em bytes (None fora do Linux)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@dataclass(frozen=True)
+class CgroupMemory:
+    """Limite e uso de memória do cgroup do contêiner (o que o OOM killer compara)"""
+
+    limit: int
+    usage_path: str
+    stat_path: str
+    # Cache de arquivos inativo: recuperável pelo kernel, não conta como pressão
+    inactive_file_key: str
+
+    def usage(self) -> Optional[int]:
+        """Uso de todos os processos do contêiner, sem o cache de arquivos inativo"""
+        try:
+            with open(self.usage_path) as f:
+                usage = int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+        try:
+            with open(self.stat_path) as f:
+                for line in f:
+                    key, _, value = line.partition(" ")
+                    if key == self.inactive_file_key:
+                        return max(0, usage - int(value))
+        except (OSError, ValueError):
+            pass
+        return usage
+
+
+# (limite, uso, estatísticas, chave do cache inativo) no cgroup v2 e no v1
+_CGROUP_FILES = [
+    ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current", "/sys/fs/cgroup/memory.stat", "inactive_file"),
+    (
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+        "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+        "/sys/fs/cgroup/memory/memory.stat",
+        "total_inactive_file",
+    ),
+]
+
+
+def cgroup_memory() -> Optional[CgroupMemory]:
+    """Memória do cgroup (v2 ou v1), se ele tiver limite"""
+    for limit_path, usage_path, stat_path, inactive_file_key in _CGROUP_FILES:
+        try:
+            with open(limit_path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value != "max" and int(value) < _UNLIMITED:
+            return CgroupMemory(int(value), usage_path, stat_path, inactive_file_key)
+    return None
+
+
+def physical_memory() -> Optional[int]:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def malloc_trim() -> bool:
+    """Devolve ao sistema as páginas livres do heap do glibc"""
+    try:
+        return bool(ctypes.CDLL(ctypes.util.find_library("c")).malloc_trim(0))
+    except (OSError, AttributeError, TypeError):
+        # Outra libc (musl, macOS): sem malloc_trim
+        return False
+
+
+def lru_nbytes(cache: "OrderedDict[str, str]") -> int:
+    """Tamanho aproximado de um cache LRU de strings"""
+    return sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in list(cache.items()))
+
+
+def shrink_lru(cache: OrderedDict, keep: float) -> int:
+    """Descarta os itens menos usados, mantendo a fração `keep`; devolve quantos saíram"""
+    target = int(len(cache) * keep)
+    removed = 0
+    while len(cache) > target:
+        cache.popitem(last=False)
+        removed += 1
+    return removed
+
+
+@dataclass
+class TrackedCache:
+    # Bytes ocupados agora
+    nbytes: Callable[[], int]
+    # Reduz à fração indicada e devolve o número de itens descartados (None: só observado)
+    shrink: Optional[Callable[[float], int]] = None
+
+
+class MemoryGovernor:
+    """
+    Observa o uso de memória e decide o nível de degradação.
+
+    `check()` é síncrono e barato (uma leitura de /proc ou do cgroup); `watch()` o chama
+    periodicamente no event loop. Os serviços consultam `max_new_tokens`,
+    `batch_size` e `admit_document` (no event loop) antes de cada trabalho.
+    """
+
+    def __init__(
+        self,
+        limit_bytes: Optional[int],
+        pressure_ratio: float = 0.75,
+        critical_ratio: float = 0.9,
+        check_seconds: float = 1.0,
+        usage: Callable[[], Optional[int]] = process_rss,
+        usage_source: str = "process_rss"
+    ):
+        self.limit_bytes = limit_bytes
+        self.pressure_ratio = pressure_ratio
+        self.critical_ratio = critical_ratio
+        self.check_seconds = check_seconds
+        # Medida comparada com o limite: RSS do processo ou uso do cgroup
+        self._usage = usage
+        self.usage_source = usage_source
+        self.usage_bytes: Optional[int] = None
+        self.level = NORMAL
+        self.caches: Dict[str, TrackedCache] = {}
+        # Bytes de trabalhos em andamento (ex.: documentos sendo processados)
+        self._in_flight: Dict[str, int] = {}
+        self._reclaim_pending = False
+        self.counters = {
+            "level_changes": 0,
+            "cache_shrinks": 0,
+            "cache_items_dropped": 0,
+            "degraded_generations": 0,
+            "documents_shed": 0,
+        }
+        self.last_decision: Optional[dict] = None
+
+    @classmethod
+    def from_settings(cls, config: Settings) -> "MemoryGovernor":
+        limit, usage, source = None, process_rss, "process_rss"
+        if config.memory_limit_mb:
+            limit = config.memory_limit_mb * 1024 * 1024
+        else:
+            cgroup = cgroup_memory()
+            if cgroup is not None:
+                limit, usage, source = cgroup.limit, cgroup.usage, "cgroup"
+            else:
+                limit = physical_memory()
+        return cls(
+            limit_bytes=limit if config.memory_governor_enabled else None,
+            pressure_ratio=config.memory_pressure_ratio,
+            critical_ratio=config.memory_critical_ratio,
+            check_seconds=config.memory_check_seconds,
+            usage=usage,
+            usage_source=source,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit_bytes is not None
+
+    def register(self, name: str, nbytes: Callable[[], int], shrink: Optional[Callable[[float], int]] = None):
+        self.caches[name] = TrackedCache(nbytes, shrink)
+
+    def register_lru(self, name: str, cache: OrderedDict):
+        """Atalho para caches OrderedDict de strings com despejo LRU"""
+        self.register(name, lambda: lru_nbytes(cache), lambda keep: shrink_lru(cache, keep))
+
+    @contextmanager
+    def track(self, name: str, nbytes: int) -> Iterator[None]:
+        """Contabiliza `nbytes` em `name` enquanto o bloco executa"""
+        self._in_flight[name] = self._in_flight.get(name, 0) + nbytes
+        try:
+            yield
+        finally:
+            self._in_flight[name] -= nbytes
+
+    def _level_for(self, usage: Optional[int]) -> str:
+        if usage is None or not self.limit_bytes:
+            return NORMAL
+        ratio = usage / self.limit_bytes
+        if ratio >= self.critical_ratio:
+            return CRITICAL
+        if ratio >= self.pressure_ratio:
+            return PRESSURE
+        return NORMAL
+
+    def check(self) -> str:
+        """
+        Mede o uso, atualiza o nível e, sob pressão, reduz os caches. Roda no
+        event loop, como os serviços donos dos caches: nenhum cache é alterado
+        por duas threads ao mesmo tempo.
+        """
+        if not self.enabled:
+            return NORMAL
+        self.usage_bytes = self._usage()
+        level = self._level_for(self.usage_bytes)
+        previous, self.level = self.level, level
+        if level != previous:
+            self.counters["level_changes"] += 1
+            self._decide("level_changed", previous=previous, level=level)
+        if level != NORMAL:
+            dropped = self._shrink_caches(KEEP_FRACTION[level])
+            if dropped:
+                self._reclaim_pending = True
+                self._decide("caches_shrunk", level=level, items=dropped)
+        return level
+
+    def reclaim(self) -> bool:
+        """
+        GC e malloc_trim depois de reduzir os caches; sem isso a memória liberada
+        continua no RSS. Pode demorar: chamado fora do event loop por `watch`.
+        """
+        if not self._reclaim_pending:
+            return False
+        self._reclaim_pending = False
+        gc.collect()
+        trimmed = malloc_trim()
+        self.usage_bytes = self._usage()
+        logger.info("Memory reclaimed", extra={"usage": self.usage_bytes, "trimmed": trimmed})
+        return True
+
+    def _shrink_caches(self, keep: float) -> Dict[str, int]:
+        dropped = {}
+        for name, cache in self.caches.items():
+            if cache.shrink is None:
+                continue
+            try:
+                removed = cache.shrink(keep)
+            except Exception:
+                logger.exception("Cache shrink failed", extra={"cache": name})
+                continue
+            if removed:
+                dropped[name] = removed
+        if dropped:
+            self.counters["cache_shrinks"] += 1
+            self.counters["cache_items_dropped"] += sum(dropped.values())
+        return dropped
+
+    def _decide(self, decision: str, **details):
+        self.last_decision = {"decision": decision, "at": time.time(), "usage": self.usage_bytes, **details}
+        log = logger.warning if details.get("level", NORMAL) != NORMAL else logger.info
+        log("Memory governor decision", extra=self.last_decision)
+
+    def max_new_tokens(self, configured: int) -> Optional[int]:
+        """Limite de tokens da próxima geração; None quando não há degradação"""
+        fraction = TOKENS_FRACTION[self.level]
+        if fraction >= 1.0:
+            return None
+        self.counters["degraded_generations"] += 1
+        return max(min(MIN_NEW_TOKENS, configured), int(configured * fraction))
+
+    def batch_size(self, configured: int) -> int:
+        """Tamanho efetivo do lote: cada sequência do lote tem seu próprio cache KV"""
+        return max(1, int(configured * KEEP_FRACTION[self.level]))
+
+    def admit_document(self):
+        """Recusa (MemoryPressureError) novos documentos quando a memória está no nível crítico"""
+        if self.check() != CRITICAL:
+            return
+        self.counters["documents_shed"] += 1
+        self._decide("document_shed", level=CRITICAL)
+        raise MemoryPressureError(
+            "Servidor com pouca memória disponível para processar documentos. Tente novamente em instantes."
+        )
+
+    async def watch(self):
+        """Verificação periódica (tarefa do lifespan da API)"""
+        while True:
+            try:
+                if self.check() != NORMAL:
+                    await asyncio.to_thread(self.reclaim)
+            except Exception:
+                logger.exception("Memory check failed")
+            await asyncio.sleep(self.check_seconds)
+
+    def stats(self) -> dict:
+        footprints = {}
+        for name, cache in self.caches.items():
+            try:
+                footprints[name] = cache.nbytes()
+            except Exception:
+                footprints[name] = None
+        footprints.update(self._in_flight)
+        return {
+            "enabled": self.enabled,
+            "level": self.level,
+            "usage_bytes": self.usage_bytes,
+            "usage_source": self.usage_source,
+            "rss_bytes": process_rss(),
+            "limit_bytes": self.limit_bytes,
+            "pressure_bytes": int(self.limit_bytes * self.pressure_ratio) if self.limit_bytes else None,
+            "critical_bytes": int(self.limit_bytes * self.critical_ratio) if self.limit_bytes else None,
+            "footprints": footprints,
+            "document_map_batch_size": self.batch_size(settings.document_map_batch_size),
+            "max_new_tokens_fraction": TOKENS_FRACTION[self.level],
+            "accepting_documents": self.level != CRITICAL,
+            "counters": dict(self.counters),
+            "last_decision": self.last_decision,
+        }
+
+
+_governor: Optional[MemoryGovernor] = None
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """Governador do processo (um por worker, criado no primeiro uso)"""
+    global _governor
+    if _governor is None:
+        _governor = MemoryGovernor.from_settings(settings)
+    return _governor
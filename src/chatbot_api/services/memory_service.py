@@ -0,0 +1,143 @@
+"""
+Memória de conversa por resumo contínuo
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from ..database.database import AsyncSessionLocal
+from ..models.database import ConversationHistory, ConversationSummary
+from ..prompts.legal_prompts import CONVERSATION_SUMMARY_PROMPT
+from .backends import InferenceBackend
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationMemory:
+    """
+    Mantém um resumo por sessão das trocas mais antigas.
+
+    Após cada turno, um job em segundo plano incorpora ao resumo todas as
+    trocas exceto as `recent_turns` mais recentes. O prompt passa a usar o
+    resumo no lugar dessas trocas, então seu tamanho fica limitado mesmo em
+    sessões longas. Cada rodada incorpora no máximo `fold_turns` trocas, em
+    ordem; havendo mais pendentes (ex.: sessão anterior à memória), novas
+    rodadas seguem até alcançar as recentes.
+    """
+
+    def __init__(
+        self,
+        recent_turns: int = 3,
+        summary_max_tokens: int = 256,
+        message_chars: int = 1500,
+        fold_turns: int = 20
+    ):
+        self.recent_turns = recent_turns
+        self.fold_turns = max(1, fold_turns)
+        self.summary_max_tokens = summary_max_tokens
+        self.message_chars = message_chars
+        self._updating: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get_summary(self, session_id: str) -> Tuple[str, int]:
+        """Retorna (resumo, último id de conversa incorporado)"""
+        try:
+            async with AsyncSessionLocal() as db_session:
+                summary = await db_session.get(ConversationSummary, session_id)
+                if summary is None:
+                    return "", 0
+                return summary.summary, summary.last_conversation_id
+        except Exception:
+            logger.exception("Error retrieving conversation summary", extra={"session_id": session_id})
+            return "", 0
+
+    def schedule_update(self, session_id: str, llm: InferenceBackend):
+        """Agenda a atualização do resumo sem bloquear a resposta atual"""
+        # Uma atualização por sessão de cada vez; a próxima rodada pega o que faltar
+        if session_id in self._updating:
+            return
+
+        self._updating.add(session_id)
+        task = asyncio.create_task(self._update(session_id, llm))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _update(self, session_id: str, llm: InferenceBackend):
+        try:
+            while await self._fold_next(session_id, llm):
+                pass
+        except Exception:
+            logger.exception("Error updating conversation summary", extra={"session_id": session_id})
+        finally:
+            self._updating.discard(session_id)
+
+    async def _fold_next(self, session_id: str, llm: InferenceBackend) -> bool:
+        """Incorpora ao resumo a próxima leva de trocas; True se ainda restam trocas a incorporar"""
+        summary_text, last_id = await self.get_summary(session_id)
+
+        # As fold_turns trocas seguintes ao resumo, mais as recent_turns que ficam de fora
+        limit = self.fold_turns + self.recent_turns
+        async with AsyncSessionLocal() as db_session:
+            result = await db_session.execute(
+                select(ConversationHistory)
+                .where(
+                    ConversationHistory.session_id == session_id,
+                    ConversationHistory.id > last_id
+                )
+                .order_by(ConversationHistory.id.asc())
+                .limit(limit)
+            )
+            pending = result.scalars().all()
+
+        # Manter as trocas recentes como texto bruto (com a página cheia,
+        # as recent_turns últimas dela ainda antecedem as mais recentes da sessão)
+        to_fold = pending[:-self.recent_turns] if self.recent_turns else pending
+        if not to_fold:
+            return False
+
+        prompt = CONVERSATION_SUMMARY_PROMPT.format(
+            summary=summary_text or "(nenhum)",
+            turns=self._format_turns(to_fold)
+        )
+        new_summary = await asyncio.to_thread(
+            llm.generate,
+            prompt,
+            self.summary_max_tokens
+        )
+        if not new_summary:
+            return False
+
+        async with AsyncSessionLocal() as db_session:
+            summary = await db_session.get(ConversationSummary, session_id)
+            if summary is None:
+                summary = ConversationSummary(session_id=session_id)
+                db_session.add(summary)
+            summary.summary = new_summary
+            summary.last_conversation_id = to_fold[-1].id
+            summary.updated_at = datetime.utcnow()
+            await db_session.commit()
+
+        return len(pending) == limit
+
+    def _format_turns(self, conversations: List[ConversationHistory]) -> str:
+        lines = []
+        for conv in conversations:
+            user_message = self._truncate(conv.user_message)
+            if conv.is_document:
+                lines.append(f"Usuário enviou o documento {conv.document_filename}: {user_message}")
+            elif user_message:
+                lines.append(f"Usuário: {user_message}")
+            if conv.bot_response:
+                lines.append(f"Nino: {self._truncate(conv.bot_response)}")
+        return "\n".join(lines)
+
+    def _truncate(self, text: Optional[str]) -> str:
+        if not text:
+            return ""
+        if len(text) > self.message_chars:
+            return text[:self.message_chars] + "..."
+        return text
@@ -0,0 +1,138 @@
+"""
+OCR de páginas escaneadas (sem camada de texto) em um pool de processos
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import io
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+
+def _ocr_page(page_pdf: bytes, language: str, dpi: int) -> Tuple[str, float]:
+    """Renderiza uma página (PDF de página única) e executa o OCR; roda no pool"""
+    import pypdfium2 as pdfium
+    import pytesseract
+
+    start = time.perf_counter()
+    document = pdfium.PdfDocument(page_pdf)
+    try:
+        image = document[0].render(scale=dpi / 72).to_pil()
+        text = pytesseract.image_to_string(image, lang=language)
+    finally:
+        document.close()
+    return text, time.perf_counter() - start
+
+
+class OCRService:
+    """
+    Executa OCR apenas nas páginas sem texto, em um pool de processos limitado,
+    sem bloquear o event loop. Resultados ficam em cache pelo hash da página.
+    """
+
+    def __init__(self, workers: int = 2, language: str = "por", dpi: int = 200, cache_size: int = 256):
+        self.workers = max(1, workers)
+        self.language = language
+        self.dpi = dpi
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Limita as páginas em processamento/enfileiradas, entre todos os uploads
+        self._slots = asyncio.Semaphore(self.workers * 2)
+
+    @staticmethod
+    def is_available() -> bool:
+        """OCR requer os extras opcionais pypdfium2 e pytesseract (e o binário tesseract)"""
+        return all(importlib.util.find_spec(name) is not None for name in ("pypdfium2", "pytesseract"))
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: o processo da API pode ter threads e o modelo carregado
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Descarta um pool quebrado; o próximo `_get_pool` cria outro"""
+        # Páginas concorrentes veem o mesmo pool quebrar: só a primeira o troca
+        if self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def ocr_pages(self, pdf_reader: "PyPDF2.PdfReader", page_numbers: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Executa OCR nas páginas indicadas (numeração a partir de 1)
+
+        Returns:
+            Dict página -> {"text", "seconds", "cached", "error"}
+        """
+        # Separar cada página em um PDF próprio (também usado como chave de cache)
+        page_pdfs = await asyncio.to_thread(self._split_pages, pdf_reader, page_numbers)
+
+        results = await asyncio.gather(*(
+            self._ocr_one(page_number, page_pdf) for page_number, page_pdf in zip(page_numbers, page_pdfs)
+        ))
+        return dict(zip(page_numbers, results))
+
+    async def _ocr_one(self, page_number: int, page_pdf: bytes) -> Dict[str, Any]:
+        key = hashlib.sha256(page_pdf).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return {"text": cached, "seconds": 0.0, "cached": True, "error": None}
+
+        async with self._slots:
+            loop = asyncio.get_event_loop()
+            # Um worker morto (OOM, falha do tesseract) quebra o pool inteiro:
+            # recriá-lo e tentar a página mais uma vez
+            for attempt in range(2):
+                pool = self._get_pool()
+                try:
+                    text, seconds = await loop.run_in_executor(pool, _ocr_page, page_pdf, self.language, self.dpi)
+                    break
+                except BrokenProcessPool as e:
+                    self._discard_pool(pool)
+                    if attempt == 0:
+                        logger.warning("OCR pool broken, restarting", extra={"page": page_number})
+                        continue
+                    error = e
+                except Exception as e:
+                    error = e
+                logger.warning("OCR error", extra={"page": page_number, "error": str(error)})
+                return {"text": "", "seconds": 0.0, "cached": False, "error": str(error)}
+
+        self._cache[key] = text
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return {"text": text, "seconds": round(seconds, 3), "cached": False, "error": None}
+
+    @staticmethod
+    def _split_pages(pdf_reader: "PyPDF2.PdfReader", page_numbers: List[int]) -> List[bytes]:
+        import PyPDF2
+
+        page_pdfs = []
+        for page_number in page_numbers:
+            writer = PyPDF2.PdfWriter()
+            writer.add_page(pdf_reader.pages[page_number - 1])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            page_pdfs.append(buffer.getvalue())
+        return page_pdfs
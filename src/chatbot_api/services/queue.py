@@ -0,0 +1,335 @@
+"""
+Fila de jobs de geração entre a API e os workers de inferência
+
+Com INFERENCE_BACKEND=queue, a API não carrega o modelo: cada geração vira
+um job na fila, consumido por workers de inferência em outros processos ou
+máquinas (services/inference_worker.py). O worker publica de volta os
+eventos do job, lidos pela API em ordem:
+
+    {"type": "token", "text": ...}      trecho gerado
+    {"type": "restart"}                 o job foi reentregue: descartar os trechos anteriores
+    {"type": "done", "text": ..., "truncated": ...} (ou "texts" para lotes)
+    {"type": "error", "kind": ..., "message": ...}
+
+RedisJobQueue usa um Redis stream com consumer group:
+- entrega pelo menos uma vez: o job só é confirmado (XACK) depois que o
+  resultado foi publicado; o job de um worker que parou de enviar
+  heartbeats é reassumido por outro (XAUTOCLAIM) após `visibility_timeout`;
+- o heartbeat registra o worker como vivo (chave com TTL) e renova a posse
+  do job em andamento (XCLAIM), para que gerações longas não sejam reassumidas;
+- os eventos de cada job vão para um stream próprio, lido com XREAD.
+
+LocalJobQueue implementa a mesma interface em memória, para um único
+processo (desenvolvimento e testes).
+"""
+
+import json
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from ..core.config import Settings, settings as default_settings
+
+# Eventos que encerram um job
+TERMINAL_EVENTS = frozenset({"done", "error"})
+
+
+@dataclass
+class Job:
+    id: str
+    payload: dict
+    # Quantas vezes o job foi entregue a um worker (> 1: reentrega)
+    deliveries: int = 1
+    # Identificador da entrega na fila (no Redis, o id da mensagem no stream)
+    receipt: str = ""
+
+
+class JobQueue(ABC):
+    """Interface da fila: `submit`/`read_events`/`cancel` na API, o restante nos workers"""
+
+    def __init__(self, visibility_timeout: float = 60.0, heartbeat_ttl: float = 15.0, events_ttl: float = 600.0):
+        self.visibility_timeout = visibility_timeout
+        self.heartbeat_ttl = heartbeat_ttl
+        self.events_ttl = events_ttl
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    # API
+
+    @abstractmethod
+    def submit(self, payload: dict) -> str:
+        """Enfileira um job e devolve seu id"""
+
+    @abstractmethod
+    def read_events(self, job_id: str, cursor: str = "0", block: float = 1.0) -> Tuple[List[dict], str]:
+        """Eventos publicados após `cursor` (espera até `block` segundos); devolve o novo cursor"""
+
+    @abstractmethod
+    def cancel(self, job_id: str):
+        """Pede ao worker que interrompa o job (a resposta parcial é publicada)"""
+
+    @abstractmethod
+    def forget(self, job_id: str):
+        """
+        Descarta os eventos de um job já lido. O pedido de cancelamento fica:
+        o worker ainda precisa vê-lo; ele é apagado no `ack` (ou expira)
+        """
+
+    # Workers
+
+    @abstractmethod
+    def claim(self, consumer: str, block: float = 1.0) -> Optional[Job]:
+        """Próximo job para o worker: primeiro os abandonados por workers mortos, depois os novos"""
+
+    @abstractmethod
+    def publish(self, job_id: str, event: dict):
+        """Publica um evento do job para a API"""
+
+    @abstractmethod
+    def ack(self, job: Job):
+        """Confirma o job (depois de publicar o resultado): ele não será reentregue"""
+
+    @abstractmethod
+    def is_cancelled(self, job_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def heartbeat(self, consumer: str, job: Optional[Job] = None, info: Optional[dict] = None):
+        """Marca o worker como vivo e renova a posse do job em andamento"""
+
+    @abstractmethod
+    def workers(self) -> Dict[str, dict]:
+        """Workers com heartbeat recente (consumer -> informações do último heartbeat)"""
+
+
+class LocalJobQueue(JobQueue):
+    """Fila em memória com a mesma semântica da RedisJobQueue (um único processo)"""
+
+    def __init__(self, visibility_timeout: float = 60.0, heartbeat_ttl: float = 15.0, events_ttl: float = 600.0):
+        super().__init__(visibility_timeout, heartbeat_ttl, events_ttl)
+        self._condition = threading.Condition()
+        self._pending: Deque[Job] = deque()
+        # receipt -> (job, consumer, fim da posse em time.monotonic())
+        self._inflight: Dict[str, Tuple[Job, str, float]] = {}
+        self._events: Dict[str, List[dict]] = {}
+        self._cancelled: Set[str] = set()
+        self._workers: Dict[str, Tuple[float, dict]] = {}
+
+    def submit(self, payload: dict) -> str:
+        job_id = self.new_job_id()
+        with self._condition:
+            self._pending.append(Job(job_id, payload, deliveries=0, receipt=job_id))
+            self._condition.notify_all()
+        return job_id
+
+    def read_events(self, job_id: str, cursor: str = "0", block: float = 1.0) -> Tuple[List[dict], str]:
+        start = int(cursor)
+        deadline = time.monotonic() + block
+        with self._condition:
+            while len(self._events.get(job_id, [])) <= start:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], cursor
+                self._condition.wait(remaining)
+            events = self._events[job_id][start:]
+        return events, str(start + len(events))
+
+    def cancel(self, job_id: str):
+        with self._condition:
+            self._cancelled.add(job_id)
+
+    def forget(self, job_id: str):
+        with self._condition:
+            self._events.pop(job_id, None)
+
+    def claim(self, consumer: str, block: float = 1.0) -> Optional[Job]:
+        deadline = time.monotonic() + block
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                job = self._reclaim(now) or (self._pending.popleft() if self._pending else None)
+                if job is not None:
+                    job.deliveries += 1
+                    self._inflight[job.receipt] = (job, consumer, now + self.visibility_timeout)
+                    return job
+                if now >= deadline:
+                    return None
+                # Acordar também quando a posse de algum job expirar
+                expiries = [lease for _, _, lease in self._inflight.values()]
+                self._condition.wait(min([deadline, *expiries]) - now)
+
+    def _reclaim(self, now: float) -> Optional[Job]:
+        for receipt, (job, _, lease) in self._inflight.items():
+            if lease <= now:
+                del self._inflight[receipt]
+                return job
+        return None
+
+    def publish(self, job_id: str, event: dict):
+        with self._condition:
+            self._events.setdefault(job_id, []).append(event)
+            self._condition.notify_all()
+
+    def ack(self, job: Job):
+        with self._condition:
+            self._inflight.pop(job.receipt, None)
+            self._cancelled.discard(job.id)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._condition:
+            return job_id in self._cancelled
+
+    def heartbeat(self, consumer: str, job: Optional[Job] = None, info: Optional[dict] = None):
+        now = time.monotonic()
+        with self._condition:
+            self._workers[consumer] = (now + self.heartbeat_ttl, {"job_id": job.id if job else None, **(info or {})})
+            if job is not None and job.receipt in self._inflight:
+                self._inflight[job.receipt] = (job, consumer, now + self.visibility_timeout)
+
+    def workers(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        with self._condition:
+            return {consumer: info for consumer, (expires, info) in self._workers.items() if expires > now}
+
+
+class RedisJobQueue(JobQueue):
+    """Fila sobre um Redis stream com consumer group (ver docstring do módulo)"""
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "nino",
+        group: str = "inference",
+        visibility_timeout: float = 60.0,
+        heartbeat_ttl: float = 15.0,
+        events_ttl: float = 600.0,
+    ):
+        super().__init__(visibility_timeout, heartbeat_ttl, events_ttl)
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self._response_error = redis.ResponseError
+        self.prefix = prefix
+        self.group = group
+        self.stream = f"{prefix}:jobs"
+        self._group_ready = False
+
+    def _events_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}:events"
+
+    def _cancel_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}:cancel"
+
+    def _worker_key(self, consumer: str) -> str:
+        return f"{self.prefix}:worker:{consumer}"
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except self._response_error as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def submit(self, payload: dict) -> str:
+        job_id = self.new_job_id()
+        # Sem MAXLEN: aparar o stream poderia descartar jobs ainda não confirmados
+        self.redis.xadd(self.stream, {"job_id": job_id, "payload": json.dumps(payload, ensure_ascii=False)})
+        return job_id
+
+    def read_events(self, job_id: str, cursor: str = "0", block: float = 1.0) -> Tuple[List[dict], str]:
+        result = self.redis.xread({self._events_key(job_id): cursor}, block=max(1, int(block * 1000)))
+        events = []
+        for _, messages in result or []:
+            for message_id, fields in messages:
+                events.append(json.loads(fields["event"]))
+                cursor = message_id
+        return events, cursor
+
+    def cancel(self, job_id: str):
+        self.redis.set(self._cancel_key(job_id), 1, ex=int(self.events_ttl))
+
+    def forget(self, job_id: str):
+        self.redis.delete(self._events_key(job_id))
+
+    def claim(self, consumer: str, block: float = 1.0) -> Optional[Job]:
+        self._ensure_group()
+
+        # Jobs de workers que pararam de enviar heartbeat
+        _, messages, *_ = self.redis.xautoclaim(
+            self.stream, self.group, consumer,
+            min_idle_time=int(self.visibility_timeout * 1000),
+            count=1
+        )
+        messages = [(message_id, fields) for message_id, fields in messages if fields]
+        if not messages:
+            result = self.redis.xreadgroup(
+                self.group, consumer, {self.stream: ">"},
+                count=1, block=max(1, int(block * 1000))
+            )
+            if not result:
+                return None
+            messages = result[0][1]
+
+        message_id, fields = messages[0]
+        pending = self.redis.xpending_range(self.stream, self.group, message_id, message_id, 1)
+        deliveries = pending[0]["times_delivered"] if pending else 1
+        return Job(fields["job_id"], json.loads(fields["payload"]), deliveries, message_id)
+
+    def publish(self, job_id: str, event: dict):
+        key = self._events_key(job_id)
+        pipeline = self.redis.pipeline()
+        pipeline.xadd(key, {"event": json.dumps(event, ensure_ascii=False)})
+        pipeline.expire(key, int(self.events_ttl))
+        pipeline.execute()
+
+    def ack(self, job: Job):
+        pipeline = self.redis.pipeline()
+        pipeline.xack(self.stream, self.group, job.receipt)
+        pipeline.xdel(self.stream, job.receipt)
+        pipeline.delete(self._cancel_key(job.id))
+        pipeline.execute()
+
+    def is_cancelled(self, job_id: str) -> bool:
+        return bool(self.redis.exists(self._cancel_key(job_id)))
+
+    def heartbeat(self, consumer: str, job: Optional[Job] = None, info: Optional[dict] = None):
+        state = {"job_id": job.id if job else None, "at": time.time(), **(info or {})}
+        pipeline = self.redis.pipeline()
+        pipeline.set(self._worker_key(consumer), json.dumps(state), px=int(self.heartbeat_ttl * 1000))
+        if job is not None:
+            # Reivindicar o próprio job zera o tempo ocioso sem contar nova entrega
+            pipeline.xclaim(self.stream, self.group, consumer, 0, [job.receipt], justid=True)
+        pipeline.execute()
+
+    def workers(self) -> Dict[str, dict]:
+        keys = list(self.redis.scan_iter(match=self._worker_key("*")))
+        if not keys:
+            return {}
+        prefix = len(self._worker_key(""))
+        return {
+            key[prefix:]: json.loads(value)
+            for key, value in zip(keys, self.redis.mget(keys))
+            if value is not None
+        }
+
+
+def create_job_queue(config: Optional[Settings] = None) -> JobQueue:
+    """Fila configurada em Settings (Redis em REDIS_URL)"""
+    config = config or default_settings
+    return RedisJobQueue(
+        url=config.redis_url,
+        prefix=config.queue_prefix,
+        group=config.queue_group,
+        visibility_timeout=config.queue_visibility_timeout_seconds,
+        heartbeat_ttl=config.queue_heartbeat_seconds * 3,
+        events_ttl=config.queue_events_ttl_seconds,
+    )
@@ -0,0 +1,32 @@
+"""
+Banco SQLite descartável para os testes (DB_CREATE_ALL, com a tabela FTS5 da
+busca). As variáveis são definidas antes de qualquer import da aplicação.
+"""
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="nino-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["DB_CREATE_ALL"] = "true"
+
+
+@pytest.fixture
+def database():
+    """Schema criado e tabelas vazias a cada teste"""
+    from sqlalchemy import delete
+
+    from chatbot_api.database.database import AsyncSessionLocal, init_db
+    from chatbot_api.models.database import Base
+
+    async def reset():
+        await init_db()
+        async with AsyncSessionLocal() as db_session:
+            for table in reversed(Base.metadata.sorted_tables):
+                await db_session.execute(delete(table))
+            await db_session.commit()
+
+    asyncio.run(reset())
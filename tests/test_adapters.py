@@ -0,0 +1,152 @@
+"""
+AdapterManager com um Llama minúsculo de pesos aleatórios e adaptadores LoRA
+criados na hora (sem download)
+"""
+
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+peft = pytest.importorskip("peft")
+
+from transformers import LlamaConfig, LlamaForCausalLM  # noqa: E402
+
+from chatbot_api.services.backends.adapters import AdapterManager  # noqa: E402
+from chatbot_api.services.backends.base import AdapterError  # noqa: E402
+
+INPUT_IDS = torch.tensor([[1, 5, 9, 14, 3]])
+
+
+def tiny_llama() -> LlamaForCausalLM:
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=64,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=64,
+    )
+    return LlamaForCausalLM(config).eval()
+
+
+@pytest.fixture(scope="module")
+def adapter_paths(tmp_path_factory):
+    """Dois adaptadores LoRA com pesos aleatórios diferentes (init_lora_weights=False)"""
+    paths = {}
+    for seed, name in enumerate(["contratos", "trabalhista"], start=1):
+        base = tiny_llama()
+        torch.manual_seed(seed)
+        config = peft.LoraConfig(r=4, lora_alpha=8, target_modules=["q_proj", "v_proj"], init_lora_weights=False)
+        model = peft.get_peft_model(base, config)
+        path = tmp_path_factory.mktemp(name)
+        model.save_pretrained(path)
+        paths[name] = str(path)
+    return paths
+
+
+def logits(manager: AdapterManager, name=None) -> torch.Tensor:
+    with manager.use(name) as model, torch.inference_mode():
+        return model(input_ids=INPUT_IDS).logits
+
+
+@pytest.fixture
+def manager():
+    return AdapterManager(tiny_llama())
+
+
+def test_without_adapters_uses_base_model(manager):
+    assert not manager.has_adapters
+    with manager.use(None) as model:
+        assert model is manager.base_model
+    with pytest.raises(AdapterError):
+        with manager.use("contratos"):
+            pass
+
+
+def test_load_switch_and_unload(manager, adapter_paths):
+    base = logits(manager)
+
+    manager.load("contratos", adapter_paths["contratos"])
+    manager.load("trabalhista", adapter_paths["trabalhista"])
+    assert manager.paths == adapter_paths
+
+    contratos = logits(manager, "contratos")
+    trabalhista = logits(manager, "trabalhista")
+    assert not torch.allclose(contratos, base)
+    assert not torch.allclose(trabalhista, base)
+    assert not torch.allclose(contratos, trabalhista)
+
+    # Sem adaptador: o modelo base, mesmo com adaptadores carregados
+    assert torch.allclose(logits(manager), base)
+    # Voltar a um adaptador reproduz a mesma saída
+    assert torch.allclose(logits(manager, "contratos"), contratos)
+
+    manager.unload("contratos")
+    with pytest.raises(AdapterError):
+        logits(manager, "contratos")
+    assert torch.allclose(logits(manager, "trabalhista"), trabalhista)
+
+    manager.unload("trabalhista")
+    assert not manager.has_adapters
+    assert manager.model is manager.base_model
+    assert torch.allclose(logits(manager), base)
+
+
+def test_invalid_adapter_path(manager, tmp_path):
+    with pytest.raises(AdapterError):
+        manager.load("inexistente", str(tmp_path / "inexistente"))
+    with pytest.raises(AdapterError):
+        manager.unload("inexistente")
+
+
+def test_generations_with_same_adapter_run_concurrently(manager, adapter_paths):
+    manager.load("contratos", adapter_paths["contratos"])
+    inside = threading.Barrier(2, timeout=5)
+
+    def generate():
+        with manager.use("contratos"):
+            # Só passa se as duas gerações estiverem dentro ao mesmo tempo
+            inside.wait()
+
+    threads = [threading.Thread(target=generate) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not inside.broken
+
+
+def test_switch_waits_for_running_generations(manager, adapter_paths):
+    manager.load("contratos", adapter_paths["contratos"])
+    manager.load("trabalhista", adapter_paths["trabalhista"])
+    entered = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def long_generation():
+        with manager.use("contratos"):
+            entered.set()
+            release.wait(5)
+            order.append("contratos")
+
+    def other_adapter():
+        with manager.use("trabalhista") as model:
+            order.append(model.active_adapter)
+
+    first = threading.Thread(target=long_generation)
+    first.start()
+    entered.wait(5)
+    second = threading.Thread(target=other_adapter)
+    second.start()
+    second.join(0.2)
+    # O outro adaptador não é ativado no meio da geração em curso
+    assert second.is_alive()
+
+    release.set()
+    first.join()
+    second.join()
+    assert order == ["contratos", "trabalhista"]
@@ -0,0 +1,67 @@
+"""
+Map-reduce de documentos longos: os resumos de todas as páginas chegam ao prompt final
+"""
+
+import asyncio
+
+import pytest
+
+from chatbot_api.core.config import settings
+from chatbot_api.services.backends.mock import MockBackend
+from chatbot_api.services.chatbot import ChatbotService
+from chatbot_api.services.document_service import DocumentService
+from chatbot_api.services.memory_governor import MemoryGovernor
+
+
+class SummaryBackend(MockBackend):
+    """Cada resumo tem ~900 caracteres, como um resumo de 256 tokens"""
+
+    def __init__(self):
+        super().__init__("mock", 256)
+        self.batches = 0
+
+    def generate_batch(self, prompts, max_new_tokens=None, generation=None):
+        self.batches += 1
+        return [self.generate(prompt, max_new_tokens) + " resumo" * 100 for prompt in prompts]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "history_selection", "recent")
+    monkeypatch.setattr(settings, "memory_enabled", False)
+    monkeypatch.setattr(settings, "document_chunk_chars", 2000)
+    return ChatbotService(SummaryBackend(), governor=MemoryGovernor(None))
+
+
+def long_document(pages: int) -> str:
+    return "\n\n".join(f"--- Página {page} ---\n" + f"Cláusula {page}. " * 150 for page in range(1, pages + 1))
+
+
+def test_reduce_keeps_every_page_within_prompt_limit(service, monkeypatch):
+    messages = []
+
+    async def generate_response(message, *args, **kwargs):
+        messages.append(message)
+        return "análise"
+
+    monkeypatch.setattr(service, "generate_response", generate_response)
+    text = long_document(120)
+    assert len(text) > 25 * DocumentService.MAX_CHAT_CHARS
+
+    assert asyncio.run(service.analyze_document(text, "contrato.pdf", "sessao")) == "análise"
+
+    (message,) = messages
+    # Nada cortado por format_document_for_chat, e a última página ainda está coberta
+    assert "texto truncado" not in message
+    assert "-120]" in message
+    # Mais de um nível de redução
+    assert service.llm.batches > len(DocumentService.chunk_pages(text, settings.document_chunk_chars)) / settings.document_map_batch_size
+
+
+def test_group_sections_respects_limit(service):
+    sections = [{"first_page": page, "last_page": page, "text": "x" * 900} for page in range(1, 21)]
+    groups = service._group_sections(sections, 4000)
+    assert [group["first_page"] for group in groups][0] == 1
+    assert groups[-1]["last_page"] == 20
+    assert all(len(group["text"]) <= 4000 for group in groups)
+    assert sum(group["text"].count("x" * 900) for group in groups) == 20
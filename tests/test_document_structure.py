@@ -0,0 +1,29 @@
+import re
+
+import pytest
+
+from chatbot_api.services.document_structure import DocumentStructure
+
+
+def legacy_clean(page_texts):
+    """Limpeza por regex sobre o texto inteiro, anterior ao DocumentStructure"""
+    text = "".join(f"\n--- Página {number} ---\n{page}\n" for number, page in enumerate(page_texts, start=1))
+    text = re.sub(r"\n\s*\n\s*\n", "\n\n", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+@pytest.mark.parametrize("page_texts", [
+    [" \na"],
+    ["a\n\n\n\nb", ""],
+    ["", "\n\n  CLÁUSULA 1ª\tObjeto  \n\n"],
+    ["a\xa0\xa0b\r\nc", "\t\n \n\nArt. 5º Texto"],
+])
+def test_text_matches_legacy_cleaning(page_texts):
+    assert DocumentStructure.from_pages(page_texts).text == legacy_clean(page_texts)
+
+
+def test_empty_page_stays_empty_for_ocr():
+    structure = DocumentStructure.from_pages(["a", " \n\n ", "b"])
+    assert structure.empty_pages() == [2]
+    assert structure.page_text(3) == "b"
@@ -0,0 +1,49 @@
+import asyncio
+import io
+
+import pytest
+
+from chatbot_api.services.idempotency import IdempotencyConflictError, IdempotencyStore
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = IdempotencyStore()
+
+    async def load(key, endpoint, fingerprint):
+        return None
+
+    async def save(key, endpoint, fingerprint, result):
+        pass
+
+    monkeypatch.setattr(store, "_load", load)
+    monkeypatch.setattr(store, "_save", save)
+    return store
+
+
+def test_in_flight_key_with_other_fingerprint_conflicts(store):
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return {"response": "ok"}
+
+        first = asyncio.ensure_future(store.run("k", "/chat", "a", slow))
+        await asyncio.sleep(0)
+        with pytest.raises(IdempotencyConflictError):
+            await store.run("k", "/chat", "b", slow)
+        same = asyncio.ensure_future(store.run("k", "/chat", "a", slow))
+        await asyncio.sleep(0)
+        release.set()
+        return await first, await same
+
+    (first, replayed_first), (same, replayed_same) = asyncio.run(scenario())
+    assert first == same == {"response": "ok"}
+    assert not replayed_first and replayed_same
+
+
+def test_file_digest_depends_on_content_and_rewinds():
+    a, b = io.BytesIO(b"%PDF-1.4 a"), io.BytesIO(b"%PDF-1.4 b")
+    assert IdempotencyStore.file_digest(a) != IdempotencyStore.file_digest(b)
+    assert a.tell() == 0
@@ -0,0 +1,32 @@
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "check_import_time.py"
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("check_import_time", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_api_import_does_not_load_heavy_modules():
+    check = load_script()
+    loaded = {name.split(".")[0] for name, _, _ in check.measure(check.MODULE)}
+    assert not loaded & set(check.FORBIDDEN)
+
+
+@pytest.mark.skipif(
+    "IMPORT_TIME_BUDGET_MS" not in os.environ,
+    reason="tempo de parede depende da máquina: defina IMPORT_TIME_BUDGET_MS para verificar o orçamento"
+)
+def test_api_import_within_budget():
+    check = load_script()
+    # Menor de três medições, como o script: uma execução lenta isolada não reprova
+    runs = [check.measure(check.MODULE) for _ in range(3)]
+    total_ms = min(check.total_us(run, check.MODULE) for run in runs) / 1000
+    assert total_ms <= check.BUDGET_MS
@@ -0,0 +1,31 @@
+import asyncio
+import logging
+
+from chatbot_api.core.log import ContextFilter, StructuredFormatter, request_id_var, start_request
+
+
+def record(**extra) -> logging.LogRecord:
+    entry = logging.LogRecord("test", logging.INFO, __file__, 1, "msg", (), None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+def test_request_id_reaches_worker_threads():
+    def emit():
+        entry = record()
+        ContextFilter().filter(entry)
+        return entry.request_id
+
+    async def scenario():
+        start_request("req-123")
+        return await asyncio.to_thread(emit)
+
+    assert asyncio.run(scenario()) == "req-123"
+    assert request_id_var.get() == "-"
+
+
+def test_filenames_are_redacted():
+    formatter = StructuredFormatter(fmt="text", redact_fields=True)
+    line = formatter.format(record(upload="contrato-joao-silva.pdf", document_filename="rg.pdf", session_id="s1"))
+    assert "joao" not in line and "rg.pdf" not in line
+    assert "session_id=s1" in line
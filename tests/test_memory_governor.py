@@ -0,0 +1,40 @@
+from chatbot_api.services import memory_governor
+from chatbot_api.services.memory_governor import CRITICAL, NORMAL, PRESSURE, CgroupMemory, MemoryGovernor
+
+
+def test_cgroup_usage_discounts_inactive_file_cache(tmp_path):
+    usage = tmp_path / "memory.current"
+    stat = tmp_path / "memory.stat"
+    usage.write_text("1000\n")
+    stat.write_text("anon 600\ninactive_file 300\nactive_file 100\n")
+    cgroup = CgroupMemory(2000, str(usage), str(stat), "inactive_file")
+    assert cgroup.usage() == 700
+
+
+def test_limit_from_cgroup_measures_whole_container(monkeypatch, tmp_path):
+    usage = tmp_path / "memory.current"
+    usage.write_text(str(950))
+    cgroup = CgroupMemory(1000, str(usage), str(tmp_path / "missing"), "inactive_file")
+    monkeypatch.setattr(memory_governor, "cgroup_memory", lambda: cgroup)
+    # RSS deste processo é ~1/N do uso do contêiner: não deve ser o medido
+    monkeypatch.setattr(memory_governor, "process_rss", lambda: 100)
+    monkeypatch.setattr(memory_governor.settings, "memory_limit_mb", None)
+    monkeypatch.setattr(memory_governor.settings, "memory_governor_enabled", True)
+
+    governor = MemoryGovernor.from_settings(memory_governor.settings)
+    assert governor.usage_source == "cgroup"
+    assert governor.check() == CRITICAL
+
+
+def test_explicit_limit_measures_process_rss(monkeypatch):
+    monkeypatch.setattr(memory_governor.settings, "memory_limit_mb", 1)
+    monkeypatch.setattr(memory_governor.settings, "memory_governor_enabled", True)
+    governor = MemoryGovernor.from_settings(memory_governor.settings)
+    assert governor.usage_source == "process_rss"
+    assert governor.limit_bytes == 1024 * 1024
+
+
+def test_levels_follow_usage():
+    samples = iter([100, 850, 990])
+    governor = MemoryGovernor(1000, 0.8, 0.95, 1.0, usage=lambda: next(samples))
+    assert [governor.check(), governor.check(), governor.check()] == [NORMAL, PRESSURE, CRITICAL]
@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+from chatbot_api.services import ocr_service
+from chatbot_api.services.ocr_service import OCRService
+
+
+def crash_first_call(page_pdf: bytes, language: str, dpi: int):
+    """Substitui _ocr_page: o primeiro worker morre (como num OOM), o seguinte responde"""
+    marker = page_pdf.decode("utf-8")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "texto reconhecido", 0.01
+
+
+def test_broken_pool_is_replaced_and_page_retried(monkeypatch, tmp_path):
+    monkeypatch.setattr(ocr_service, "_ocr_page", crash_first_call)
+    service = OCRService(workers=1)
+
+    async def scenario():
+        return await service._ocr_one(1, str(tmp_path / "crashed").encode("utf-8"))
+
+    try:
+        first_pool = service._get_pool()
+        result = asyncio.run(scenario())
+        assert result["error"] is None
+        assert result["text"] == "texto reconhecido"
+        assert service._pool is not first_pool
+    finally:
+        service.shutdown()
@@ -0,0 +1,25 @@
+from chatbot_api.services.backends.postprocess import ResponseFilter
+
+
+def feed_all(text: str, size: int = 5) -> ResponseFilter:
+    response_filter = ResponseFilter()
+    for start in range(0, len(text), size):
+        response_filter.feed(text[start:start + size])
+    response_filter.finish()
+    return response_filter
+
+
+def test_dot_leaders_are_not_a_loop():
+    for leader in (".", "=", "-"):
+        text = "1. Documento A " + leader * 40 + " p. 3"
+        response_filter = feed_all(text)
+        assert not response_filter.stopped
+        assert response_filter.output == text
+
+
+def test_repeated_sentence_stops():
+    sentence = "O prazo é de cinco dias úteis. "
+    text = "Resposta: " + sentence * 6
+    response_filter = feed_all(text)
+    assert response_filter.stopped and response_filter.reason == "repetition"
+    assert response_filter.output.count(sentence.strip()) < 6
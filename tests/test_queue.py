@@ -0,0 +1,150 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from chatbot_api.services.backends import AdapterError, GenerationControl
+from chatbot_api.services.backends.mock import MockBackend
+from chatbot_api.services.backends.queued import QueueBackend, QueueBackendError
+from chatbot_api.services.inference_worker import InferenceWorker
+from chatbot_api.services.queue import LocalJobQueue
+
+VISIBILITY_TIMEOUT = 0.3
+
+
+@pytest.fixture
+def queue():
+    return LocalJobQueue(visibility_timeout=VISIBILITY_TIMEOUT)
+
+
+@pytest.fixture
+def model():
+    return MockBackend("mock", 256)
+
+
+def backend_for(queue) -> QueueBackend:
+    return QueueBackend(queue, "mock", 256, timeout=5.0, poll_seconds=0.05)
+
+
+def worker_for(queue, model, max_deliveries: int = 3) -> InferenceWorker:
+    return InferenceWorker(queue, model, consumer="vivo", heartbeat_seconds=0.05, max_deliveries=max_deliveries)
+
+
+@contextmanager
+def running(worker):
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    try:
+        yield worker
+    finally:
+        worker.stop()
+        thread.join(5)
+
+
+def crash_then_run(queue, worker, text: str = ""):
+    """Um worker assume o próximo job, publica `text` e cai (sem heartbeat nem ack); `worker` assume depois"""
+    def target():
+        job = queue.claim("morto", block=5.0)
+        if text:
+            queue.publish(job.id, {"type": "token", "text": text})
+        worker.run()
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_generate_batch_and_stream(queue, model):
+    backend = backend_for(queue)
+    with running(worker_for(queue, model)):
+        assert backend.generate("oi") == model.generate("oi")
+        assert "".join(backend.stream("oi")) == model.generate("oi")
+        assert backend.generate_batch(["a", "b"]) == [model.generate("a"), model.generate("b")]
+
+
+def test_reclaimed_job_restarts(queue, model, monkeypatch):
+    published = []
+    publish = queue.publish
+    monkeypatch.setattr(queue, "publish", lambda job_id, event: (published.append(event), publish(job_id, event)))
+
+    worker = worker_for(queue, model)
+    thread = crash_then_run(queue, worker, "parcial")
+    try:
+        # Reassumido após VISIBILITY_TIMEOUT, sem heartbeats do primeiro worker
+        assert backend_for(queue).generate("oi") == model.generate("oi")
+    finally:
+        worker.stop()
+        thread.join(5)
+    assert [event["type"] for event in published[:2]] == ["token", "restart"]
+
+
+def test_generate_discards_tokens_before_restart(queue):
+    def redeliver():
+        job = queue.claim("morto", block=5.0)
+        queue.publish(job.id, {"type": "token", "text": "parcial"})
+        job = queue.claim("vivo", block=5.0)
+        assert job.deliveries == 2
+        queue.publish(job.id, {"type": "restart"})
+        queue.publish(job.id, {"type": "token", "text": "novo"})
+
+    thread = threading.Thread(target=redeliver, daemon=True)
+    thread.start()
+    # O prazo acaba antes do "done": a resposta parcial é só a da nova entrega
+    control = GenerationControl.with_timeout(VISIBILITY_TIMEOUT * 3)
+    assert backend_for(queue).generate("oi", control=control) == "novo"
+    assert control.truncated
+    thread.join(5)
+
+
+def test_restart_after_streamed_tokens_raises(queue, model):
+    worker = worker_for(queue, model)
+    thread = crash_then_run(queue, worker, "parcial")
+    pieces = []
+    try:
+        with pytest.raises(QueueBackendError):
+            for piece in backend_for(queue).stream("oi"):
+                pieces.append(piece)
+    finally:
+        worker.stop()
+        thread.join(5)
+    assert pieces == ["parcial"]
+
+
+def test_poison_job_is_reported_and_acked(queue, model):
+    worker = worker_for(queue, model, max_deliveries=1)
+    thread = crash_then_run(queue, worker)
+    try:
+        with pytest.raises(QueueBackendError, match="abandonado"):
+            backend_for(queue).generate("oi")
+    finally:
+        worker.stop()
+        thread.join(5)
+    # Confirmado: não volta a ser entregue depois do prazo de visibilidade
+    assert queue.claim("outro", block=VISIBILITY_TIMEOUT * 2) is None
+
+
+def test_cancel_reaches_worker(queue, model):
+    control = GenerationControl()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(backend_for(queue).generate("oi", control=control)))
+    thread.start()
+    job = queue.claim("vivo", block=5.0)
+    control.cancel()
+    thread.join(5)
+    assert result == [""]
+    assert queue.is_cancelled(job.id)
+
+    worker_for(queue, model).process(job)
+    events, _ = queue.read_events(job.id, block=0)
+    assert events == [{"type": "done", "text": "", "truncated": True}]
+    # O ack apaga o pedido de cancelamento
+    assert not queue.is_cancelled(job.id)
+
+
+def test_adapter_error_is_raised_by_api(queue, model):
+    backend = backend_for(queue)
+    with running(worker_for(queue, model)):
+        with pytest.raises(AdapterError):
+            backend.generate("oi", adapter="contratos")
+        model.load_adapter("contratos", "/adapters/contratos")
+        assert "Nino/contratos" in backend.generate("oi", adapter="contratos")
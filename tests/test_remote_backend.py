@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from chatbot_api.services.backends import AdapterError, GenerationControl
+from chatbot_api.services.backends.remote import RemoteBackend, RemoteBackendError
+
+TOKENS = ["Olá", ",", " tudo", " bem", "?"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Servidor compatível com /v1/completions (JSON e SSE) e a API de LoRA do vLLM"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, payload))
+
+        if self.path == "/v1/load_lora_adapter":
+            self._reply(400 if payload["lora_path"] == "/inexistente" else 200, {})
+        elif self.path == "/v1/unload_lora_adapter":
+            self._reply(200, {})
+        elif payload["stream"]:
+            self._stream(payload)
+        else:
+            time.sleep(self.server.delay)
+            prompts = payload["prompt"]
+            # Fora de ordem: o cliente ordena por "index"
+            choices = [{"index": index, "text": f" eco: {prompt} "} for index, prompt in enumerate(prompts)]
+            self._reply(200, {"choices": choices[::-1]})
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, payload: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for token in TOKENS[:payload["max_tokens"]]:
+                time.sleep(self.server.delay)
+                self.wfile.write(f"data: {json.dumps({'choices': [{'index': 0, 'text': token}]})}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    httpd.requests = []
+    httpd.delay = 0.0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def backend_for(server, timeout: float = 5.0) -> RemoteBackend:
+    return RemoteBackend(f"http://127.0.0.1:{server.server_port}/", "jurema-7b", max_new_tokens=16, timeout=timeout)
+
+
+def test_generate_and_batch(server):
+    backend = backend_for(server)
+    assert backend.generate("oi") == "eco: oi"
+    assert backend.generate_batch(["a", "b", "c"]) == ["eco: a", "eco: b", "eco: c"]
+
+    path, payload = server.requests[0]
+    assert path == "/v1/completions"
+    assert payload["model"] == "jurema-7b"
+    assert payload["max_tokens"] == 16
+    assert payload["cache_prompt"] is True and payload["stream"] is False
+
+
+def test_stream_and_interruptible_generate(server):
+    backend = backend_for(server)
+    assert list(backend.stream("oi", max_new_tokens=3)) == ["Olá", ",", " tudo"]
+    # Com controle, generate usa o streaming
+    assert backend.generate("oi", control=GenerationControl.with_timeout(5)) == "Olá, tudo bem?"
+    assert server.requests[-1][1]["stream"] is True
+
+
+def test_deadline_truncates_generation(server):
+    server.delay = 0.4
+    control = GenerationControl.with_timeout(0.6)
+    text = backend_for(server).generate("oi", control=control)
+    assert text and text != "Olá, tudo bem?"
+    assert control.truncated
+
+
+def test_stalled_stream_ends_at_deadline(server):
+    # O timeout do socket acompanha o prazo: um servidor parado não segura a requisição
+    server.delay = 2.0
+    control = GenerationControl.with_timeout(0.3)
+    started = time.monotonic()
+    assert list(backend_for(server).stream("oi", control=control)) == []
+    assert control.truncated
+    assert time.monotonic() - started < 1.5
+
+
+def test_server_timeout_raises(server):
+    server.delay = 1.0
+    backend = backend_for(server, timeout=0.2)
+    with pytest.raises(RemoteBackendError):
+        backend.generate("oi")
+    with pytest.raises(RemoteBackendError):
+        list(backend.stream("oi"))
+
+
+def test_lora_adapters(server):
+    backend = backend_for(server)
+    with pytest.raises(AdapterError):
+        backend.load_adapter("contratos", "/inexistente")
+    with pytest.raises(AdapterError):
+        backend.generate("oi", adapter="contratos")
+
+    backend.load_adapter("contratos", "/adapters/contratos")
+    assert backend.list_adapters() == {"contratos": "/adapters/contratos"}
+    backend.generate("oi", adapter="contratos")
+    assert server.requests[-1][1]["model"] == "contratos"
+
+    backend.unload_adapter("contratos")
+    assert backend.list_adapters() == {}
+    assert server.requests[-1] == ("/v1/unload_lora_adapter", {"lora_name": "contratos"})
+    with pytest.raises(AdapterError):
+        backend.unload_adapter("contratos")
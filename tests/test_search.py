@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, text, update
+
+from chatbot_api.api import main
+from chatbot_api.database.database import AsyncSessionLocal, engine
+from chatbot_api.database.search import FTS_TABLE, SearchUnavailableError, search_history
+from chatbot_api.models.database import ConversationHistory
+
+
+def add_turns(*turns):
+    """turns: (session_id, pergunta, resposta); devolve os ids na ordem"""
+    async def insert():
+        start = datetime(2026, 1, 1)
+        async with AsyncSessionLocal() as db_session:
+            rows = [
+                ConversationHistory(session_id=session_id, user_message=question, bot_response=answer,
+                                    timestamp=start + timedelta(minutes=index))
+                for index, (session_id, question, answer) in enumerate(turns)
+            ]
+            db_session.add_all(rows)
+            await db_session.commit()
+            return [row.id for row in rows]
+
+    return asyncio.run(insert())
+
+
+def search(query, session_ids=("s1",), limit=20, offset=0):
+    async def run():
+        async with engine.connect() as conn:
+            return await conn.run_sync(search_history, query, list(session_ids), limit, offset)
+
+    return asyncio.run(run())
+
+
+def execute(statement):
+    async def run():
+        async with AsyncSessionLocal() as db_session:
+            await db_session.execute(statement)
+            await db_session.commit()
+
+    asyncio.run(run())
+
+
+def fts_count() -> int:
+    async def run():
+        async with engine.connect() as conn:
+            return (await conn.execute(text(f"SELECT count(*) FROM {FTS_TABLE}"))).scalar()
+
+    return asyncio.run(run())
+
+
+def test_triggers_keep_index_in_sync(database):
+    [turn_id] = add_turns(("s1", "Qual o prazo de prescrição?", "Cinco anos."))
+    assert [result["id"] for result in search("prescrição")] == [turn_id]
+
+    execute(update(ConversationHistory).where(ConversationHistory.id == turn_id).values(user_message="Qual a multa rescisória?"))
+    assert search("prescrição") == []
+    assert [result["id"] for result in search("multa")] == [turn_id]
+
+    execute(delete(ConversationHistory).where(ConversationHistory.id == turn_id))
+    assert search("multa") == []
+    assert fts_count() == 0
+
+
+def test_terms_are_ored_and_ranked(database):
+    both, one, none = add_turns(
+        ("s1", "Prazo de prescrição trabalhista", "A prescrição trabalhista tem prazo de dois anos."),
+        ("s1", "Qual o prazo do recurso?", "Quinze dias."),
+        ("s1", "Bom dia", "Olá!"),
+    )
+    results = search("prazo prescrição trabalhista")
+    assert [result["id"] for result in results] == [both, one]
+    assert results[0]["rank"] > results[1]["rank"]
+
+
+def test_pagination(database):
+    ids = add_turns(*[("s1", f"Contrato número {index}", "Cláusula de contrato.") for index in range(5)])
+    pages = [search("contrato", limit=2, offset=offset) for offset in (0, 2, 4)]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(result["id"] for page in pages for result in page) == sorted(ids)
+
+
+def test_snippets_highlight_terms(database):
+    add_turns(("s1", "Como funciona a prescrição?", "A prescrição extingue a pretensão após o prazo legal."))
+    [result] = search("prescrição")
+    assert "**prescrição**" in result["user_snippet"]
+    assert "**prescrição**" in result["bot_snippet"]
+    assert result["timestamp"] == "2026-01-01T00:00:00"
+
+
+def test_other_sessions_are_never_returned(database):
+    mine, theirs = add_turns(
+        ("s1", "Dúvida sobre usucapião", "Resposta."),
+        ("s2", "Também sobre usucapião", "Resposta."),
+    )
+    assert [result["id"] for result in search("usucapião", session_ids=["s1"])] == [mine]
+    assert {result["session_id"] for result in search("usucapião", session_ids=["s1", "s2"])} == {"s1", "s2"}
+
+
+def test_search_endpoint_pages_and_maps_unavailable_to_501(database, monkeypatch):
+    add_turns(*[("s1", f"Pergunta {index} sobre férias", "Resposta.") for index in range(3)])
+    client = TestClient(main.app)
+
+    body = client.get("/search", params={"q": "férias", "session_id": "s1", "limit": 2}).json()
+    assert len(body["results"]) == 2 and body["has_more"] and body["next_offset"] == 2
+
+    def unavailable(*args):
+        raise SearchUnavailableError("Busca textual não suportada no banco 'mysql'")
+
+    monkeypatch.setattr(main, "search_history", unavailable)
+    response = client.get("/search", params={"q": "férias", "session_id": "s1"})
+    assert response.status_code == 501
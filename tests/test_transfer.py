@@ -0,0 +1,92 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select
+
+from chatbot_api.database import transfer
+from chatbot_api.database.database import AsyncSessionLocal
+from chatbot_api.database.retention import archive_stale_sessions
+from chatbot_api.models.database import ConversationHistory, ConversationSummary
+
+START = datetime(2025, 1, 1)
+
+
+def add_turns(*turns):
+    """turns: (session_id, dias após START)"""
+    async def insert():
+        async with AsyncSessionLocal() as db_session:
+            db_session.add_all(
+                ConversationHistory(session_id=session_id, user_message=f"pergunta {day}", bot_response=f"resposta {day}",
+                                    timestamp=START + timedelta(days=day))
+                for session_id, day in turns
+            )
+            await db_session.commit()
+
+    asyncio.run(insert())
+
+
+def history():
+    async def load():
+        async with AsyncSessionLocal() as db_session:
+            rows = (await db_session.execute(select(ConversationHistory).order_by(ConversationHistory.id))).scalars()
+            return [(row.session_id, row.user_message, row.timestamp) for row in rows]
+
+    return asyncio.run(load())
+
+
+def clear():
+    async def run():
+        async with AsyncSessionLocal() as db_session:
+            await db_session.execute(delete(ConversationHistory))
+            await db_session.commit()
+
+    asyncio.run(run())
+
+
+def test_jsonl_round_trip_with_filters(database, tmp_path):
+    add_turns(("s1", 0), ("s1", 10), ("s2", 5), ("s1", 40))
+    rows = history()
+
+    path = str(tmp_path / "janeiro.jsonl.gz")
+    result = asyncio.run(transfer.export_history(
+        path, start=START, end=START + timedelta(days=31), session_ids=["s1"], batch_rows=1
+    ))
+    assert (result["format"], result["rows"], result["batches"]) == ("jsonl", 2, 2)
+
+    clear()
+    assert asyncio.run(transfer.import_history(path))["rows"] == 2
+    assert history() == [row for row in rows if row[0] == "s1" and row[2] < START + timedelta(days=31)]
+
+
+def test_import_skips_retention_summary_lines(database, tmp_path):
+    add_turns(("s1", 0), ("s1", 1))
+    rows = history()
+
+    async def archive():
+        async with AsyncSessionLocal() as db_session:
+            db_session.add(ConversationSummary(session_id="s1", summary="Resumo", last_conversation_id=1))
+            await db_session.commit()
+        return await archive_stale_sessions(retention_days=30, archive_dir=str(tmp_path))
+
+    [path] = asyncio.run(archive())["archives"]
+    assert history() == []
+
+    assert asyncio.run(transfer.import_history(path))["rows"] == 2
+    assert history() == rows
+
+
+def test_export_format_follows_extension(database, tmp_path):
+    path = str(tmp_path / "conversas.parquet")
+    with pytest.raises(transfer.TransferError):
+        asyncio.run(transfer.export_history(path, fmt="jsonl"))
+    assert not os.path.exists(path)
+
+    if transfer.parquet_available():
+        assert asyncio.run(transfer.export_history(path))["format"] == "parquet"
+    else:
+        # Sem pyarrow, não grava JSONL num arquivo .parquet
+        with pytest.raises(transfer.TransferError):
+            asyncio.run(transfer.export_history(path))
+        assert not os.path.exists(path)